@@ -4,6 +4,11 @@
 #define LED_PIN     PB0
 #define BATTERY_PIN PA0
 
+// --- ÖRNEKLEME ---
+// Host tarafı hızı "RATE,<hz>" satırından öğrenir ve kayda yazar (bkz. sample_timing.py)
+#define SAMPLE_RATE_HZ   50
+#define SAMPLE_PERIOD_US (1000000UL / SAMPLE_RATE_HZ)
+
 
 // ===== BMI270 KONFİGÜRASYON VERİSİ =====
 const uint8_t bmi270_config_data[] = {
@@ -245,8 +250,9 @@ void setup() {
 }
 
 void loop() {
-    static uint8_t count = 0;
+    static uint16_t count = 0;
     static uint8_t once = 0;
+    static uint32_t next_us = 0;
     
     if(once == 0) {
         once = 1;
@@ -263,10 +269,11 @@ void loop() {
     if(count == 0) {
         Serial.println("### LOOP BAŞLADI - Sensor Status Check ###");
         Serial.println(sensorHazir ? "Sensor: HAZIR" : "Sensor: BULUNAMADI");
+        Serial.print("RATE,"); Serial.println(SAMPLE_RATE_HZ);
         Serial.flush();
     }
     count++;
-    if(count >= 50) count = 0;  // Her 1 saniyede bir mesaj
+    if(count >= SAMPLE_RATE_HZ) count = 0;  // Her 1 saniyede bir mesaj
     
     int rawBat = analogRead(BATTERY_PIN);
     float bataryaYuzdesi = map(rawBat, 0, 4095, 0, 100);
@@ -311,5 +318,8 @@ void loop() {
         delay(500);
     }
     
-    delay(20);
+    // Sabit periyot: delay(20) okuma/gönderme süresini periyoda ekliyordu (efektif hız < 50 Hz)
+    if(next_us == 0 || (int32_t)(micros() - next_us) > (int32_t)SAMPLE_PERIOD_US) next_us = micros();
+    next_us += SAMPLE_PERIOD_US;
+    while((int32_t)(micros() - next_us) < 0) {}
 }
@@ -0,0 +1,422 @@
+# DOSYA ADI: acquisition_service.py
+# Başsız (headless) çoklu cihaz veri toplama servisi (asyncio).
+# Her cihaz/port bir okuma görevidir: satırlar çözülür, host zaman damgası ve veri satırı sırası eklenir,
+# paketler abonelere (GUI, kayıt, canlı analiz) sınırlı kuyruklarla dağıtılır.
+#   policy="block"       kuyruk doluysa o cihazın okuması bekler (geri basınç; kayıt gibi kayıpsız istemciler)
+#   policy="drop_oldest" en eski paket atılır ve sayılır (ekran gibi yalnızca güncel veriyi isteyen istemciler)
+# pyserial-asyncio kuruluysa gerçek portlar onunla okunur; değilse (ya da sanal cihazda) port
+# bloklamadan yoklanır (in_waiting + read). Bir süreç birden çok yatak başı cihazını yönetebilir;
+# GUI de bu servisin istemcilerinden biri olarak bağlanabilir (gui_app.ServiceWorker).
+#
+# Örnek: python acquisition_service.py --device yatak1=COM3 --device yatak2=sim:tremor:100 --record Kayitlar --live
+#        (--serve 8765: oturumu stream_server ile yerel izleyicilere yayınlar,
+#         --shm NM: analiz süreçleri için shm_ring paylaşımlı bellek halkası)
+
+import argparse
+import asyncio
+import csv
+import os
+import threading
+import time
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+import serial
+
+try:
+    import serial_asyncio          # İsteğe bağlı: pip install pyserial-asyncio
+except ImportError:
+    serial_asyncio = None
+
+import sample_timing
+
+# --- AYARLAR ---
+BAUD_RATE = 115200
+POLL_SEC = 0.002           # Yoklama modunda veri yokken bekleme
+READ_CHUNK = 4096
+RECONNECT_SEC = 2.0        # Bağlantı koparsa yeniden deneme aralığı
+DEFAULT_QUEUE = 2000       # Abone kuyruğu (paket)
+STATS_SEC = 5.0
+IMU_AXES = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
+ACC_SCALE_FACTOR = 16384.0
+
+# t: host zaman damgası (time.perf_counter), seq: cihazdan okunan (boş olmayan) satır sırası
+Packet = namedtuple("Packet", "device seq t values battery")
+
+
+def decode_line(line):
+    """Cihaz satırı -> ("rate", hz) | ("sample", değerler, batarya) | None (kısa/bilinmeyen satır).
+    Örnek satırı 6 (tek IMU) ya da 72 (12 IMU) değerdir; hemen ardından gelen alan batarya yüzdesidir.
+    Sayı olmayan alanlarda ValueError yükselir (çağıran bozuk satır olarak sayar)."""
+    parts = line.split(",")
+    if parts[0] == "RATE" and len(parts) >= 2: return ("rate", float(parts[1]))
+    if len(parts) < 6: return None
+    values = [float(x) for x in parts]
+    if len(values) >= 72: return ("sample", values[:72], values[72] if len(values) >= 73 else 0.0)
+    return ("sample", values[:6], values[6] if len(values) >= 7 else 0.0)
+
+
+# ========================================================
+# CİHAZ
+# ========================================================
+
+class Device:
+    """Tek port. serial_factory verilirse (sanal cihaz, test) yoklama modunda okunur."""
+
+    def __init__(self, device_id, port, baudrate=BAUD_RATE, serial_factory=None):
+        self.device_id = device_id
+        self.port = port
+        self.baudrate = baudrate
+        self.serial_factory = serial_factory
+        self.rate = None          # Firmware'in RATE satırıyla bildirdiği hız
+        self.seq = 0              # Veri satırı sayacı (durum/RATE satırları sayılmaz)
+        self.samples = 0
+        self.malformed = 0
+        self.short_lines = 0
+        self.connected = False
+        self._conn = None
+        self._writer = None
+
+    async def lines(self):
+        """(satır, host zaman damgası) üretir; bağlantı koparsa hata yükselir."""
+        if self.serial_factory is None and serial_asyncio is not None:
+            reader, self._writer = await serial_asyncio.open_serial_connection(url=self.port, baudrate=self.baudrate)
+            self.connected = True
+            while True:
+                raw = await reader.readline()
+                if not raw: return
+                yield raw.decode("utf-8", errors="ignore").strip(), time.perf_counter()
+
+        self._conn = (self.serial_factory or serial.Serial)(self.port, self.baudrate, timeout=0)
+        self.connected = True
+        pending = b""
+        while True:
+            waiting = self._conn.in_waiting
+            if not waiting:
+                await asyncio.sleep(POLL_SEC)
+                continue
+            t = time.perf_counter()
+            pending += self._conn.read(min(waiting, READ_CHUNK))
+            *complete, pending = pending.split(b"\n")
+            for raw in complete:
+                yield raw.decode("utf-8", errors="ignore").strip(), t
+
+    def write(self, data, on_written=None):
+        """on_written(): yazım gerçekten yapıldıktan sonra çağrılır (gecikme ölçümü için)."""
+        try:
+            if self._writer is not None: self._writer.write(data)
+            elif self._conn is not None and self._conn.is_open: self._conn.write(data)
+            else: return
+        except Exception as e:
+            print(f"⚠️ {self.device_id}: komut gönderilemedi: {e}"); return
+        if on_written is not None: on_written()
+
+    def close(self):
+        self.connected = False
+        try:
+            if self._writer is not None: self._writer.close()
+            if self._conn is not None and self._conn.is_open: self._conn.close()
+        except Exception: pass
+        self._conn = self._writer = None
+
+    def stats(self):
+        return {"port": self.port, "connected": self.connected, "rate": self.rate, "samples": self.samples,
+                "malformed": self.malformed, "short_lines": self.short_lines}
+
+
+# ========================================================
+# ABONELİK
+# ========================================================
+
+class Subscription:
+    """Sınırlı kuyruk + taşma politikası. `async for packet in subscription` ile tüketilir."""
+
+    def __init__(self, name, maxsize=DEFAULT_QUEUE, policy="drop_oldest", devices=None):
+        if policy not in ("block", "drop_oldest"): raise ValueError(f"Bilinmeyen politika: {policy}")
+        self.name = name
+        self.policy = policy
+        self.devices = set(devices) if devices else None
+        self.queue = asyncio.Queue(maxsize)
+        self.delivered = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def wants(self, device_id):
+        return self.devices is None or device_id in self.devices
+
+    async def put(self, packet):
+        if self.policy == "block":
+            await self.queue.put(packet)
+        else:
+            if self.queue.full():
+                self.queue.get_nowait(); self.dropped += 1
+            self.queue.put_nowait(packet)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def close(self):
+        # Bitiş işareti; block politikasında tüketici kuyruğu boşaltana dek bekler (kayıt kaybolmaz)
+        if self.policy == "drop_oldest" and self.queue.full(): self.queue.get_nowait()
+        await self.queue.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        packet = await self.queue.get()
+        if packet is None: raise StopAsyncIteration
+        self.delivered += 1
+        return packet
+
+    def stats(self):
+        return {"policy": self.policy, "depth": self.queue.qsize(), "max_depth": self.max_depth,
+                "delivered": self.delivered, "dropped": self.dropped}
+
+
+# ========================================================
+# SERVİS
+# ========================================================
+
+class AcquisitionService:
+    def __init__(self):
+        self.devices = {}
+        self.clients = []             # (istemci, abonelik)
+        self._loop = None
+        self._stop_event = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def add_device(self, device_id, port, baudrate=BAUD_RATE, serial_factory=None):
+        if device_id in self.devices: raise ValueError(f"Cihaz zaten tanımlı: {device_id}")
+        self.devices[device_id] = Device(device_id, port, baudrate, serial_factory)
+        return self.devices[device_id]
+
+    def add_client(self, client, name=None, maxsize=DEFAULT_QUEUE, policy="drop_oldest", devices=None):
+        """client.run(subscription) eşzamansız metodu olan herhangi bir nesne. Servis başlamadan eklenir."""
+        subscription = Subscription(name or type(client).__name__, maxsize, policy, devices)
+        client.service = self
+        self.clients.append((client, subscription))
+        return subscription
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        readers = [asyncio.create_task(self._read_device(d)) for d in self.devices.values()]
+        consumers = [asyncio.create_task(client.run(sub)) for client, sub in self.clients]
+        self._ready.set()
+        try:
+            await self._stop_event.wait()
+        finally:
+            for task in readers: task.cancel()
+            await asyncio.gather(*readers, return_exceptions=True)
+            for _, sub in self.clients: await sub.close()
+            await asyncio.gather(*consumers, return_exceptions=True)
+            for device in self.devices.values(): device.close()
+
+    async def _read_device(self, device):
+        while True:
+            try:
+                async for line, t in device.lines():
+                    if not line: continue
+                    try: decoded = decode_line(line)
+                    except (ValueError, IndexError):
+                        device.seq += 1   # Bozuk veri satırı da bir örnek yuvasıdır
+                        device.malformed += 1; continue
+                    if decoded is None:
+                        device.short_lines += 1; continue
+                    if decoded[0] == "rate":
+                        device.rate = decoded[1]; continue
+                    device.seq += 1
+                    device.samples += 1
+                    packet = Packet(device.device_id, device.seq, t, decoded[1], decoded[2])
+                    for _, sub in self.clients:
+                        if sub.wants(device.device_id): await sub.put(packet)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ {device.device_id} ({device.port}) bağlantı hatası: {e}")
+            finally:
+                device.close()
+            await asyncio.sleep(RECONNECT_SEC)
+
+    # --- Başka iş parçacığından kullanım (GUI) ---
+    def start_background(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run()), name="acquisition", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        return self._thread
+
+    def stop(self, timeout=5.0):
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread is not None: self._thread.join(timeout)
+
+    def send_command(self, device_id, command, on_written=None):
+        """İş parçacığı güvenli komut gönderimi (satır sonu eklenir). Komut kuyruğa alınır; yazım servis
+        döngüsünde yapılır ve on_written() o anda (servis iş parçacığında) çağrılır."""
+        device = self.devices.get(device_id)
+        if device is None or self._loop is None: return False
+        self._loop.call_soon_threadsafe(device.write, f"{command}\r\n".encode("utf-8"), on_written)
+        return True
+
+    def stats(self):
+        return {"devices": {k: d.stats() for k, d in self.devices.items()},
+                "clients": {sub.name: sub.stats() for _, sub in self.clients}}
+
+
+# ========================================================
+# İSTEMCİLER
+# ========================================================
+
+class CallbackClient:
+    """Her paket için fn(packet) çağırır (servis iş parçacığında). Qt sinyali emit etmek güvenlidir."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    async def run(self, subscription):
+        async for packet in subscription:
+            try: self.fn(packet)
+            except Exception as e: print(f"⚠️ {subscription.name} istemci hatası: {e}")
+
+
+class Recorder:
+    """Cihaz başına bir CSV (GUI kayıt biçimi: IMU sütunları + HOST_T/SEQ) ve _META.json.
+    Kayıpsız olması için policy="block" ile eklenmelidir."""
+
+    def __init__(self, folder, prefix="KAYIT"):
+        self.folder = folder
+        self.prefix = prefix
+        self.paths = {}
+        self._files = {}
+        self._timing = {}
+        self._imus = {}
+
+    def _open(self, packet):
+        os.makedirs(self.folder, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.folder, f"{self.prefix}_{packet.device}_{stamp}.csv")
+        f = open(path, "w", newline="")
+        writer = csv.writer(f)
+        headers = [f"IMU{i + 1}_{axis}" for i in range(len(packet.values) // 6) for axis in IMU_AXES]
+        writer.writerow(headers + sample_timing.TIMING_COLUMNS)
+        self.paths[packet.device] = path
+        self._files[packet.device] = (f, writer, packet.t)
+        self._timing[packet.device] = (array("d"), array("q"))
+        self._imus[packet.device] = len(packet.values) // 6
+        return self._files[packet.device]
+
+    async def run(self, subscription):
+        try:
+            async for packet in subscription:
+                f, writer, t0 = self._files.get(packet.device) or self._open(packet)
+                writer.writerow(packet.values + [round(packet.t - t0, 6), packet.seq])
+                host_t, seq = self._timing[packet.device]
+                host_t.append(packet.t - t0); seq.append(packet.seq)
+        finally:
+            self.close()
+
+    def close(self):
+        for device_id, (f, _, _) in list(self._files.items()):
+            f.close()
+            host_t, seq = self._timing[device_id]
+            device = self.service.devices.get(device_id) if getattr(self, "service", None) else None
+            meta = sample_timing.recording_meta(host_t, seq, device.rate if device else None, self._imus[device_id])
+            sample_timing.save_meta(self.paths[device_id], meta)
+            print(f"💾 {device_id}: {meta['samples']} örnek -> {self.paths[device_id]} ({meta['fs']} Hz, {meta['fs_source']})")
+        self._files.clear()
+
+
+class LiveTremor:
+    """Cihaz başına canlı tremor bant gücü (closed_loop.CausalBandPower, IMU1 ivme büyüklüğü)."""
+
+    def __init__(self, interval_sec=1.0, default_fs=sample_timing.LEGACY_FS):
+        self.interval = interval_sec
+        self.default_fs = default_fs
+        self.power = {}
+        self.last = {}
+
+    async def run(self, subscription):
+        from closed_loop import CausalBandPower
+        filters, next_print = {}, time.perf_counter() + self.interval
+        async for packet in subscription:
+            band = filters.get(packet.device)
+            if band is None:
+                device = self.service.devices.get(packet.device)
+                band = filters[packet.device] = CausalBandPower(fs=(device and device.rate) or self.default_fs)
+            x, y, z = packet.values[:3]
+            self.power[packet.device] = band.update((x * x + y * y + z * z) ** 0.5 / ACC_SCALE_FACTOR)
+            if packet.t >= next_print:
+                next_print = packet.t + self.interval
+                print("🌊 " + " | ".join(f"{k}: {v * 1000:.2f} mg²" for k, v in sorted(self.power.items())), flush=True)
+
+
+def format_stats(stats):
+    lines = []
+    for name, d in stats["devices"].items():
+        lines.append(f"📡 {name:<10} {'bağlı' if d['connected'] else 'BAĞLI DEĞİL':<11} {d['rate'] or '-':>5} Hz | "
+                     f"örnek {d['samples']} | bozuk {d['malformed']} | kısa {d['short_lines']}")
+    for name, c in stats["clients"].items():
+        lines.append(f"   ↳ {name:<12} {c['policy']:<11} kuyruk {c['depth']} (maks {c['max_depth']}) | "
+                     f"iletilen {c['delivered']} | atılan {c['dropped']}")
+    return "\n".join(lines)
+
+
+def parse_device(spec):
+    """ad=PORT ya da ad=sim:<kaynak>[:hız[:imu]] (device_simulator ile sanal cihaz)."""
+    name, _, port = spec.partition("=")
+    if not port: raise argparse.ArgumentTypeError(f"Cihaz 'ad=PORT' biçiminde olmalı: {spec}")
+    if not port.startswith("sim:"): return name, port, None
+    from device_simulator import DEFAULT_RATE, serial_factory
+    fields = port.split(":")[1:]
+    source = fields[0] if fields and fields[0] else "tremor"
+    rate = float(fields[1]) if len(fields) > 1 else DEFAULT_RATE
+    imus = int(fields[2]) if len(fields) > 2 else 1
+    return name, port, serial_factory(source, rate, imus)
+
+
+async def _run_cli(service, duration):
+    task = asyncio.create_task(service.run())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    try:
+        while not task.done() and (not duration or time.perf_counter() - started < duration):
+            await asyncio.sleep(min(STATS_SEC, duration or STATS_SEC))
+            print(format_stats(service.stats()), flush=True)
+    finally:
+        service._stop_event.set()
+        await task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Çoklu cihaz veri toplama servisi")
+    parser.add_argument("--device", action="append", type=parse_device, required=True,
+                        help="ad=PORT ya da ad=sim:kaynak:hız:imu (tekrarlanabilir)")
+    parser.add_argument("--baud", type=int, default=BAUD_RATE)
+    parser.add_argument("--record", help="Kayıt klasörü (cihaz başına CSV + _META.json)")
+    parser.add_argument("--prefix", default="KAYIT")
+    parser.add_argument("--live", action="store_true", help="Canlı tremor bant gücünü yazdır")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="Canlı yayın (stream_server, localhost TCP)")
+    parser.add_argument("--shm", metavar="AD", help="Paylaşımlı bellek halkası (shm_ring; cihaz başına AD_<cihaz>)")
+    parser.add_argument("--duration", type=float, default=0.0, help="Süre (sn); 0 = Ctrl+C'ye kadar")
+    args = parser.parse_args()
+
+    service = AcquisitionService()
+    for name, port, factory in args.device: service.add_device(name, port, args.baud, factory)
+    if args.record: service.add_client(Recorder(args.record, args.prefix), "kayıt", policy="block")
+    if args.live: service.add_client(LiveTremor(), "canlı", maxsize=200)
+    if args.serve:
+        from stream_server import StreamServer
+        service.add_client(StreamServer(port=args.serve), "yayın")
+    if args.shm:
+        from shm_ring import ShmRingClient
+        service.add_client(ShmRingClient(args.shm), "halka")
+    print(f"🚀 {len(service.devices)} cihaz dinleniyor ({'pyserial-asyncio' if serial_asyncio else 'yoklama'} modu)")
+    try:
+        asyncio.run(_run_cli(service, args.duration))
+    except KeyboardInterrupt:
+        print("\n🛑 Durduruldu.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,22 +9,21 @@ from matplotlib.backends.backend_pdf import PdfPages
 import os
 import warnings
 
-# Kalibrasyon Kontrolü
-try:
-    import kalibrasyon_verisi
-    CALIBRATION_EXIST = True
-except ImportError:
-    CALIBRATION_EXIST = False
+# Kalibrasyon (cihaz/IMU bazlı, bkz. calibration.py)
+import calibration
+
+# Örnek zamanlaması (host zaman damgaları, boşluklar, bkz. sample_timing.py)
+import sample_timing
 
 # Stil Ayarları
 plt.style.use('seaborn-v0_8-whitegrid')
 warnings.filterwarnings("ignore")
 
 # --- AYARLAR ---
-FS = 50.0               
+FS = 50.0               # Analiz (çalışma) örnekleme frekansı; kaydın kendi hızı sample_timing ile bulunur
 LOW_PASS_CUTOFF = 5.0   
 MIN_PEAK_HEIGHT = 15.0  
-MIN_PEAK_DIST = 20      
+MIN_PEAK_DIST = 20      # Örnek (FS'de); başka çalışma hızında orantılanır
 
 def butter_lowpass_filter(data, cutoff, fs, order=4):
     nyq = 0.5 * fs
@@ -78,7 +77,7 @@ def draw_score_bar(ax, label, score, y_pos, color):
     # Skor yazısı
     ax.text(0.92, y_pos, f"%{int(score)}", fontsize=12, fontweight='bold', va='center', color=color)
 
-def run_analysis(file_path, stim_params=None): 
+def run_analysis(file_path, stim_params=None, calibration_profile=None, fs=FS):
     print(f"\n{'='*60}")
     print(f"🐢 MDS-UPDRS + PERFORMANS ANALİZİ")
     print(f"{'='*60}")
@@ -90,35 +89,33 @@ def run_analysis(file_path, stim_params=None):
 
         # --- GELECEĞE HAZIR YAKLAŞIM ---
         # 72 sütunluk (12 IMU) veriyi bozmadan koru, ama şimdilik sadece IMU1'i analize sok.
+        expected_cols = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
         if "IMU1_AccX" in df.columns:
-            df["AccX"] = df["IMU1_AccX"]
-            df["AccY"] = df["IMU1_AccY"]
-            df["AccZ"] = df["IMU1_AccZ"]
-            df["GyroX"] = df["IMU1_GyroX"]
-            df["GyroY"] = df["IMU1_GyroY"]
-            df["GyroZ"] = df["IMU1_GyroZ"]
+            imu_cols, imu_indices = calibration.imu_columns_in(df.columns)
         else:
             # Eğer önceden alınmış sadece 6 sütunlu eski bir test CSV'si gelirse çökmemesi için:
-            expected_cols = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
             if len(df.columns) >= 6: 
                 df.rename(columns=dict(zip(df.columns[:6], expected_cols)), inplace=True)
+            imu_cols, imu_indices = expected_cols, [0]
 
-        # Sadece analiz edilecek ana sütunları sayısal değere çevir ve bozukları at
-        for c in ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]: 
-            df[c] = pd.to_numeric(df[c], errors='coerce')
-            
-        df = df.dropna(subset=["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]).reset_index(drop=True)
+        # Analiz yalnızca IMU1'i kullanır; diğer IMU'lar dosyada kalır ama işlenmez (maliyet metrikle orantılı)
+        imu_cols, imu_indices = imu_cols[:6], list(imu_indices)[:1]
+
+        # IMU sütunlarını sayısal değere çevir, bozuk satırları at
+        df[imu_cols] = df[imu_cols].apply(pd.to_numeric, errors='coerce')
+        df = df.dropna(subset=imu_cols).reset_index(drop=True)
 
-        # --- KALİBRASYON ---
-        if CALIBRATION_EXIST:
-            df['AccX'] -= kalibrasyon_verisi.OFFSET_AX
-            df['AccY'] -= kalibrasyon_verisi.OFFSET_AY
-            df['AccZ'] -= kalibrasyon_verisi.OFFSET_AZ
-            df['GyroX'] -= kalibrasyon_verisi.OFFSET_GX
-            df['GyroY'] -= kalibrasyon_verisi.OFFSET_GY
-            df['GyroZ'] -= kalibrasyon_verisi.OFFSET_GZ
+        # Kaydın hızı (meta > host zaman damgası > 50 Hz): kayıp/kayma düzeltilir, çalışma hızına (fs) indirilir
+        df, timing = sample_timing.prepare(df, fs, file_path, imu_cols)
+        print(f"📏 {sample_timing.describe(timing)}")
 
-        t_seconds = np.arange(len(df)) / FS
+        # --- KALİBRASYON (analiz edilen IMU, tek vektörel işlem) ---
+        if calibration_profile is None:
+            calibration_profile = calibration.load_profile()
+        df[imu_cols] = calibration_profile.apply(df[imu_cols].to_numpy(), imu_indices)
+        df[expected_cols] = df[imu_cols].to_numpy()
+
+        t_seconds = np.arange(len(df)) / fs
 
         # Akıllı Eksen Seçimi
         gyro_data = df[['GyroX', 'GyroY', 'GyroZ']].values / 131.0 
@@ -126,11 +123,11 @@ def run_analysis(file_path, stim_params=None):
         main_axis_idx = np.argmax(stds)
         raw_signal = gyro_data[:, main_axis_idx]
         
-        smooth_signal = butter_lowpass_filter(raw_signal, LOW_PASS_CUTOFF, FS)
+        smooth_signal = butter_lowpass_filter(raw_signal, LOW_PASS_CUTOFF, fs)
         abs_signal = np.abs(smooth_signal)
-        peaks, _ = find_peaks(abs_signal, height=MIN_PEAK_HEIGHT, distance=MIN_PEAK_DIST)
+        peaks, _ = find_peaks(abs_signal, height=MIN_PEAK_HEIGHT, distance=max(int(MIN_PEAK_DIST * fs / FS), 1))
         
-        freqs, amps = calculate_fft(smooth_signal, FS)
+        freqs, amps = calculate_fft(smooth_signal, fs)
         max_amp = 0
         if len(amps) > 0:
             max_amp = np.max(amps)
@@ -191,6 +188,11 @@ def run_analysis(file_path, stim_params=None):
             updrs_desc = "Hareket Yok"
             status_color = "#c0392b"
         
+        # Boylamsal trend için saklanan metrikler (trend_engine.METRICS["Bradikinezi"])
+        metrics = {"updrs": updrs_score, "speed": score_speed, "power": score_power, "rhythm": score_rhythm,
+                   "cv_rhythm": cv_rhythm, "hesitations": hesitation_count, "amp_slope": amp_slope}
+        metrics.update(sample_timing.timing_metrics(timing))
+
         # --- PDF RAPOR ---
         report_filename = file_path.replace(".csv", "_FINAL_RAPOR.pdf")
         with PdfPages(report_filename) as pdf:
@@ -262,6 +264,8 @@ def run_analysis(file_path, stim_params=None):
             plt.close()
             print(f"✅ Final Rapor Hazır: {report_filename}")
 
+        return metrics
+
     except Exception as e:
         print(f"❌ Hata: {e}")
         import traceback
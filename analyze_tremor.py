@@ -4,17 +4,19 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.signal import butter, filtfilt
-from scipy.fft import fft, fftfreq
 from matplotlib.backends.backend_pdf import PdfPages
 import os
 import warnings
+import spectral
 
-# Kalibrasyon Kontrolü
-try:
-    import kalibrasyon_verisi
-    CALIBRATION_EXIST = True
-except ImportError:
-    CALIBRATION_EXIST = False
+# Kalibrasyon (cihaz/IMU bazlı, bkz. calibration.py)
+import calibration
+
+# Örnek zamanlaması (host zaman damgaları, boşluklar, bkz. sample_timing.py)
+import sample_timing
+
+# Kayıttaki stimülasyon durumu sütunları (bkz. stim_log.py)
+import stim_log
 
 # Stil Ayarları (Profesyonel Tıbbi Görünüm)
 plt.style.use('seaborn-v0_8-whitegrid')
@@ -23,9 +25,12 @@ plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
 warnings.filterwarnings("ignore")
 
 # --- AYARLAR ---
-FS = 50.0               # Örnekleme Frekansı
+FS = 50.0               # Analiz (çalışma) örnekleme frekansı; kaydın kendi hızı sample_timing ile bulunur
 TREMOR_BAND = (1.0, 12.0) # Genişletilmiş Tremor Aralığı (Hz)
 ACC_SCALE_FACTOR = 16384.0 # LSB to g (Sensör ayarına göre değişebilir, genelde 16384)
+SPECTRAL_METHOD = spectral.DEFAULT_METHOD # "periodogram" | "welch" | "multitaper" | "zoom"
+SEGMENT_MIN_SEC = 4.0     # Bundan kısa stimülasyon koşulları ayrı analiz edilmez
+SEGMENT_WINDOW_SEC = 4.0  # Koşul spektrumu bu uzunluktaki pencerelerin ortalaması
 
 # Renk Paleti
 COLOR_SIGNAL = "#2c3e50"   # Koyu Lacivert
@@ -41,23 +46,9 @@ def butter_bandpass_filter(data, lowcut, highcut, fs, order=4):
     y = filtfilt(b, a, data)
     return y
 
-def calculate_fft_dominant(signal, fs):
-    """Baskın frekansı ve gücünü bulur."""
-    N = len(signal)
-    yf = fft(signal)
-    xf = fftfreq(N, 1 / fs)
-    # Sadece pozitif ve tremor aralığındaki frekanslara bak
-    idx = np.where((xf >= TREMOR_BAND[0]) & (xf <= TREMOR_BAND[1]))
-    freqs = xf[idx]
-    amps = 2.0/N * np.abs(yf[idx])
-    
-    dominant_freq = 0
-    max_amp = 0
-    if len(amps) > 0:
-        peak_idx = np.argmax(amps)
-        dominant_freq = freqs[peak_idx]
-        max_amp = amps[peak_idx]
-    return freqs, amps, dominant_freq, max_amp
+def calculate_fft_dominant(signal, fs, method=SPECTRAL_METHOD):
+    """Baskın frekansı ve gücünü bulur (kestirici: spectral.py)."""
+    return spectral.dominant_frequency(signal, fs, TREMOR_BAND, method=method)
 
 def calculate_updrs_tremor(peak_acc_g, dominant_freq):
     """
@@ -104,6 +95,63 @@ def calculate_updrs_tremor(peak_acc_g, dominant_freq):
     else:
         return 0, "NORMAL (0) - Belirsiz"
 
+def analyze_stim_segments(tremor_signal_g, tremor_envelope, matrix, fs=FS):
+    """Stimülasyon koşulu başına tremor metrikleri.
+    Tüm koşulların pencereleri tek bir 2D dizide toplanır ve spektrumlar tek toplu çağrıda hesaplanır."""
+    nper = int(SEGMENT_WINDOW_SEC * fs)
+    segments = [s for s in stim_log.condition_segments(matrix) if s[1] - s[0] >= max(SEGMENT_MIN_SEC * fs, nper)]
+    if not segments: return []
+
+    windows, owner = [], []
+    for k, (start, end, _) in enumerate(segments):
+        count = (end - start) // nper
+        windows.append(np.asarray(tremor_signal_g[start:start + count * nper]).reshape(count, nper))
+        owner.extend([k] * count)
+    windows, owner = np.vstack(windows), np.asarray(owner)
+
+    freqs, amps = spectral.welch_spectrum(windows, fs, segment_sec=SEGMENT_WINDOW_SEC)
+    # Pencere güçlerinin koşul başına ortalaması (Welch ile aynı mantık)
+    power = np.zeros((len(segments), amps.shape[1]))
+    np.add.at(power, owner, amps ** 2)
+    seg_amps = np.sqrt(power / np.bincount(owner, minlength=len(segments))[:, None])
+    band = np.where((freqs >= TREMOR_BAND[0]) & (freqs <= TREMOR_BAND[1]))[0]
+    band_freqs, seg_amps = freqs[band], seg_amps[:, band]
+    peak_idx = np.argmax(seg_amps, axis=1)
+
+    results = []
+    for k, (start, end, state) in enumerate(segments):
+        dominant, _ = spectral.parabolic_peak(band_freqs, seg_amps[k], peak_idx[k])
+        peak_g = float(np.percentile(tremor_envelope[start:end], 95))
+        score, desc = calculate_updrs_tremor(peak_g, dominant)
+        results.append({"start_s": start / fs, "end_s": end / fs, "label": stim_log.describe(state),
+                        "dominant_freq": float(dominant), "peak_g": peak_g, "updrs": score, "desc": desc})
+    return results
+
+def draw_segment_page(pdf, segments):
+    """Stimülasyon koşullarına göre tremor karşılaştırma sayfası."""
+    fig = plt.figure(figsize=(8.27, 11.69))
+    header_ax = fig.add_axes([0, 0.92, 1, 0.08]); header_ax.axis('off')
+    header_ax.add_patch(plt.Rectangle((0, 0), 1, 1, color=COLOR_SIGNAL, transform=header_ax.transAxes, zorder=-1))
+    header_ax.text(0.5, 0.5, "STİMÜLASYON KOŞULLARINA GÖRE TREMOR", transform=header_ax.transAxes,
+                   fontsize=16, weight='bold', color='white', ha='center', va='center')
+
+    ax = fig.add_axes([0.1, 0.55, 0.8, 0.30])
+    x = np.arange(len(segments))
+    ax.bar(x, [s["peak_g"] for s in segments], color=COLOR_TREMOR, alpha=0.75)
+    ax.set_xticks(x, [f"{s['start_s']:.0f}-{s['end_s']:.0f} sn" for s in segments], fontsize=8, rotation=30)
+    ax.set_ylabel("Tepe Titreşim (g)", fontweight='bold', fontsize=9)
+    ax.set_title("Koşul Başına Tepe Titreşim", fontsize=11, fontweight='bold', color=COLOR_SIGNAL, loc='left')
+    ax.grid(axis='y', color=COLOR_GRID_MAJOR, linestyle='-', linewidth=0.8, alpha=0.8)
+
+    table_ax = fig.add_axes([0.05, 0.08, 0.9, 0.40]); table_ax.axis('off')
+    rows = [[f"{s['start_s']:.0f}-{s['end_s']:.0f}", s["label"], f"{s['dominant_freq']:.1f}", f"{s['peak_g']:.3f}", str(s["updrs"])]
+            for s in segments]
+    table = table_ax.table(cellText=rows, colLabels=["Süre (sn)", "Stimülasyon", "Frekans (Hz)", "Tepe (g)", "UPDRS"],
+                           loc='upper center', cellLoc='center', colWidths=[0.12, 0.46, 0.14, 0.14, 0.10])
+    table.auto_set_font_size(False); table.set_fontsize(8); table.scale(1, 1.4)
+    pdf.savefig(fig)
+    plt.close(fig)
+
 def draw_score_bar(ax, label, score, y_pos, color, inverse=False):
     """Yatay performans skor çubuğu çizer."""
     ax.text(0, y_pos, label, fontsize=11, fontweight='bold', va='center', ha='left', color='#34495e')
@@ -120,7 +168,7 @@ def draw_score_bar(ax, label, score, y_pos, color, inverse=False):
 # 📊 ANA ANALİZ FONKSİYONU (main_system.py tarafından çağrılır)
 # ========================================================
 
-def run_analysis(file_path, stim_params=None):
+def run_analysis(file_path, stim_params=None, calibration_profile=None, fs=FS):
     print(f"\n{'='*60}")
     print(f"🌊 MDS-UPDRS TREMOR (TİTREME) ANALİZİ")
     print(f"{'='*60}")
@@ -133,47 +181,45 @@ def run_analysis(file_path, stim_params=None):
 
         # --- GELECEĞE HAZIR YAKLAŞIM ---
         # 72 sütunluk (12 IMU) veriyi bozmadan koru, ama şimdilik sadece IMU1'i analize sok.
+        expected_cols = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
         if "IMU1_AccX" in df.columns:
-            df["AccX"] = df["IMU1_AccX"]
-            df["AccY"] = df["IMU1_AccY"]
-            df["AccZ"] = df["IMU1_AccZ"]
-            df["GyroX"] = df["IMU1_GyroX"]
-            df["GyroY"] = df["IMU1_GyroY"]
-            df["GyroZ"] = df["IMU1_GyroZ"]
+            imu_cols, imu_indices = calibration.imu_columns_in(df.columns)
         else:
             # Eğer önceden alınmış sadece 6 sütunlu eski bir test CSV'si gelirse çökmemesi için:
-            expected_cols = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
             if len(df.columns) >= 6: 
                 df.rename(columns=dict(zip(df.columns[:6], expected_cols)), inplace=True)
+            imu_cols, imu_indices = expected_cols, [0]
 
-        # Sadece analiz edilecek ana sütunları sayısal değere çevir ve bozukları at
-        for c in ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]: 
-            df[c] = pd.to_numeric(df[c], errors='coerce')
-            
-        df = df.dropna(subset=["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]).reset_index(drop=True)
+        # Analiz yalnızca IMU1'i kullanır; diğer IMU'lar dosyada kalır ama işlenmez (maliyet metrikle orantılı)
+        imu_cols, imu_indices = imu_cols[:6], list(imu_indices)[:1]
 
-        # 2. KALİBRASYON UYGULAMA
-        if CALIBRATION_EXIST:
-            df['AccX'] -= kalibrasyon_verisi.OFFSET_AX
-            df['AccY'] -= kalibrasyon_verisi.OFFSET_AY
-            df['AccZ'] -= kalibrasyon_verisi.OFFSET_AZ
-            df['GyroX'] -= kalibrasyon_verisi.OFFSET_GX
-            df['GyroY'] -= kalibrasyon_verisi.OFFSET_GY
-            df['GyroZ'] -= kalibrasyon_verisi.OFFSET_GZ
+        # IMU sütunlarını sayısal değere çevir, bozuk satırları at
+        df[imu_cols] = df[imu_cols].apply(pd.to_numeric, errors='coerce')
+        df = df.dropna(subset=imu_cols).reset_index(drop=True)
+
+        # Kaydın hızı (meta > host zaman damgası > 50 Hz): kayıp/kayma düzeltilir, çalışma hızına (fs) indirilir
+        df, timing = sample_timing.prepare(df, fs, file_path, imu_cols + stim_log.STIM_COLUMNS)
+        print(f"📏 {sample_timing.describe(timing)}")
+
+        # 2. KALİBRASYON UYGULAMA (analiz edilen IMU, tek vektörel işlem)
+        if calibration_profile is None:
+            calibration_profile = calibration.load_profile()
+        df[imu_cols] = calibration_profile.apply(df[imu_cols].to_numpy(), imu_indices)
+        df[expected_cols] = df[imu_cols].to_numpy()
 
         # Zaman Ekseni
-        t_seconds = np.arange(len(df)) / FS
+        t_seconds = np.arange(len(df)) / fs
 
         # 3. Sinyal İşleme
         acc_mag_g = np.sqrt(df['AccX']**2 + df['AccY']**2 + df['AccZ']**2) / ACC_SCALE_FACTOR
-        tremor_signal_g = butter_bandpass_filter(acc_mag_g, TREMOR_BAND[0], TREMOR_BAND[1], FS)
+        tremor_signal_g = butter_bandpass_filter(acc_mag_g, TREMOR_BAND[0], TREMOR_BAND[1], fs)
         
-        window_size = int(FS * 1.0)
+        window_size = int(fs * 1.0)
         tremor_envelope = pd.Series(tremor_signal_g).rolling(window=window_size, center=True).std().fillna(0).values * np.sqrt(2)
 
         # 4. Metrik Hesaplama
         peak_tremor_g = np.percentile(tremor_envelope, 95) if len(tremor_envelope) > 0 else 0
-        freqs_fft, amps_fft, dominant_freq, max_amp_fft = calculate_fft_dominant(tremor_signal_g, FS)
+        freqs_fft, amps_fft, dominant_freq, max_amp_fft = calculate_fft_dominant(tremor_signal_g, fs)
 
         # 5. MDS-UPDRS Skorlama
         updrs_score, updrs_desc = calculate_updrs_tremor(peak_tremor_g, dominant_freq)
@@ -186,6 +232,16 @@ def run_analysis(file_path, stim_params=None):
         print(f"🔹 Baskın Frekans: {dominant_freq:.1f} Hz")
         print(f"🔹 MDS-UPDRS Skoru: {updrs_score}")
 
+        # Boylamsal trend için saklanan metrikler (trend_engine.METRICS["Tremor"])
+        metrics = {"updrs": updrs_score, "dominant_freq": dominant_freq, "peak_g": peak_tremor_g}
+        metrics.update(sample_timing.timing_metrics(timing))
+
+        # 6. Stimülasyon koşullarına göre segment analizi (kayıtta STIM sütunları varsa)
+        stim_segments = analyze_stim_segments(tremor_signal_g, tremor_envelope, stim_log.stim_matrix(df), fs)
+        for seg in stim_segments:
+            print(f"   ⚡ {seg['start_s']:.0f}-{seg['end_s']:.0f} sn | {seg['label']} | "
+                  f"{seg['dominant_freq']:.1f} Hz | {seg['peak_g']:.3f} g | UPDRS {seg['updrs']}")
+
         # --- PROFESYONEL PDF RAPOR ---
         report_filename = file_path.replace(".csv", "_TREMOR_KLINIK_RAPOR.pdf")
         with PdfPages(report_filename) as pdf:
@@ -275,8 +331,12 @@ def run_analysis(file_path, stim_params=None):
 
             pdf.savefig(fig)
             plt.close(fig)
+            if len(stim_segments) > 1:
+                draw_segment_page(pdf, stim_segments)
             print(f"✅ Klinik Tremor Raporu Hazır: {report_filename}")
 
+        return metrics
+
     except Exception as e:
         print(f"❌ Analiz Hatası: {e}")
         import traceback
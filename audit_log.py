@@ -0,0 +1,215 @@
+# DOSYA ADI: audit_log.py
+# system_logs için arka plan yazıcısı.
+# log_event çağrıları yalnızca sınırlı bir kuyruğa ekler; ayrı bir iş parçacığı
+# kayıtları kendi bağlantısıyla toplu (executemany) olarak yazar. Veritabanına
+# ulaşılamazsa kayıtlar yerel bir JSONL dosyasına dökülür ve bağlantı geri
+# geldiğinde ilk iş olarak yeniden gönderilir. Veritabanının reddettiği (bağlantı dışı
+# hatalı) kayıtlar yeniden dökülmez; ayrı bir karantina dosyasına ayrılır.
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import mysql.connector
+from db_config import DB_CONFIG
+
+# --- AYARLAR ---
+QUEUE_SIZE = 5000            # Kuyruk dolarsa kayıt doğrudan dosyaya dökülür
+BATCH_SIZE = 100             # Bu kadar kayıt birikince hemen yazılır
+FLUSH_INTERVAL_MS = 500      # ... ya da en geç bu sürede bir
+RETRY_INTERVAL_SEC = 30.0    # Bağlantı koptuktan sonra yeniden deneme aralığı
+SPILL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_spill.jsonl")
+REJECTED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_rejected.jsonl")
+
+INSERT_SQL = """
+INSERT INTO system_logs (log_date, level, message, doctor_name)
+VALUES (%s, %s, %s, %s)
+"""
+
+
+class AuditLogSink:
+    def __init__(self, db_config=None, spill_path=SPILL_PATH, batch_size=BATCH_SIZE,
+                 flush_interval_ms=FLUSH_INTERVAL_MS, queue_size=QUEUE_SIZE, rejected_path=REJECTED_PATH):
+        self.db_config = db_config or DB_CONFIG
+        self.spill_path = spill_path
+        self.rejected_path = rejected_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spill_lock = threading.Lock()
+        self._flush_requests = queue.SimpleQueue()   # flush() çağıranların beklediği olaylar (iş parçacığı güvenli)
+        self._stop = threading.Event()
+        self._conn = None
+        self._next_connect = 0.0
+        self._thread = threading.Thread(target=self._run, name="AuditLogSink", daemon=True)
+        self._thread.start()
+
+    # --- Genel API ---
+    def submit(self, level, message, doctor_name="System"):
+        """Bloklamaz. Kuyruk doluysa kayıt yerel dosyaya yazılır."""
+        entry = (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), level, message, doctor_name)
+        if self._stop.is_set():
+            self._spill([entry]); return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._spill([entry])
+
+    def flush(self, timeout=5.0):
+        """Kuyruktaki her şey yazılana (ya da dosyaya dökülene) kadar bekler."""
+        if not self._thread.is_alive(): return False
+        done = threading.Event()
+        self._flush_requests.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._stop.is_set(): return
+        self._stop.set()
+        self._thread.join(timeout)
+        # İş parçacığı zamanında bitmediyse kalanları kaybetmemek için dosyaya dök
+        leftovers = self._drain()
+        if leftovers: self._spill(leftovers)
+        self._disconnect()
+
+    # --- İş parçacığı ---
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(deadline - time.monotonic(), 0.0)
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            except queue.Empty:
+                pass
+
+            stopping = self._stop.is_set()
+            flush_waiters = []
+            while True:
+                try: flush_waiters.append(self._flush_requests.get_nowait())
+                except queue.Empty: break
+            if flush_waiters or stopping:
+                batch.extend(self._drain())
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline or flush_waiters or stopping):
+                self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            for waiter in flush_waiters: waiter.set()
+            if stopping and self._queue.empty():
+                return
+
+    def _drain(self, limit=None):
+        items = []
+        while limit is None or len(items) < limit:
+            try: items.append(self._queue.get_nowait())
+            except queue.Empty: break
+        return items
+
+    def _connect(self):
+        if self._conn is not None: return True
+        if time.monotonic() < self._next_connect: return False
+        try:
+            self._conn = mysql.connector.connect(**self.db_config)
+            return True
+        except mysql.connector.Error as err:
+            print(f"Log Bağlantı Hatası: {err}")
+            self._next_connect = time.monotonic() + RETRY_INTERVAL_SEC
+            return False
+
+    def _disconnect(self):
+        try:
+            if self._conn is not None: self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _write(self, batch):
+        if not self._connect():
+            self._spill(batch); return
+        pending = self._take_spilled() + batch
+        try:
+            cursor = self._conn.cursor()
+            cursor.executemany(INSERT_SQL, pending)
+            self._conn.commit()
+            cursor.close()
+        except Exception as e:
+            if self._connection_lost(e):
+                self._on_connection_lost(e, pending); return
+            # Toplu yazım bir kayıt yüzünden reddedildi: tek tek dene, reddedilenleri karantinaya al
+            self._write_rows(pending)
+
+    def _write_rows(self, entries):
+        try: self._conn.rollback()
+        except Exception: pass
+        rejected = []
+        for i, entry in enumerate(entries):
+            try:
+                cursor = self._conn.cursor()
+                cursor.execute(INSERT_SQL, entry)
+                self._conn.commit()
+                cursor.close()
+            except Exception as e:
+                if self._connection_lost(e):
+                    self._on_connection_lost(e, entries[i:]); break
+                rejected.append(list(entry) + [str(e)])
+                try: self._conn.rollback()
+                except Exception: pass
+        if rejected:
+            print(f"Log Yazma Hatası: {len(rejected)} kayıt reddedildi -> {self.rejected_path}")
+            self._spill(rejected, self.rejected_path)
+
+    def _connection_lost(self, error):
+        if isinstance(error, (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError)):
+            return True
+        try: return not self._conn.is_connected()
+        except Exception: return True
+
+    def _on_connection_lost(self, error, entries):
+        print(f"Log Yazma Hatası: {error}")
+        self._disconnect()
+        self._next_connect = time.monotonic() + RETRY_INTERVAL_SEC
+        self._spill(entries)
+
+    # --- Yerel dosya ---
+    def _spill(self, entries, path=None):
+        with self._spill_lock:
+            try:
+                with open(path or self.spill_path, "a", encoding="utf-8") as f:
+                    for entry in entries:
+                        f.write(json.dumps(list(entry), ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Log dosyasına yazılamadı: {e}")
+
+    def _take_spilled(self):
+        """Dökülmüş kayıtları okuyup dosyayı boşaltır (yeniden gönderim için)."""
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path): return []
+            entries = []
+            try:
+                with open(self.spill_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try: entries.append(tuple(json.loads(line)))
+                        except ValueError: continue
+                os.remove(self.spill_path)
+            except OSError as e:
+                print(f"Log dosyası okunamadı: {e}")
+            return entries
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_sink():
+    """Süreç başına tek bir yazıcı; çıkışta otomatik boşaltılır."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = AuditLogSink()
+            atexit.register(_sink.close)
+        return _sink
@@ -0,0 +1,250 @@
+# DOSYA ADI: benchmark_analysis.py
+# Analiz hattı mikro ölçümleri + doğruluk kontrolü.
+# signal_generator ile 10 sn'den 8 saate kadar kayıtlar üretilir; analyze_tremor ve
+# analyze_bradykinesia'nın her aşaması (filtre, zarf, spektrum, tepe bulma, PDF) ayrı ayrı
+# zamanlanır ve kayıt uzunluğuna göre ölçeklenme üssü (log-log eğim) raporlanır.
+# Üreticinin bildiği gerçek değerler, skor fonksiyonları için doğruluk gerileme testi olarak kullanılır.
+#
+# Kullanım:
+#   python benchmark_analysis.py                         # ölçüm + doğruluk
+#   python benchmark_analysis.py --lengths 10,60,600 --json analiz.json
+#   python benchmark_analysis.py --check                 # yalnızca doğruluk (CI, çıkış kodu 1 = hata)
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+import analyze_bradykinesia as brady
+import analyze_tremor as tremor
+import calibration
+import signal_generator as gen
+
+# --- AYARLAR ---
+LENGTHS_SEC = (10, 60, 600, 3600, 28800)   # 10 sn ... 8 saat
+MIN_TIME_SEC = 0.2                         # Kısa aşamalar bu süreyi dolduracak kadar tekrarlanır
+MAX_REPEATS = 50
+PDF_MAX_SEC = 28800                        # Bundan uzun kayıtlarda tam run_analysis (PDF) atlanır
+
+IDENTITY = calibration.CalibrationProfile()   # Ölçüm cihaz kalibrasyonundan bağımsız olsun
+# Bradikinezi raporu sayfayı yalnızca stimülasyon bilgisi varken kaydeder; PDF yolu tam ölçülsün diye verilir
+BENCH_STIM = {"ch1": {"hz": 130, "pw": 60, "amp": 2}, "ch2": {"hz": 130, "pw": 60, "amp": 2}}
+
+# Doğruluk senaryoları: (ad, üretici parametreleri); beklenen değerleri üretici döndürür
+TREMOR_CASES = [
+    ("parkinson_5hz_orta", dict(freq_hz=5.0, amp_g=0.20)),
+    ("parkinson_4_5hz_siddetli", dict(freq_hz=4.5, amp_g=0.40)),
+    ("parkinson_6hz_hafif", dict(freq_hz=6.0, amp_g=0.08)),
+    ("parkinson_5_5hz_cok_hafif", dict(freq_hz=5.5, amp_g=0.04)),
+    ("fizyolojik_9hz", dict(freq_hz=9.0, amp_g=0.05)),
+    ("istemli_3hz", dict(freq_hz=3.0, amp_g=0.20)),
+    ("gurultu", dict(freq_hz=5.0, amp_g=0.01)),
+    ("frekans_kaymasi", dict(freq_hz=5.0, amp_g=0.15, freq_drift_hz=0.3)),
+]
+TAPPING_CASES = [
+    ("duzenli", dict()),
+    ("iki_takilma", dict(hesitations=2)),
+    ("dort_takilma", dict(hesitations=4)),
+    ("yorulma", dict(decrement=1.5)),
+    ("duzensiz_ritim", dict(jitter=0.15)),
+    ("yavas", dict(rate_hz=1.0)),
+]
+FREQ_TOL_HZ = 0.25
+PEAK_TOL = 0.10        # Bağıl
+SLOPE_TOL = 0.3        # derece/sn / hareket
+ACCURACY_SEC = 60
+
+
+def _quiet(fn, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def timeit(fn, *args):
+    """Medyan süre (sn) ve son dönüş değeri; kısa işlemler MIN_TIME_SEC dolana kadar tekrarlanır."""
+    times, result = [], None
+    started = time.perf_counter()
+    while len(times) < MAX_REPEATS and (not times or time.perf_counter() - started < MIN_TIME_SEC):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)), result
+
+
+# ========================================================
+# AŞAMA ÖLÇÜMLERİ
+# ========================================================
+
+def tremor_stages(path, raw, run_pdf):
+    """analyze_tremor.run_analysis ile aynı sırayla ve aynı parametrelerle aşama süreleri."""
+    fs = tremor.FS
+    stages = {}
+    stages["read_csv"], _ = timeit(pd.read_csv, path)
+    df = pd.DataFrame(raw, columns=gen.RAW_COLUMNS)
+    stages["magnitude"], mag = timeit(lambda: (np.sqrt(df['AccX']**2 + df['AccY']**2 + df['AccZ']**2) / tremor.ACC_SCALE_FACTOR).to_numpy())
+    stages["bandpass_filter"], sig = timeit(tremor.butter_bandpass_filter, mag, tremor.TREMOR_BAND[0], tremor.TREMOR_BAND[1], fs)
+    window = int(fs * 1.0)
+    stages["rolling_envelope"], env = timeit(lambda: pd.Series(sig).rolling(window=window, center=True).std().fillna(0).values * np.sqrt(2))
+    stages["percentile"], _ = timeit(np.percentile, env, 95)
+    stages["dominant_freq"], _ = timeit(tremor.calculate_fft_dominant, sig, fs)
+    if run_pdf: _add_total(stages, tremor.run_analysis, path)
+    return stages
+
+
+def brady_stages(path, raw, run_pdf):
+    """analyze_bradykinesia.run_analysis ile aynı sırayla ve aynı parametrelerle aşama süreleri."""
+    fs = brady.FS
+    stages = {}
+    stages["read_csv"], _ = timeit(pd.read_csv, path)
+    gyro = raw[:, 3:] / 131.0
+    stages["axis_select"], axis = timeit(lambda: int(np.argmax(np.std(gyro, axis=0))))
+    stages["lowpass_filter"], smooth = timeit(brady.butter_lowpass_filter, gyro[:, axis], brady.LOW_PASS_CUTOFF, fs)
+    abs_signal = np.abs(smooth)
+    stages["find_peaks"], (peaks, _) = timeit(find_peaks, abs_signal, brady.MIN_PEAK_HEIGHT, None, brady.MIN_PEAK_DIST)
+    stages["fft"], _ = timeit(brady.calculate_fft, smooth, fs)
+    intervals = np.diff(peaks / fs)
+    stages["rhythm_metrics"], _ = timeit(lambda: (brady.calculate_cv(intervals), brady.calculate_slope(abs_signal[peaks])))
+    if run_pdf: _add_total(stages, brady.run_analysis, path)
+    return stages
+
+
+def _add_total(stages, run_analysis, path):
+    # PDF çizimi run_analysis içinde gömülü: toplamdan hesap aşamaları düşülerek kestirilir
+    t0 = time.perf_counter()
+    _quiet(run_analysis, path, BENCH_STIM, IDENTITY)
+    total = time.perf_counter() - t0
+    stages["run_analysis_total"] = total
+    stages["pdf_render_est"] = max(total - sum(v for k, v in stages.items() if k != "run_analysis_total"), 0.0)
+
+
+def scaling(lengths, series):
+    """Ardışık uzunluklar arası log-log eğim: ~1 doğrusal, ~1.1 n log n, >1.3 doğrusal üstü."""
+    out = []
+    for (n1, t1), (n2, t2) in zip(zip(lengths, series), zip(lengths[1:], series[1:])):
+        out.append(round(float(np.log(t2 / t1) / np.log(n2 / n1)), 2) if t1 > 0 and t2 > 0 else None)
+    return out
+
+
+def run_timing(lengths, workdir, pdf_max_sec=PDF_MAX_SEC):
+    results = {"Tremor": {}, "Bradikinezi": {}}
+    for seconds in lengths:
+        print(f"⏳ {seconds} sn ({seconds * tremor.FS:,.0f} örnek) ölçülüyor...", flush=True)
+        for test, make, measure in (("Tremor", gen.tremor_signal, tremor_stages),
+                                    ("Bradikinezi", gen.tapping_signal, brady_stages)):
+            raw, _ = make(seconds)
+            path = gen.write_csv(os.path.join(workdir, f"{test}_{seconds}.csv"), raw)
+            results[test][seconds] = measure(path, raw, seconds <= pdf_max_sec)
+            os.remove(path)
+    report = {}
+    for test, by_length in results.items():
+        stage_names = list(dict.fromkeys(k for stages in by_length.values() for k in stages))
+        report[test] = {}
+        for stage in stage_names:
+            present = [s for s in lengths if stage in by_length[s]]
+            times = [by_length[s][stage] for s in present]
+            report[test][stage] = {
+                "lengths_sec": present,
+                "seconds": [round(t, 6) for t in times],
+                "ns_per_sample": [round(t / (s * tremor.FS) * 1e9, 1) for t, s in zip(times, present)],
+                "scaling_exponent": scaling(present, times),
+            }
+    return report
+
+
+def print_timing(report):
+    for test, stages in report.items():
+        lengths = max((v["lengths_sec"] for v in stages.values()), key=len)
+        print(f"\n🔹 {test} (sn; parantez içi ölçeklenme üssü)")
+        print(f"   {'aşama':<22}" + "".join(f"{_label(s):>12}" for s in lengths) + f"{'üs':>14}")
+        for stage, data in stages.items():
+            cells = {s: t for s, t in zip(data["lengths_sec"], data["seconds"])}
+            exps = ", ".join(f"{e}" for e in data["scaling_exponent"] if e is not None)
+            print(f"   {stage:<22}" + "".join(f"{cells[s]:>12.4f}" if s in cells else f"{'-':>12}" for s in lengths) + f"   ({exps})")
+
+
+def _label(seconds):
+    return f"{seconds // 3600}sa" if seconds >= 3600 else (f"{seconds // 60}dk" if seconds >= 60 else f"{seconds}sn")
+
+
+# ========================================================
+# DOĞRULUK
+# ========================================================
+
+def run_accuracy(workdir):
+    """Her senaryoda analiz sonucu üreticinin gerçek değerleriyle karşılaştırılır: [(test, senaryo, alan, beklenen, bulunan, geçti)]."""
+    checks = []
+    path = os.path.join(workdir, "dogruluk.csv")
+    for name, params in TREMOR_CASES:
+        raw, truth = gen.tremor_signal(ACCURACY_SEC, **params)
+        metrics = _quiet(tremor.run_analysis, gen.write_csv(path, raw), None, IDENTITY) or {}
+        found_f, found_p = metrics.get("dominant_freq", np.nan), metrics.get("peak_g", np.nan)
+        checks.append(("Tremor", name, "updrs", truth["updrs"], metrics.get("updrs"), metrics.get("updrs") == truth["updrs"]))
+        if truth["peak_g"] >= 0.03:   # Gürültü altındaki sinyalde frekans anlamsız
+            checks.append(("Tremor", name, "dominant_freq", truth["dominant_freq"], found_f, abs(found_f - truth["dominant_freq"]) <= FREQ_TOL_HZ))
+        checks.append(("Tremor", name, "peak_g", truth["peak_g"], found_p, abs(found_p - truth["peak_g"]) <= PEAK_TOL * truth["peak_g"] + 0.005))
+
+    for name, params in TAPPING_CASES:
+        raw, truth = gen.tapping_signal(ACCURACY_SEC, **params)
+        metrics = _quiet(brady.run_analysis, gen.write_csv(path, raw), None, IDENTITY) or {}
+        duration = (len(raw) - 1) / brady.FS
+        movements = round(metrics.get("speed", np.nan) / 100.0 * 2.0 * duration) if metrics else None
+        checks.append(("Bradikinezi", name, "hesitations", truth["hesitations"], metrics.get("hesitations"), metrics.get("hesitations") == truth["hesitations"]))
+        checks.append(("Bradikinezi", name, "amp_slope", truth["amp_slope"], metrics.get("amp_slope"), abs(metrics.get("amp_slope", np.inf) - truth["amp_slope"]) <= SLOPE_TOL))
+        if truth["rate_hz"] <= 2.0:   # Hız skoru 2 Hz'de %100'e doyar; hareket sayısı altında geri çözülebilir
+            checks.append(("Bradikinezi", name, "movements", truth["movements"], movements, movements is not None and abs(movements - truth["movements"]) <= 1))
+    if os.path.exists(path): os.remove(path)
+    return checks
+
+
+def print_accuracy(checks, verbose=False):
+    failed = [c for c in checks if not c[5]]
+    print(f"\n🎯 Doğruluk: {len(checks) - len(failed)}/{len(checks)} kontrol geçti")
+    for test, name, field, expected, found, ok in checks:
+        if not ok or verbose:
+            mark = "✅" if ok else "❌"
+            print(f"   {mark} {test:<12} {name:<26} {field:<14} beklenen {expected}  bulunan {_fmt(found)}")
+    return failed
+
+
+def _fmt(value):
+    return f"{float(value):.3f}" if isinstance(value, (int, float, np.floating, np.integer)) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analiz hattı mikro ölçümleri ve doğruluk kontrolü")
+    parser.add_argument("--lengths", default=",".join(map(str, LENGTHS_SEC)), help="Kayıt uzunlukları (sn), virgüllü")
+    parser.add_argument("--pdf-max", type=int, default=PDF_MAX_SEC, help="Bundan uzun kayıtlarda PDF'li tam analizi atla (sn)")
+    parser.add_argument("--check", action="store_true", help="Yalnızca doğruluk kontrollerini çalıştır")
+    parser.add_argument("--json", help="Sonucu bu dosyaya yaz")
+    parser.add_argument("-v", action="store_true", help="Geçen kontrolleri de listele")
+    args = parser.parse_args()
+
+    report = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                       "platform": platform.platform(), "fs": tremor.FS, "spectral_method": tremor.SPECTRAL_METHOD}}
+    with tempfile.TemporaryDirectory(prefix="neuromotion_analysis_") as workdir:
+        if not args.check:
+            report["timing"] = run_timing([int(x) for x in args.lengths.split(",")], workdir, args.pdf_max)
+            print_timing(report["timing"])
+        checks = run_accuracy(workdir)
+    failed = print_accuracy(checks, args.v)
+    report["accuracy"] = [{"test": t, "case": n, "field": f, "expected": e, "found": None if v is None else float(v), "passed": bool(ok)}
+                          for t, n, f, e, v, ok in checks]
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"\n💾 Sonuç yazıldı: {args.json}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
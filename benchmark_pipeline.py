@@ -0,0 +1,266 @@
+# DOSYA ADI: benchmark_pipeline.py
+# Uçtan uca okuma -> ekran -> kayıt -> analiz performans ölçümü.
+# Sanal cihaz (device_simulator.VirtualSerial) gerçek SerialWorker iş parçacığını besler;
+# örnekler uygulamadaki gibi kuyruklu sinyalle ParkinsonGUI.update_plot'a ulaşır.
+# Her hız x IMU kombinasyonu için ölçülenler:
+#   - örnek/sn, üretilen / ayrıştırılan / ekrana işlenen / düşen örnek sayısı
+#   - aşama gecikmeleri (yüzdelik): ayrıştırma (readline -> emit), kuyruk (emit -> GUI), update_plot
+#   - bellek artışı (RSS), save_data_to_csv süresi ve her iki analiz modülünün run_analysis süresi
+# Sonuç JSON olarak yazılabilir ve kaydedilmiş bir referansla (baseline) karşılaştırılır;
+# tolerans dışındaki gerilemelerde çıkış kodu 1'dir (CI için).
+#
+# Kullanım:
+#   python benchmark_pipeline.py --json sonuc.json
+#   python benchmark_pipeline.py --save-baseline benchmark_baseline.json
+#   python benchmark_pipeline.py --baseline benchmark_baseline.json --tolerance 0.25
+
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+
+from PyQt6.QtCore import Qt, QEventLoop, QTimer
+from PyQt6.QtWidgets import QApplication
+
+from closed_loop import LatencyStats
+from device_simulator import serial_factory
+
+# --- AYARLAR ---
+RATES = (50, 200, 1000)
+IMU_COUNTS = (1, 12)
+DURATION_SEC = 5.0
+DRAIN_SEC = 2.0              # Süre bitiminde kuyruğun boşalması için bekleme
+WARMUP_SEC = 1.0             # İlk çizim/önbellek maliyetleri ölçüme girmesin diye atılan ısınma turu
+TOLERANCE = 0.25             # Referansa göre izin verilen kötüleşme oranı
+BENCH_DOCTOR = {"id": 0, "name": "Benchmark", "username": "benchmark", "role": "doctor"}
+
+# Referans karşılaştırmasında izlenen alanlar: (yol, daha büyük daha iyi mi, gürültü eşiği)
+# Gürültü eşiğinden küçük mutlak farklar oran ne olursa olsun gerileme sayılmaz.
+TRACKED = [
+    (("samples_per_sec",), True, 0),
+    (("dropped",), False, 0),
+    (("latency", "parse", "p99_us"), False, 200),
+    (("latency", "queue", "p99_us"), False, 500),
+    (("latency", "update_plot", "p99_us"), False, 200),
+    (("memory_mb", "growth"), False, 5.0),
+    (("save_csv_sec",), False, 0.05),
+    (("analysis_sec", "Tremor"), False, 0.1),
+    (("analysis_sec", "Bradikinezi"), False, 0.1),
+]
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource   # Linux dışı: tepe RSS (artış ölçümü kaba olur)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _wait(seconds, until=None):
+    """Olay döngüsünü süre dolana (ya da until() doğru olana) kadar çalıştırır; yoklama yapmaz."""
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    poll = QTimer()
+    if until:
+        poll.timeout.connect(lambda: until() and loop.quit()); poll.start(10)
+    loop.exec()
+    poll.stop()
+
+
+class PipelineProbe:
+    """Aşama zamanlarını toplar. Emit zamanları okuma iş parçacığında (doğrudan bağlantı) kuyruğa
+    yazılır; kuyruklu sinyaller sırayı koruduğundan GUI tarafı aynı sırayla tüketir."""
+
+    def __init__(self, gui, worker, factory):
+        self.gui = gui
+        self.factory = factory
+        self.emitted = deque()
+        self.parsed = 0
+        self.displayed = 0
+        self.parse = LatencyStats()
+        self.queue = LatencyStats()
+        self.update_plot = LatencyStats()
+        worker.data_received.connect(self.on_emit, Qt.ConnectionType.DirectConnection)
+        worker.data_received.connect(self.on_display)   # Uygulamadaki yol: kuyruklu bağlantı
+
+    def on_emit(self, _):
+        now = time.perf_counter()
+        read_at = getattr(self.factory.last, "last_read", None)
+        if read_at is not None: self.parse.record(now - read_at)
+        self.emitted.append(now)
+        self.parsed += 1
+
+    def on_display(self, data):
+        start = time.perf_counter()
+        if self.emitted: self.queue.record(start - self.emitted.popleft())
+        self.gui.update_plot(data)
+        self.update_plot.record(time.perf_counter() - start)
+        self.displayed += 1
+
+
+def _timed_factory(factory):
+    """readline'ın döndüğü anı cihaz nesnesine yazar (ayrıştırma gecikmesinin başlangıcı)."""
+    def wrapped(*args, **kwargs):
+        ser = factory(*args, **kwargs)
+        readline = ser.readline
+        def timed_readline():
+            line = readline(); ser.last_read = time.perf_counter(); return line
+        ser.readline = timed_readline
+        wrapped.last = ser
+        return ser
+    wrapped.last = None
+    return wrapped
+
+
+def run_case(gui, rate, imus, duration, workdir, analysis=True):
+    from gui_app import SerialWorker
+    factory = _timed_factory(serial_factory("tremor", rate, imus))
+    worker = SerialWorker("SIM", serial_factory=factory)
+    probe = PipelineProbe(gui, worker, factory)
+
+    gui.recording_data = []
+    gui.is_recording = True
+    gui.current_filename = os.path.join(workdir, f"BENCH_{rate}Hz_{imus}imu.csv")
+    gui.stim_log.start_recording()
+    gui.reset_plot_buffer()
+
+    rss_start = _rss_mb()
+    started = time.perf_counter()
+    worker.start()
+    _wait(duration)
+    worker.is_running = False
+    worker.wait(2000)
+    elapsed = time.perf_counter() - started
+    _wait(DRAIN_SEC, until=lambda: probe.displayed >= probe.parsed)
+    gui.is_recording = False
+    gui.stim_log.stop_recording()
+    rss_end = _rss_mb()
+
+    produced = factory.last.stream.sent if factory.last else 0
+    result = {
+        "rate": rate, "imus": imus, "duration_sec": round(elapsed, 3),
+        "produced": produced, "parsed": probe.parsed, "displayed": probe.displayed,
+        "dropped": produced - probe.displayed,
+        "samples_per_sec": round(probe.displayed / elapsed, 1),
+        "latency": {"parse": probe.parse.summary(), "queue": probe.queue.summary(), "update_plot": probe.update_plot.summary()},
+        "memory_mb": {"start": round(rss_start, 1), "end": round(rss_end, 1), "growth": round(rss_end - rss_start, 1)},
+    }
+
+    started = time.perf_counter()
+    saved = gui.save_data_to_csv()
+    result["save_csv_sec"] = round(time.perf_counter() - started, 4)
+    result["recorded_rows"] = len(gui.recording_data)
+
+    if analysis and saved:
+        import analyze_bradykinesia
+        import analyze_tremor
+        result["analysis_sec"] = {}
+        for mode, module in (("Tremor", analyze_tremor), ("Bradikinezi", analyze_bradykinesia)):
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                module.run_analysis(gui.current_filename, None, gui.calibration.get())
+            result["analysis_sec"][mode] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def _get(result, path):
+    for key in path:
+        if not isinstance(result, dict) or key not in result: return None
+        result = result[key]
+    return result
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """Referansa göre tolerans dışı kötüleşmeler: [(durum, alan, referans, güncel, oran)]."""
+    regressions = []
+    for case, result in current["runs"].items():
+        base = baseline.get("runs", {}).get(case)
+        if not base: continue
+        for path, higher_is_better, floor in TRACKED:
+            old, new = _get(base, path), _get(result, path)
+            if old is None or new is None or abs(new - old) <= floor: continue
+            if path == ("dropped",):
+                # Düşen örnek sayısı mutlak karşılaştırılır (referans 0 ise her kayıp gerilemedir)
+                if new > old * (1 + tolerance): regressions.append((case, ".".join(path), old, new, None))
+                continue
+            if old <= 0: continue
+            ratio = new / old
+            worse = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+            if worse: regressions.append((case, ".".join(path), old, new, ratio))
+    return regressions
+
+
+def print_report(report):
+    print(f"\n{'Durum':<14}{'örnek/sn':>10}{'düşen':>8}{'parse p99':>11}{'kuyruk p99':>12}{'plot p99':>10}"
+          f"{'RAM +MB':>9}{'CSV sn':>8}{'Tremor sn':>10}{'Bradi sn':>10}")
+    for case, r in report["runs"].items():
+        lat = r["latency"]
+        p99 = lambda s: f"{s['p99_us'] / 1000:.2f}ms" if s.get("count") else "-"
+        analysis = r.get("analysis_sec", {})
+        print(f"{case:<14}{r['samples_per_sec']:>10.0f}{r['dropped']:>8}{p99(lat['parse']):>11}{p99(lat['queue']):>12}"
+              f"{p99(lat['update_plot']):>10}{r['memory_mb']['growth']:>9.1f}{r['save_csv_sec']:>8.3f}"
+              f"{analysis.get('Tremor', float('nan')):>10.3f}{analysis.get('Bradikinezi', float('nan')):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uçtan uca okuma/ekran/kayıt/analiz performans ölçümü")
+    parser.add_argument("--rates", default=",".join(map(str, RATES)), help="Örnekleme hızları (Hz), virgüllü")
+    parser.add_argument("--imus", default=",".join(map(str, IMU_COUNTS)), help="IMU sayıları, virgüllü")
+    parser.add_argument("--duration", type=float, default=DURATION_SEC, help="Durum başına süre (sn)")
+    parser.add_argument("--no-analysis", action="store_true", help="Analiz modüllerini çalıştırma")
+    parser.add_argument("--json", help="Sonucu bu dosyaya yaz")
+    parser.add_argument("--baseline", help="Karşılaştırılacak referans JSON")
+    parser.add_argument("--save-baseline", help="Sonucu referans olarak kaydet")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    import gui_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        gui = gui_app.ParkinsonGUI(BENCH_DOCTOR)
+    # Ölçüm kayıtları hasta veritabanına yazılmaz
+    gui.db.add_test = lambda *a, **k: None
+
+    report = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                       "platform": platform.platform(), "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+                       "duration_sec": args.duration},
+              "runs": {}}
+    with tempfile.TemporaryDirectory(prefix="neuromotion_bench_") as workdir:
+        run_case(gui, RATES[0], IMU_COUNTS[0], WARMUP_SEC, workdir, analysis=False)
+        for rate in [int(x) for x in args.rates.split(",")]:
+            for imus in [int(x) for x in args.imus.split(",")]:
+                case = f"{rate}Hz_{imus}imu"
+                print(f"⏳ {case} ölçülüyor...", flush=True)
+                report["runs"][case] = run_case(gui, rate, imus, args.duration, workdir, not args.no_analysis)
+    print_report(report)
+
+    for path in filter(None, (args.json, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"\n💾 Sonuç yazıldı: {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if not regressions:
+            print(f"\n✅ Referansa göre gerileme yok (tolerans %{args.tolerance * 100:.0f})."); return 0
+        print(f"\n❌ {len(regressions)} gerileme (tolerans %{args.tolerance * 100:.0f}):")
+        for case, field, old, new, ratio in regressions:
+            print(f"   {case:<14} {field:<28} {old} -> {new}" + (f"  (x{ratio:.2f})" if ratio else ""))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+# DOSYA ADI: calibration.py
+# Cihaz / IMU bazlı kalibrasyon kaydı ve vektörel uygulama.
+# Düzeltme modeli (her IMU için):  y = C · (s ⊙ (x − b))
+#   b: ofset (6), s: ölçek (6), C: eksenler arası 6x6 matris (varsayılan birim matris)
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# --- AYARLAR ---
+N_IMU = 12
+AXES = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
+AXIS_KEYS = ["ax", "ay", "az", "gx", "gy", "gz"]
+DEFAULT_DEVICE_ID = "Main_Device"
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kalibrasyon_cache.json")
+CACHE_TTL_SEC = 300.0
+
+
+def imu_columns(n_imu=N_IMU):
+    """IMU1_AccX ... IMU12_GyroZ sütun adları (72 adet)."""
+    return [f"IMU{i+1}_{axis}" for i in range(n_imu) for axis in AXES]
+
+
+def imu_columns_in(columns):
+    """DataFrame'de eksiksiz bulunan IMU bloklarının sütunları ve IMU indeksleri."""
+    present = set(columns)
+    cols, indices = [], []
+    for i in range(N_IMU):
+        block = [f"IMU{i+1}_{axis}" for axis in AXES]
+        if all(c in present for c in block):
+            cols.extend(block)
+            indices.append(i)
+    return cols, indices
+
+
+class CalibrationProfile:
+    def __init__(self, offsets=None, scales=None, cross_axis=None, device_id=DEFAULT_DEVICE_ID, calibrated_at=None):
+        self.device_id = device_id
+        self.calibrated_at = calibrated_at
+        self.offsets = np.zeros((N_IMU, 6)) if offsets is None else np.asarray(offsets, dtype=float).reshape(N_IMU, 6)
+        self.scales = np.ones((N_IMU, 6)) if scales is None else np.asarray(scales, dtype=float).reshape(N_IMU, 6)
+        self.cross_axis = None if cross_axis is None else np.asarray(cross_axis, dtype=float).reshape(N_IMU, 6, 6)
+
+    @property
+    def is_identity(self):
+        return (not self.offsets.any()) and np.all(self.scales == 1.0) and self.cross_axis is None
+
+    def _linear_map(self, imu_indices):
+        """Seçili IMU'lar için düzleştirilmiş ofset vektörü ve (blok köşegen) doğrusal dönüşüm."""
+        idx = np.asarray(imu_indices)
+        offset = self.offsets[idx].ravel()
+        if self.cross_axis is None:
+            return offset, self.scales[idx].ravel()
+        k = len(idx)
+        matrix = np.zeros((k * 6, k * 6))
+        for j, imu in enumerate(idx):
+            matrix[j*6:(j+1)*6, j*6:(j+1)*6] = self.cross_axis[imu] * self.scales[imu][np.newaxis, :]
+        return offset, matrix
+
+    def apply(self, data, imu_indices=None):
+        """
+        (n, 6k) ham veriye kalibrasyonu tek bir yayınlanmış (broadcast) işlemle uygular.
+        imu_indices verilmezse sütunların IMU1'den başlayarak sıralı olduğu varsayılır.
+        """
+        x = np.asarray(data, dtype=float)
+        if imu_indices is None:
+            imu_indices = range(x.shape[-1] // 6)
+        offset, linear = self._linear_map(list(imu_indices))
+        if linear.ndim == 1:
+            return (x - offset) * linear
+        return (x - offset) @ linear.T
+
+    # --- Serileştirme ---
+    def to_entries(self):
+        """TestDatabase.save_calibration_set için IMU başına satırlar."""
+        entries = []
+        for i in range(N_IMU):
+            entry = {"imu_index": i}
+            for j, key in enumerate(AXIS_KEYS):
+                entry[f"offset_{key}"] = float(self.offsets[i, j])
+                entry[f"scale_{key}"] = float(self.scales[i, j])
+            entry["cross_axis"] = json.dumps(self.cross_axis[i].tolist()) if self.cross_axis is not None else None
+            entries.append(entry)
+        return entries
+
+    @classmethod
+    def from_rows(cls, rows, device_id=DEFAULT_DEVICE_ID):
+        """device_calibration satırlarından profil oluşturur (eksik IMU'lar birim kalır)."""
+        offsets = np.zeros((N_IMU, 6))
+        scales = np.ones((N_IMU, 6))
+        cross_axis = None
+        calibrated_at = None
+        for row in rows:
+            i = int(row.get("imu_index") or 0)
+            if not 0 <= i < N_IMU: continue
+            offsets[i] = [row.get(f"offset_{k}") or 0.0 for k in AXIS_KEYS]
+            scales[i] = [row.get(f"scale_{k}") if row.get(f"scale_{k}") is not None else 1.0 for k in AXIS_KEYS]
+            if row.get("cross_axis"):
+                if cross_axis is None:
+                    cross_axis = np.tile(np.eye(6), (N_IMU, 1, 1))
+                cross_axis[i] = np.asarray(json.loads(row["cross_axis"]), dtype=float).reshape(6, 6)
+            stamp = row.get("calibrated_at")
+            if stamp is not None:
+                calibrated_at = str(stamp) if calibrated_at is None else max(calibrated_at, str(stamp))
+        return cls(offsets, scales, cross_axis, device_id=device_id, calibrated_at=calibrated_at)
+
+    def to_dict(self):
+        return {
+            "device_id": self.device_id,
+            "calibrated_at": self.calibrated_at,
+            "offsets": self.offsets.tolist(),
+            "scales": self.scales.tolist(),
+            "cross_axis": None if self.cross_axis is None else self.cross_axis.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get("offsets"), d.get("scales"), d.get("cross_axis"),
+                   device_id=d.get("device_id", DEFAULT_DEVICE_ID), calibrated_at=d.get("calibrated_at"))
+
+    @classmethod
+    def from_legacy_module(cls):
+        """Eski kalibrasyon_verisi.py dosyası (yalnızca IMU1 ofsetleri). Yoksa None."""
+        try:
+            import kalibrasyon_verisi as kv
+        except ImportError:
+            return None
+        offsets = np.zeros((N_IMU, 6))
+        offsets[0] = [kv.OFFSET_AX, kv.OFFSET_AY, kv.OFFSET_AZ, kv.OFFSET_GX, kv.OFFSET_GY, kv.OFFSET_GZ]
+        return cls(offsets, device_id="legacy")
+
+
+# ========================================================
+# YEREL ÖNBELLEK (çevrimdışı çalışma için)
+# ========================================================
+
+def _read_cache_file(path=CACHE_PATH):
+    if not os.path.exists(path): return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Kalibrasyon önbelleği okunamadı: {e}")
+        return {}
+
+
+def _write_cache_file(data, path=CACHE_PATH):
+    try:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Kalibrasyon önbelleği yazılamadı: {e}")
+
+
+def load_profile(device_id=DEFAULT_DEVICE_ID, cache_path=CACHE_PATH):
+    """Veritabanı olmadan profil yükler: yerel önbellek -> eski .py dosyası -> birim profil."""
+    cached = _read_cache_file(cache_path).get(device_id)
+    if cached:
+        return CalibrationProfile.from_dict(cached)
+    legacy = CalibrationProfile.from_legacy_module()
+    return legacy if legacy is not None else CalibrationProfile(device_id=device_id)
+
+
+class CalibrationService:
+    """Cihaz başına kalibrasyon profillerini veritabanından okur, bellekte ve diskte önbellekler."""
+
+    def __init__(self, db=None, cache_path=CACHE_PATH, ttl=CACHE_TTL_SEC):
+        self.db = db
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._profiles = {}  # device_id -> (yüklenme zamanı, profil)
+        self._lock = threading.Lock()
+
+    def get(self, device_id=DEFAULT_DEVICE_ID):
+        with self._lock:
+            hit = self._profiles.get(device_id)
+            if hit and time.monotonic() - hit[0] < self.ttl:
+                return hit[1]
+
+        profile = None
+        rows = self.db.get_device_calibration(device_id) if self.db is not None else []
+        if rows:
+            profile = CalibrationProfile.from_rows(rows, device_id=device_id)
+            self._store_local(profile)
+        else:
+            profile = load_profile(device_id, self.cache_path)
+
+        with self._lock:
+            self._profiles[device_id] = (time.monotonic(), profile)
+        return profile
+
+    def save(self, profile, doctor="System"):
+        """Profili veritabanına yazar ve önbellekleri günceller. DB yoksa yalnızca yerel önbelleğe yazar."""
+        ok = self.db.save_calibration_set(profile.device_id, profile.to_entries(), doctor) if self.db is not None else False
+        self._store_local(profile)
+        with self._lock:
+            self._profiles[profile.device_id] = (time.monotonic(), profile)
+        return ok
+
+    def invalidate(self, device_id=None):
+        with self._lock:
+            if device_id is None: self._profiles.clear()
+            else: self._profiles.pop(device_id, None)
+
+    def apply(self, data, device_id=DEFAULT_DEVICE_ID, imu_indices=None):
+        return self.get(device_id).apply(data, imu_indices)
+
+    def _store_local(self, profile):
+        data = _read_cache_file(self.cache_path)
+        data[profile.device_id] = profile.to_dict()
+        _write_cache_file(data, self.cache_path)
@@ -0,0 +1,277 @@
+# DOSYA ADI: closed_loop.py
+# DENEYSEL kapalı döngü stimülasyon motoru.
+# SerialWorker'ın okuma (ingest) iş parçacığında her örnekte çalışır:
+#   örnek -> nedensel (causal) bant geçiren filtre -> kısa pencerede tremor bant gücü
+#   -> politika (policy) kancası -> gerekirse send_command ile STIM_* komutu.
+# Her kararın ve her gönderilen komutun gecikmesi (örnek okundu -> komut yazıldı)
+# ölçülür ve histogram olarak raporlanır. Komut gecikmesi yazımın gerçekten yapıldığı anda alınır:
+# servis yolunda (gui_app.ServiceWorker) komut önce kuyruğa girer, yazım servis döngüsünde olur.
+#
+# Donanımsız ölçüm: python closed_loop.py --rate 200 --duration 20 [--json]
+# (device_simulator'ın ataklı sentetik tremoru; stimülasyon komutları tremoru bastırır.)
+
+import argparse
+import json
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+# --- AYARLAR ---
+FS = 50.0                    # Varsayılan örnekleme frekansı
+BENCH_BURST_SEC = 8.0        # Kıyaslamada sanal tremor atak periyodu
+TREMOR_BAND = (3.5, 7.5)     # Parkinson tremor bandı (Hz)
+WINDOW_SEC = 0.5             # Bant gücü penceresi (nedensel, kayan)
+ACC_SCALE_FACTOR = 16384.0
+LATENCY_BINS_US = [0, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000, 100000, math.inf]
+
+
+# ========================================================
+# GECİKME İSTATİSTİĞİ
+# ========================================================
+
+class LatencyStats:
+    """Mikro saniye cinsinden gecikme örnekleri; son `maxlen` kadarı tutulur."""
+
+    def __init__(self, maxlen=100000):
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds * 1e6)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples: return {"count": 0}
+        x = np.fromiter(self.samples, dtype=float)
+        p50, p90, p99 = np.percentile(x, [50, 90, 99])
+        hist, _ = np.histogram(x, bins=LATENCY_BINS_US)
+        return {"count": self.count, "mean_us": float(x.mean()), "p50_us": float(p50), "p90_us": float(p90),
+                "p99_us": float(p99), "max_us": float(x.max()),
+                "histogram": {_bin_label(i): int(c) for i, c in enumerate(hist)}}
+
+    def format_histogram(self, width=40):
+        s = self.summary()
+        if not s["count"]: return "  (örnek yok)"
+        peak = max(s["histogram"].values()) or 1
+        lines = [f"  {label:>16} | {'#' * int(round(width * c / peak)):<{width}} {c}" for label, c in s["histogram"].items()]
+        lines.append(f"  p50 {s['p50_us']:.0f} us | p90 {s['p90_us']:.0f} us | p99 {s['p99_us']:.0f} us | max {s['max_us']:.0f} us")
+        return "\n".join(lines)
+
+
+def _bin_label(i):
+    low, high = LATENCY_BINS_US[i], LATENCY_BINS_US[i + 1]
+    return f"{low}-{high} us" if high != math.inf else f">={low} us"
+
+
+# ========================================================
+# NEDENSEL TREMOR BANT GÜCÜ
+# ========================================================
+
+class CausalBandPower:
+    """Örnek başına O(1): durumlu IIR bant geçiren + kayan ortalama kare (g^2)."""
+
+    def __init__(self, fs=FS, band=TREMOR_BAND, window_sec=WINDOW_SEC, order=2):
+        self.sos = butter(order, band, btype='band', fs=fs, output='sos')
+        self.zi = sosfilt_zi(self.sos) * 0.0
+        self.window = np.zeros(max(int(window_sec * fs), 1))
+        self.pos = 0
+        self.total = 0.0
+        self.filled = 0
+        self._x = np.zeros(1)
+
+    def update(self, value):
+        self._x[0] = value
+        y, self.zi = sosfilt(self.sos, self._x, zi=self.zi)
+        sq = float(y[0]) ** 2
+        self.total += sq - self.window[self.pos]
+        self.window[self.pos] = sq
+        self.pos = (self.pos + 1) % len(self.window)
+        self.filled = min(self.filled + 1, len(self.window))
+        return max(self.total, 0.0) / self.filled
+
+    def update_block(self, values):
+        """update() ile aynı sonuç, blok halinde (ör. shm_ring okuyucusu); bloğun sonundaki gücü döndürür."""
+        y, self.zi = sosfilt(self.sos, np.asarray(values, dtype=float), zi=self.zi)
+        for sq in y[-len(self.window):] ** 2:
+            self.total += sq - self.window[self.pos]
+            self.window[self.pos] = sq
+            self.pos = (self.pos + 1) % len(self.window)
+        self.filled = min(self.filled + len(y), len(self.window))
+        return max(self.total, 0.0) / max(self.filled, 1)
+
+
+# ========================================================
+# POLİTİKALAR
+# ========================================================
+# Politika: policy(power, engine) -> komut (str) ya da None. Motor durumunu (engine.active vb.)
+# okuyabilir; komutu motor gönderir ve gecikmesini ölçer.
+
+class ThresholdPolicy:
+    """Histerezisli aç/kapa: güç on_threshold'u aşınca STIM_START, off_threshold altına inince STIM_STOP."""
+
+    def __init__(self, channel=1, hz=130, pw=60, amp=2, on_threshold=0.004, off_threshold=0.001,
+                 min_interval_sec=1.0, warmup_sec=WINDOW_SEC):
+        self.channel = channel
+        self.hz, self.pw, self.amp = hz, pw, amp
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.min_interval = min_interval_sec
+        self.warmup = warmup_sec
+        self.active = False
+        self._last = -math.inf
+
+    def __call__(self, power, engine):
+        now = engine.clock()
+        if engine.elapsed < self.warmup or now - self._last < self.min_interval: return None
+        if not self.active and power > self.on_threshold:
+            self.active, self._last = True, now
+            return f"STIM_START:{self.channel}:{self.hz}:{self.pw}:{self.amp}"
+        if self.active and power < self.off_threshold:
+            self.active, self._last = False, now
+            return f"STIM_STOP:{self.channel}"
+        return None
+
+
+class ProportionalPolicy:
+    """Şiddeti bant genliğiyle orantılı ayarlar (STIM_UPDATE); değişiklikler hız sınırlıdır."""
+
+    def __init__(self, channel=1, hz=130, pw=60, gain=40.0, max_amp=10, min_interval_sec=0.5):
+        self.channel, self.hz, self.pw = channel, hz, pw
+        self.gain, self.max_amp = gain, max_amp
+        self.min_interval = min_interval_sec
+        self.amp = None
+        self._last = -math.inf
+
+    def __call__(self, power, engine):
+        now = engine.clock()
+        if now - self._last < self.min_interval: return None
+        amp = int(min(self.max_amp, round(self.gain * math.sqrt(power))))
+        if amp == self.amp: return None
+        self.amp, self._last = amp, now
+        return f"STIM_UPDATE:{self.channel}:{self.hz}:{self.pw}:{amp}"
+
+
+# ========================================================
+# MOTOR
+# ========================================================
+
+class ClosedLoopEngine:
+    """SerialWorker.closed_loop olarak takılır; on_sample okuma iş parçacığında çağrılır.
+    send(komut, yazıldı): komutu gönderir; yazıldı() cihaza yazım yapıldığı anda çağrılmalıdır.
+    on_command(komut): gönderilen her komuttan sonra okuma iş parçacığında çağrılır (GUI durumu için)."""
+
+    def __init__(self, send, policy=None, fs=FS, band=TREMOR_BAND, window_sec=WINDOW_SEC, clock=time.perf_counter,
+                 on_command=None):
+        self.send = send
+        self.on_command = on_command
+        self.policy = policy or ThresholdPolicy()
+        self.fs = fs
+        self.clock = clock
+        self.power = CausalBandPower(fs, band, window_sec)
+        self.decision_latency = LatencyStats()   # örnek okundu -> karar verildi (her örnek)
+        self.command_latency = LatencyStats()    # örnek okundu -> komut yazıldı
+        self.commands = []                       # (örnek no, komut, gecikme sn)
+        self.last_power = 0.0
+        self.samples = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return self.samples / self.fs
+
+    @property
+    def active(self):
+        return getattr(self.policy, "active", None)
+
+    def on_sample(self, raw, t_in):
+        """raw: ayrıştırılmış satır (ilk 3 değer IMU1 ivme), t_in: satırın okunduğu an (clock)."""
+        acc_g = math.sqrt(raw[0] * raw[0] + raw[1] * raw[1] + raw[2] * raw[2]) / ACC_SCALE_FACTOR
+        with self._lock:
+            if self.closed: return
+            self.samples += 1
+            self.last_power = self.power.update(acc_g)
+            command = self.policy(self.last_power, self)
+            self.decision_latency.record(self.clock() - t_in)
+            if command:
+                sample_no = self.samples
+                self.send(command, lambda: self._command_written(sample_no, command, t_in))
+        if command and self.on_command: self.on_command(command)
+
+    def _command_written(self, sample_no, command, t_in):
+        # Kilit alınmaz: SerialWorker yolunda send() içinden, on_sample kilidi tutulurken çağrılır
+        latency = self.clock() - t_in
+        self.command_latency.record(latency)
+        self.commands.append((sample_no, command, latency))
+
+    def override(self, active, send):
+        """Elle aç/kapa: komut (send()) ve politikanın durumu motor kilidi altında değişir; böylece
+        cihaza giden komut sırası ile politikanın bildiği durum hiçbir zaman ayrışmaz."""
+        with self._lock:
+            send()
+            if hasattr(self.policy, "active"): self.policy.active = active
+
+    def close(self):
+        """Dönüşten sonra komut gönderilmez (okuma iş parçacığı eski referansla on_sample çağırsa da)."""
+        with self._lock:
+            self.closed = True
+
+    def report(self):
+        return {"samples": self.samples, "commands": len(self.commands),
+                "decision_latency": self.decision_latency.summary(),
+                "command_latency": self.command_latency.summary()}
+
+
+# ========================================================
+# KIYASLAMA (BENCHMARK)
+# ========================================================
+
+def run_benchmark(rate=FS, duration=20.0, policy="threshold"):
+    """SerialWorker'ı sanal cihazla çalıştırır; motor okuma iş parçacığında karar verir."""
+    from gui_app import SerialWorker
+    from device_simulator import serial_factory
+
+    factory = serial_factory("tremor", rate, tremor_g=0.15, burst_period_sec=BENCH_BURST_SEC)
+    worker = SerialWorker("SIM", serial_factory=factory)
+    chosen = ProportionalPolicy() if policy == "proportional" else ThresholdPolicy()
+    engine = ClosedLoopEngine(lambda cmd, written: worker.send_command(cmd, False, written), chosen, fs=rate)
+    worker.closed_loop = engine
+
+    thread = threading.Thread(target=worker.run, name="SerialWorker-SIM", daemon=True)
+    thread.start()
+    time.sleep(duration)
+    worker.is_running = False
+    thread.join(2.0)
+
+    report = engine.report()
+    report.update({"rate_hz": rate, "duration_sec": duration, "policy": policy,
+                   "device_commands": len(factory.last.stream.commands) if factory.last else 0})
+    return engine, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kapalı döngü gecikme ölçümü (sanal cihaz)")
+    parser.add_argument("--rate", type=float, default=FS, help="Örnekleme hızı (Hz)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Süre (sn)")
+    parser.add_argument("--policy", choices=["threshold", "proportional"], default="threshold")
+    parser.add_argument("--json", action="store_true", help="Sonucu JSON olarak yazdır")
+    args = parser.parse_args()
+
+    engine, report = run_benchmark(args.rate, args.duration, args.policy)
+    if args.json:
+        print(json.dumps(report, indent=2)); return
+
+    print(f"\n⚡ Kapalı döngü ölçümü: {args.rate:.0f} Hz, {args.duration:.0f} sn, politika: {args.policy}")
+    print(f"🔹 İşlenen örnek: {report['samples']} | Gönderilen komut: {report['commands']}")
+    print("\n🔹 Karar gecikmesi (örnek okundu -> karar):")
+    print(engine.decision_latency.format_histogram())
+    print("\n🔹 Uçtan uca gecikme (örnek okundu -> komut yazıldı):")
+    print(engine.command_latency.format_histogram())
+
+
+if __name__ == "__main__":
+    main()
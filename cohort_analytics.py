@@ -0,0 +1,187 @@
+# DOSYA ADI: cohort_analytics.py
+# Hastalar arası (kohort) analiz katmanı.
+# patients x tests x test_metrics üç toplu sorguyla çekilir ve test başına bir satır,
+# metrik başına bir sütun olan sütunlu bir pandas tablosunda birleştirilir.
+# Tablo veritabanı imzası (satır sayıları + son güncellemeler) değişmedikçe yeniden
+# kurulmaz; gruplama, yüzdelik ve çapraz tablo sorguları bu önbellek üzerinde vektörel çalışır.
+# Kullanım: python cohort_analytics.py [dışa_aktarım.csv]
+
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from trend_engine import METRICS, STIM_METRICS
+
+# --- AYARLAR ---
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+# Sürekli sütunlar için hazır aralıklar (gruplamada by="<sütun>_bin" ile kullanılır)
+BINS = {
+    "years_since_onset": [0, 2, 5, 10, 20, np.inf],
+    "age": [0, 40, 50, 60, 70, 80, np.inf],
+    "stim_ch1_hz": [0, 60, 100, 140, 180, np.inf],
+    "stim_ch2_hz": [0, 60, 100, 140, 180, np.inf],
+    "dominant_freq": [0, 4, 7, np.inf],
+    "peak_g": [0, 0.03, 0.06, 0.10, 0.30, np.inf],
+}
+
+METRIC_COLUMNS = list(dict.fromkeys([key for names in METRICS.values() for key, _ in names] + STIM_METRICS))
+
+
+def _frame(table):
+    columns, rows = table
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def build_frame(tables):
+    """get_cohort_tables çıktısından test başına tek satırlık geniş tablo kurar."""
+    patients = _frame(tables["patients"]).rename(columns={"name": "patient_name", "doctor_name": "patient_doctor"})
+    tests = _frame(tables["tests"]).rename(columns={"uuid": "test_uuid"})
+    metrics = _frame(tables["test_metrics"])
+
+    # Uzun (test, metrik, değer) -> geniş (test x metrik): tek dağıtma (scatter) işlemi, pivot/merge yok
+    rows = pd.Index(tests["test_uuid"]).get_indexer(metrics["test_uuid"])
+    names = sorted(set(metrics["metric"]) | set(METRIC_COLUMNS))
+    cols = pd.Index(names).get_indexer(metrics["metric"])
+    keep = rows >= 0
+    wide = np.full((len(tests), len(names)), np.nan)
+    wide[rows[keep], cols[keep]] = metrics["value"].to_numpy(dtype=float)[keep]
+
+    frame = tests.merge(patients, on="patient_name", how="left")
+    frame = pd.concat([frame, pd.DataFrame(wide, columns=names, index=frame.index)], axis=1)
+    frame["test_date"] = pd.to_datetime(frame["test_date"], errors="coerce")
+    for col in ("age", "onset_year"):
+        frame[col] = pd.to_numeric(frame[col], errors="coerce")
+    frame["years_since_onset"] = frame["test_date"].dt.year - frame["onset_year"]
+    frame["analyzed"] = frame[[c for c in METRIC_COLUMNS if c in frame.columns]].notna().any(axis=1)
+    for col in ("test_type", "diagnosis", "gender", "dominant_side"):
+        frame[col] = frame[col].fillna("-").astype("category")
+    return frame
+
+
+class CohortAnalytics:
+    """Kohort tablosunun önbellekli sahibi ve sorgu API'si."""
+
+    def __init__(self, db):
+        self.db = db
+        self._frame = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self.last_build_sec = None
+
+    # --- Materyalizasyon ---
+    def frame(self, refresh=False):
+        """Güncel kohort tablosu. İmza değişmediyse önbellekteki tablo döner (tek hafif sorgu)."""
+        signature = self.db.get_cohort_signature()
+        with self._lock:
+            if not refresh and self._frame is not None and signature == self._signature:
+                return self._frame
+            started = time.perf_counter()
+            self._frame = build_frame(self.db.get_cohort_tables())
+            self._signature = signature
+            self.last_build_sec = time.perf_counter() - started
+            return self._frame
+
+    def select(self, test_type=None, analyzed_only=True, **filters):
+        """Filtrelenmiş görünüm. filters: sütun=değer ya da sütun=(alt, üst) (uçlar dahil, None açık)."""
+        df = self.frame()
+        mask = np.ones(len(df), dtype=bool)
+        if test_type: mask &= (df["test_type"] == test_type).to_numpy()
+        if analyzed_only: mask &= df["analyzed"].to_numpy()
+        for col, cond in filters.items():
+            if isinstance(cond, tuple):
+                low, high = cond
+                if low is not None: mask &= (df[col] >= low).to_numpy()
+                if high is not None: mask &= (df[col] <= high).to_numpy()
+            else:
+                mask &= (df[col] == cond).to_numpy()
+        return df[mask]
+
+    @staticmethod
+    def _group_keys(df, by):
+        keys = []
+        for col in ([by] if isinstance(by, str) else list(by)):
+            if col.endswith("_bin") and col[:-4] in BINS:
+                base = col[:-4]
+                keys.append(pd.cut(df[base], BINS[base], right=False).rename(col))
+            else:
+                keys.append(df[col])
+        return keys
+
+    # --- Sorgular ---
+    def group_stats(self, metric, by, test_type=None, percentiles=DEFAULT_PERCENTILES, **filters):
+        """Grup başına sayı, ortalama, std ve yüzdelikler.
+        Örn. group_stats("updrs", "diagnosis", "Tremor") ya da by="years_since_onset_bin"."""
+        df = self.select(test_type, **filters)
+        grouped = df[metric].groupby(self._group_keys(df, by), observed=True)
+        result = grouped.agg(["count", "mean", "std", "min", "max"])
+        if percentiles:
+            q = grouped.quantile([p / 100.0 for p in percentiles]).unstack()
+            q.columns = [f"p{p}" for p in percentiles]
+            result = result.join(q)
+        return result
+
+    def percentiles(self, metric, q=DEFAULT_PERCENTILES, test_type=None, **filters):
+        """Tüm kohortta bir metriğin yüzdelikleri: {p: değer}."""
+        values = self.select(test_type, **filters)[metric].dropna().to_numpy()
+        if len(values) == 0: return {p: np.nan for p in q}
+        return dict(zip(q, np.percentile(values, q)))
+
+    def crosstab(self, rows, cols, metric=None, agg="mean", test_type=None, **filters):
+        """Çapraz tablo: metric verilmezse test sayısı, verilirse agg (mean/median/count...) değeri."""
+        df = self.select(test_type, **filters)
+        row_keys, col_keys = self._group_keys(df, rows), self._group_keys(df, cols)
+        if metric is None:
+            return pd.crosstab(row_keys, col_keys)
+        return pd.crosstab(row_keys, col_keys, values=df[metric], aggfunc=agg)
+
+    def latest_per_patient(self, test_type=None, **filters):
+        """Her hastanın en son analizli testi (kohort karşılaştırmalarında tekrar ağırlığını önler)."""
+        df = self.select(test_type, **filters)
+        return df.sort_values("test_date").groupby("patient_name", observed=True).tail(1)
+
+    # --- Dışa aktarım ---
+    def export(self, path, frame=None):
+        """CSV, Excel (.xlsx, openpyxl gerekir) ya da Parquet (.parquet, pyarrow gerekir) olarak yazar."""
+        df = self.frame() if frame is None else frame
+        lower = path.lower()
+        if lower.endswith(".xlsx"):
+            df.to_excel(path, index=isinstance(df.index, pd.MultiIndex) or df.index.name is not None)
+        elif lower.endswith(".parquet"):
+            df.to_parquet(path)
+        else:
+            df.to_csv(path, index=df.index.name is not None or isinstance(df.index, pd.MultiIndex), encoding="utf-8-sig")
+        return path
+
+
+# ========================================================
+# KOMUT SATIRI ÖZETİ
+# ========================================================
+
+def main():
+    from database import TestDatabase
+    analytics = CohortAnalytics(TestDatabase())
+    df = analytics.frame()
+    print(f"📊 Kohort tablosu: {len(df)} test, {df['patient_name'].nunique()} hasta "
+          f"({analytics.last_build_sec * 1000:.0f} ms)")
+    if not df["analyzed"].any():
+        print("Analiz metriği kayıtlı test bulunamadı."); return
+
+    pd.set_option("display.width", 160)
+    print("\n🔹 Tremor MDS-UPDRS - tanıya göre:")
+    print(analytics.group_stats("updrs", "diagnosis", "Tremor").round(2))
+    print("\n🔹 Tremor tepe titreşim (g) - hastalık süresine göre:")
+    print(analytics.group_stats("peak_g", "years_since_onset_bin", "Tremor").round(3))
+    print("\n🔹 Ortalama MDS-UPDRS - tanı x K1 frekansı:")
+    print(analytics.crosstab("diagnosis", "stim_ch1_hz_bin", "updrs").round(2))
+
+    if len(sys.argv) > 1:
+        path = analytics.export(sys.argv[1])
+        print(f"\n✅ Kohort tablosu dışa aktarıldı: {path} ({datetime.now():%d.%m.%Y %H:%M})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,148 +1,76 @@
 # DOSYA ADI: database.py
 
+import sqlite3
 import mysql.connector
-from mysql.connector import errorcode
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from db_config import DB_CONFIG
+import audit_log
+import local_store
+import schema_migrations
+import sync_engine
+
+REMOTE_TIMEOUT_SEC = 5
+REMOTE_RETRY_SEC = 30
+STATS_TTL_SEC = 30
+LOG_COLUMNS = ('id', 'log_date', 'level', 'message', 'doctor_name')
 
 class TestDatabase:
     def __init__(self):
+        # All reads/writes go to the local SQLite mirror; the sync engine pushes/pulls MySQL in the background.
+        self.conn = local_store.open_store()
+        self.remote = None
+        self.remote_error = None     # Last remote read failure (None after a successful read)
+        self._next_remote = 0.0
         try:
-            self.conn = mysql.connector.connect(**DB_CONFIG)
-            self.ensure_columns_exist()
-            self.create_tables()
+            self.remote = mysql.connector.connect(**DB_CONFIG, connection_timeout=REMOTE_TIMEOUT_SEC)
         except mysql.connector.Error as err:
-            print(f"Bağlantı Hatası: {err}")
-            self.conn = None
+            print(f"Bağlantı Hatası: {err} (çevrimdışı mod, yerel veritabanı kullanılıyor)")
+            self.remote = None
+            self.remote_error = str(err)
+            self._next_remote = time.monotonic() + REMOTE_RETRY_SEC
+        if self.remote:
+            try:
+                # Only pending migrations run; an up-to-date schema costs a single SELECT
+                schema_migrations.migrate(self.remote)
+            except mysql.connector.Error as err:
+                print(f"Şema Güncelleme Hatası: {err}")
 
-    def ensure_columns_exist(self):
-        if not self.conn: return
-        cursor = self.conn.cursor()
-        
-        # Check and add columns to doctors table
-        try:
-            cursor.execute("SHOW COLUMNS FROM doctors")
-            columns = [row[0] for row in cursor.fetchall()]
-            
-            if 'email' not in columns:
-                # Add as NULLable first to avoid unique constraint issues with empty strings
-                cursor.execute("ALTER TABLE doctors ADD COLUMN email VARCHAR(100) NULL AFTER name")
-                self.conn.commit()
-                
-                # Update existing rows with default emails
-                cursor.execute("SELECT id, name FROM doctors")
-                docs = cursor.fetchall()
-                for doc_id, name in docs:
-                    email = name.lower().replace(" ", ".").replace("dr.", "dr") + "@neuromotion.com"
-                    cursor.execute("UPDATE doctors SET email = %s WHERE id = %s", (email, doc_id))
-                
-                # Now make it UNIQUE and NOT NULL
-                cursor.execute("ALTER TABLE doctors MODIFY COLUMN email VARCHAR(100) UNIQUE NOT NULL")
-                print("Added and initialized 'email' column.")
-            
-            if 'is_approved' not in columns:
-                cursor.execute("ALTER TABLE doctors ADD COLUMN is_approved TINYINT(1) DEFAULT 0")
-                # Set existing doctors to approved
-                cursor.execute("UPDATE doctors SET is_approved = 1")
-                print("Added 'is_approved' column and approved existing doctors.")
-                
-            if 'is_admin' not in columns:
-                cursor.execute("ALTER TABLE doctors ADD COLUMN is_admin TINYINT(1) DEFAULT 0")
-                # Set 'Admin' user to admin
-                cursor.execute("UPDATE doctors SET is_admin = 1 WHERE name LIKE '%Admin%'")
-                print("Added 'is_admin' column.")
-                
-            self.conn.commit()
-        except mysql.connector.Error as err:
-            if err.errno == errorcode.ER_NO_SUCH_TABLE:
-                pass # Table will be created in create_tables
-            else:
-                print(f"Sütun Kontrol Hatası: {err}")
-        finally:
-            cursor.close()
+        self.sync = sync_engine.get_engine()
+        self.sync.add_listener(TestDatabase.invalidate_stats)
+        if self.remote and not local_store.get_meta(self.conn, "pull:doctors"):
+            # First run on this machine: fill the mirror before the UI asks for data
+            self.sync.sync_once()
 
-    def create_tables(self):
-        if not self.conn: return
-        cursor = self.conn.cursor()
-        
-        # 1. Patients Table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS patients (
-            protocol_no VARCHAR(50) PRIMARY KEY,
-            name VARCHAR(100) UNIQUE NOT NULL,
-            age INT,
-            gender VARCHAR(20),
-            dominant_side VARCHAR(20),
-            onset_year INT,
-            diagnosis VARCHAR(100),
-            doctor_name VARCHAR(100),
-            contact_phone VARCHAR(50),
-            clinical_history TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # 2. Tests Table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tests (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            patient_name VARCHAR(100),
-            test_type VARCHAR(50),
-            file_path TEXT,
-            score DOUBLE,
-            extra DOUBLE,
-            notes TEXT,
-            test_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            doctor_name VARCHAR(100),
-            FOREIGN KEY (patient_name) REFERENCES patients(name) ON DELETE CASCADE
-        )
-        """)
-        
-        # 3. Calibration Table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS device_calibration (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            device_id VARCHAR(50) DEFAULT 'Main_Device',
-            offset_ax DOUBLE DEFAULT 0,
-            offset_ay DOUBLE DEFAULT 0,
-            offset_az DOUBLE DEFAULT 0,
-            offset_gx DOUBLE DEFAULT 0,
-            offset_gy DOUBLE DEFAULT 0,
-            offset_gz DOUBLE DEFAULT 0,
-            calibrated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
+    def _changed(self):
+        self.invalidate_stats()
+        self.sync.nudge()
 
-        # 4. Doctors Table (Updated)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS doctors (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(100) UNIQUE NOT NULL,
-            email VARCHAR(100) UNIQUE NOT NULL,
-            password VARCHAR(255) DEFAULT '1234',
-            specialty VARCHAR(100),
-            is_approved TINYINT(1) DEFAULT 0,
-            is_admin TINYINT(1) DEFAULT 0
-        )
-        """)
+    def _remote_available(self):
+        """Reconnects the direct MySQL connection (used for data that is not mirrored locally).
+        Attempts are throttled to one per REMOTE_RETRY_SEC so an offline UI does not stall."""
+        if self.remote is not None:
+            try:
+                if self.remote.is_connected(): return True
+            except mysql.connector.Error:
+                pass
+            self._drop_remote("Sunucu bağlantısı koptu")
+        if time.monotonic() < self._next_remote: return False
+        try:
+            self.remote = mysql.connector.connect(**DB_CONFIG, connection_timeout=REMOTE_TIMEOUT_SEC)
+            return True
+        except mysql.connector.Error as err:
+            self._drop_remote(str(err))
+            return False
 
-        # 5. Logs Table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS system_logs (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            log_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            level VARCHAR(20),
-            message TEXT,
-            doctor_name VARCHAR(100)
-        )
-        """)
-        
-        # Initial Data (Admin & Default Doctor)
-        cursor.execute("INSERT IGNORE INTO doctors (name, email, password, specialty, is_approved, is_admin) VALUES ('Admin', 'admin@neuromotion.com', 'admin123', 'System Administrator', 1, 1)")
-        cursor.execute("INSERT IGNORE INTO doctors (name, email, password, specialty, is_approved) VALUES ('Dr. Aytaç Durmaz', 'aytac@neuromotion.com', '1234', 'Neurology', 1)")
-        
-        self.conn.commit()
-        cursor.close()
+    def _drop_remote(self, error):
+        try:
+            if self.remote is not None: self.remote.close()
+        except Exception:
+            pass
+        self.remote = None
+        self.remote_error = error
+        self._next_remote = time.monotonic() + REMOTE_RETRY_SEC
 
     # --- Auth Methods ---
     def authenticate_doctor(self, identifier, password):
@@ -167,6 +95,7 @@ class TestDatabase:
             VALUES (%s, %s, %s, %s, %s, 0)
             """, (name, email, password, specialty, 1 if is_approved else 0))
             self.conn.commit()
+            self._changed()
             cursor.close()
             msg = f"Yeni doktor eklendi (Admin): {name}" if is_approved else f"Yeni doktor kayıt isteği: {name} ({email})"
             self.log_event("INFO", msg)
@@ -189,6 +118,7 @@ class TestDatabase:
             cursor = self.conn.cursor()
             cursor.execute("UPDATE doctors SET is_approved = 1 WHERE id = %s", (doctor_id,))
             self.conn.commit()
+            self._changed()
             cursor.close()
             return True
         except Exception as e:
@@ -201,6 +131,7 @@ class TestDatabase:
             cursor = self.conn.cursor()
             cursor.execute("DELETE FROM doctors WHERE id = %s AND is_approved = 0", (doctor_id,))
             self.conn.commit()
+            self._changed()
             cursor.close()
             return True
         except Exception as e:
@@ -213,6 +144,7 @@ class TestDatabase:
             cursor = self.conn.cursor()
             cursor.execute("DELETE FROM doctors WHERE id = %s", (doctor_id,))
             self.conn.commit()
+            self._changed()
             cursor.close()
             return True
         except Exception as e:
@@ -225,53 +157,132 @@ class TestDatabase:
             cursor = self.conn.cursor()
             cursor.execute("UPDATE doctors SET is_admin = %s WHERE id = %s", (1 if is_admin else 0, doctor_id))
             self.conn.commit()
+            self._changed()
             cursor.close()
             return True
         except Exception as e:
             print(f"Yetki Güncelleme Hatası: {e}")
             return False
 
+    # --- Dashboard Stats (cached) ---
+    # Shared by every TestDatabase instance in the process; cleared by local writes and by sync pulls.
+    _stats_cache = {}
+
+    @classmethod
+    def invalidate_stats(cls, *_):
+        cls._stats_cache.clear()
+
+    def _cached(self, key, compute):
+        hit = self._stats_cache.get(key)
+        if hit and time.monotonic() - hit[0] < STATS_TTL_SEC:
+            return hit[1]
+        value = compute()
+        self._stats_cache[key] = (time.monotonic(), value)
+        return value
+
     def get_system_stats(self):
         if not self.conn: return {}
-        stats = {}
+        return self._cached('system', self._compute_system_stats)
+
+    def _compute_system_stats(self):
+        # One round trip instead of four COUNT(*) queries
         cursor = self.conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM doctors WHERE is_approved = 1")
-        stats['doctors'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM doctors WHERE is_approved = 0")
-        stats['pending'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM patients")
-        stats['patients'] = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM tests")
-        stats['tests'] = cursor.fetchone()[0]
-        
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM doctors WHERE is_approved = 1),
+                (SELECT COUNT(*) FROM doctors WHERE is_approved = 0),
+                (SELECT COUNT(*) FROM patients),
+                (SELECT COUNT(*) FROM tests)
+        """)
+        doctors, pending, patients, tests = cursor.fetchone()
         cursor.close()
-        return stats
+        return {'doctors': doctors, 'pending': pending, 'patients': patients, 'tests': tests}
 
-    def get_all_logs(self, limit=200):
-        if not self.conn: return []
-        cursor = self.conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM system_logs ORDER BY log_date DESC LIMIT %s", (limit,))
-        result = cursor.fetchall()
+    def get_activity_stats(self, days=30):
+        """Tests per day / per doctor / per type over the last `days` days, from one grouped query."""
+        if not self.conn: return {}
+        return self._cached(('activity', days), lambda: self._compute_activity_stats(days))
+
+    def _compute_activity_stats(self, days):
+        since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT DATE(test_date, 'localtime') AS day, doctor_name, test_type, COUNT(*)
+            FROM tests
+            WHERE test_date >= datetime(%s, 'utc')
+            GROUP BY day, doctor_name, test_type
+        """, (since,))
+        rows = cursor.fetchall()
         cursor.close()
-        return result
 
-    # --- Logging Methods ---
-    def log_event(self, level, message, doctor_name="System"):
-        if not self.conn: return
+        per_day, per_doctor, per_type = {}, {}, {}
+        for day, doctor, test_type, count in rows:
+            day, doctor, test_type = str(day), doctor or "System", test_type or "-"
+            per_day[day] = per_day.get(day, 0) + count
+            per_doctor[doctor] = per_doctor.get(doctor, 0) + count
+            per_type[test_type] = per_type.get(test_type, 0) + count
+        return {
+            'since': since,
+            'total': sum(per_day.values()),
+            'per_day': dict(sorted(per_day.items())),
+            'per_doctor': dict(sorted(per_doctor.items(), key=lambda kv: -kv[1])),
+            'per_type': dict(sorted(per_type.items(), key=lambda kv: -kv[1])),
+        }
+
+    def get_all_logs(self, limit=200):
+        return [dict(zip(LOG_COLUMNS, row)) for row in self.get_logs_page(limit=limit)]
+
+    def get_logs_page(self, before=None, after=None, level=None, doctor=None, text=None, limit=200):
+        """
+        Keyset pagination over system_logs ordered by (log_date, id), newest first.
+        before/after: (log_date, id) of the last/first row already shown.
+        Returns tuples in LOG_COLUMNS order; uses idx_logs_date, so cost is independent of page depth.
+        Logs are not mirrored locally: while the server is unreachable the page is empty and
+        self.remote_error says why.
+        """
+        if not self._remote_available(): return []
+        where, params = [], []
+        if before is not None:
+            where.append("(log_date < %s OR (log_date = %s AND id < %s))")
+            params += [before[0], before[0], before[1]]
+        if after is not None:
+            where.append("(log_date > %s OR (log_date = %s AND id > %s))")
+            params += [after[0], after[0], after[1]]
+        if level:
+            where.append("level = %s"); params.append(level)
+        if doctor:
+            where.append("doctor_name = %s"); params.append(doctor)
+        if text:
+            where.append("message LIKE %s"); params.append(f"%{text}%")
+        order = "ASC" if after is not None else "DESC"
+        query = f"SELECT {', '.join(LOG_COLUMNS)} FROM system_logs"
+        if where: query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY log_date {order}, id {order} LIMIT %s"
+        params.append(limit)
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-            INSERT INTO system_logs (level, message, doctor_name)
-            VALUES (%s, %s, %s)
-            """, (level, message, doctor_name))
-            self.conn.commit()
+            cursor = self.remote.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
             cursor.close()
-        except Exception as e:
-            print(f"Log Yazma Hatası: {e}")
+        except mysql.connector.Error as err:
+            print(f"Log Okuma Hatası: {err}")
+            if isinstance(err, (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError)):
+                self._drop_remote(str(err))
+            else:
+                self.remote_error = str(err)
+            return []
+        self.remote_error = None
+        # Pages fetched towards newer rows are returned in the same (newest first) order
+        return rows[::-1] if after is not None else rows
+
+    # --- Logging Methods ---
+    def log_event(self, level, message, doctor_name="System"):
+        """Queued to the background audit sink; never blocks on the network."""
+        audit_log.get_sink().submit(level, message, doctor_name)
+
+    def flush_logs(self, timeout=5.0):
+        """Wait until queued log entries are written (or spilled to disk)."""
+        return audit_log.get_sink().flush(timeout)
 
     # --- Patient Methods ---
     def get_all_patients(self):
@@ -302,10 +313,11 @@ class TestDatabase:
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, (protocol_no, name, age, gender, dominant_side, onset_year, diagnosis, doctor, phone, history))
             self.conn.commit()
+            self._changed()
             cursor.close()
             self.log_event("INFO", f"Yeni hasta eklendi: {name}", doctor)
             return True
-        except mysql.connector.IntegrityError:
+        except (mysql.connector.IntegrityError, sqlite3.IntegrityError):
             return False
         except Exception as e:
             print(f"DB Kayıt Hatası: {e}")
@@ -328,6 +340,7 @@ class TestDatabase:
                     WHERE name = %s
                 """, (age, dominant_side, doctor, phone, name))
             self.conn.commit()
+            self._changed()
             cursor.close()
             self.log_event("INFO", f"Hasta bilgileri güncellendi: {name}", doctor)
             return True
@@ -341,6 +354,7 @@ class TestDatabase:
             cursor = self.conn.cursor()
             cursor.execute("DELETE FROM patients WHERE name = %s", (name,))
             self.conn.commit()
+            self._changed()
             cursor.close()
             self.log_event("WARNING", f"Hasta silindi: {name}", doctor)
             return True
@@ -357,11 +371,125 @@ class TestDatabase:
             VALUES (%s, %s, %s, %s, %s, %s, %s)
             """, (patient_name, test_type, file_path, score, extra, notes, doctor_name))
             self.conn.commit()
+            self._changed()
             cursor.close()
             self.log_event("INFO", f"Yeni test eklendi: {test_type} - Hasta: {patient_name}", doctor_name)
         except Exception as e:
             print(f"Test Kayıt Hatası: {e}")
 
+    def save_test_result(self, file_path, score, extra, metrics):
+        """Stores analysis results of a recorded test: score/extra on the test row and
+        every metric as one test_metrics row (bulk insert, replaces an earlier analysis)."""
+        if not self.conn: return False
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT uuid FROM tests WHERE file_path = %s ORDER BY id DESC LIMIT 1", (file_path,))
+            row = cursor.fetchone()
+            if not row:
+                cursor.close(); return False
+            test_uuid = row[0]
+            cursor.execute("UPDATE tests SET score = %s, extra = %s WHERE uuid = %s", (score, extra, test_uuid))
+            cursor.execute("DELETE FROM test_metrics WHERE test_uuid = %s", (test_uuid,))
+            cursor.executemany("INSERT INTO test_metrics (test_uuid, metric, value) VALUES (%s, %s, %s)",
+                               [(test_uuid, name, float(value)) for name, value in metrics.items() if value is not None])
+            self.conn.commit()
+            self._changed()
+            cursor.close()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Test Sonucu Kayıt Hatası: {e}")
+            return False
+
+    def get_patient_tests(self, patient_name):
+        """All metrics of one patient's tests, oldest first, in a single indexed query (trend engine input).
+        Rows: (test_uuid, test_date, test_type, metric, value)."""
+        if not self.conn: return []
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT t.uuid, datetime(t.test_date, 'localtime'), t.test_type, m.metric, m.value
+            FROM tests t JOIN test_metrics m ON m.test_uuid = t.uuid
+            WHERE t.patient_name = %s ORDER BY t.test_date, t.id
+        """, (patient_name,))
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def get_patient_tests_signature(self, patient_name):
+        """Changes whenever a patient's tests or metrics change (trend cache key)."""
+        if not self.conn: return None
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(t.id), COUNT(m.id), MAX(t.updated_at), MAX(m.updated_at)
+            FROM tests t LEFT JOIN test_metrics m ON m.test_uuid = t.uuid
+            WHERE t.patient_name = %s
+        """, (patient_name,))
+        row = cursor.fetchone()
+        cursor.close()
+        return tuple(row) if row else None
+
+    def find_tests_by_metrics(self, criteria, test_type=None, limit=None):
+        """Cohort filter as indexed SQL, e.g. {'dominant_freq': (4, 7), 'peak_g': (0.1, None)}.
+        Each criterion is an inclusive (low, high) range; None leaves that side open.
+        Returns dicts with the test, its patient and the filtered metric values."""
+        if not self.conn or not criteria: return []
+        joins, join_params, where, where_params, selects = [], [], [], [], []
+        for i, (metric, (low, high)) in enumerate(criteria.items()):
+            if not metric.isidentifier(): raise ValueError(f"Geçersiz metrik adı: {metric}")
+            alias = f"m{i}"
+            joins.append(f"JOIN test_metrics {alias} ON {alias}.test_uuid = t.uuid AND {alias}.metric = %s")
+            join_params.append(metric)
+            if low is not None:
+                where.append(f"{alias}.value >= %s"); where_params.append(low)
+            if high is not None:
+                where.append(f"{alias}.value <= %s"); where_params.append(high)
+            selects.append(f"{alias}.value AS {metric}")
+        if test_type:
+            where.append("t.test_type = %s"); where_params.append(test_type)
+        query = (f"SELECT t.uuid, t.patient_name, t.test_type, datetime(t.test_date, 'localtime') AS test_date, t.file_path, {', '.join(selects)} "
+                 f"FROM tests t {' '.join(joins)}"
+                 + (f" WHERE {' AND '.join(where)}" if where else "")
+                 + " ORDER BY t.patient_name, t.test_date")
+        params = join_params + where_params
+        if limit:
+            query += " LIMIT %s"; params.append(int(limit))
+        cursor = self.conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def get_cohort_tables(self):
+        """Bulk snapshot for cohort analytics: {table: (column names, rows)} for patients,
+        tests and test_metrics - three queries regardless of clinic size."""
+        if not self.conn: return {}
+        queries = {
+            'patients': "SELECT name, protocol_no, age, gender, dominant_side, onset_year, diagnosis, doctor_name FROM patients",
+            'tests': "SELECT uuid, patient_name, test_type, datetime(test_date, 'localtime') AS test_date, doctor_name FROM tests",
+            'test_metrics': "SELECT test_uuid, metric, value FROM test_metrics",
+        }
+        tables = {}
+        cursor = self.conn.cursor()
+        for table, query in queries.items():
+            cursor.execute(query)
+            tables[table] = ([d[0] for d in cursor.description], cursor.fetchall())
+        cursor.close()
+        return tables
+
+    def get_cohort_signature(self):
+        """Changes whenever any patient, test or metric changes (cohort cache key)."""
+        if not self.conn: return None
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM patients), (SELECT MAX(updated_at) FROM patients),
+                (SELECT COUNT(*) FROM tests), (SELECT MAX(updated_at) FROM tests),
+                (SELECT COUNT(*) FROM test_metrics), (SELECT MAX(updated_at) FROM test_metrics)
+        """)
+        row = cursor.fetchone()
+        cursor.close()
+        return tuple(row) if row else None
+
     # --- Calibration Methods ---
     def save_calibration(self, ax, ay, az, gx, gy, gz, device_id='Main_Device', doctor='System'):
         if not self.conn: return False
@@ -372,6 +500,7 @@ class TestDatabase:
             VALUES (%s, %s, %s, %s, %s, %s, %s)
             """, (device_id, ax, ay, az, gx, gy, gz))
             self.conn.commit()
+            self._changed()
             cursor.close()
             self.log_event("INFO", f"Cihaz kalibre edildi: {device_id}", doctor)
             return True
@@ -379,6 +508,50 @@ class TestDatabase:
             print(f"Kalibrasyon Kayıt Hatası: {e}")
             return False
 
+    def save_calibration_set(self, device_id, entries, doctor='System'):
+        """entries: list of dicts with imu_index, offset_*, scale_* and optional cross_axis (JSON text)."""
+        if not self.conn or not entries: return False
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany("""
+            INSERT INTO device_calibration (device_id, imu_index,
+                offset_ax, offset_ay, offset_az, offset_gx, offset_gy, offset_gz,
+                scale_ax, scale_ay, scale_az, scale_gx, scale_gy, scale_gz, cross_axis)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, [(device_id, e['imu_index'],
+                   e['offset_ax'], e['offset_ay'], e['offset_az'], e['offset_gx'], e['offset_gy'], e['offset_gz'],
+                   e.get('scale_ax', 1.0), e.get('scale_ay', 1.0), e.get('scale_az', 1.0),
+                   e.get('scale_gx', 1.0), e.get('scale_gy', 1.0), e.get('scale_gz', 1.0),
+                   e.get('cross_axis')) for e in entries])
+            self.conn.commit()
+            self._changed()
+            cursor.close()
+            self.log_event("INFO", f"Cihaz kalibre edildi: {device_id} ({len(entries)} IMU)", doctor)
+            return True
+        except Exception as e:
+            print(f"Kalibrasyon Kayıt Hatası: {e}")
+            return False
+
+    def get_device_calibration(self, device_id='Main_Device'):
+        """Latest calibration row for every IMU of a device.
+        Newest by calibrated_at (uuid breaks ties): local ids follow sync pull order, not creation order."""
+        if not self.conn: return []
+        cursor = self.conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT c.imu_index, c.offset_ax, c.offset_ay, c.offset_az, c.offset_gx, c.offset_gy, c.offset_gz,
+                   c.scale_ax, c.scale_ay, c.scale_az, c.scale_gx, c.scale_gy, c.scale_gz, c.cross_axis,
+                   datetime(c.calibrated_at, 'localtime') AS calibrated_at
+            FROM device_calibration c
+            WHERE c.device_id=%s AND c.uuid = (
+                SELECT l.uuid FROM device_calibration l
+                WHERE l.device_id = c.device_id AND l.imu_index = c.imu_index
+                ORDER BY l.calibrated_at DESC, l.uuid DESC LIMIT 1)
+            ORDER BY c.imu_index
+        """, (device_id,))
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
     def get_latest_calibration(self, device_id='Main_Device'):
         if not self.conn: return None
         cursor = self.conn.cursor(dictionary=True)
@@ -413,6 +586,7 @@ class TestDatabase:
             # Yeni şifreyi güncelle
             cursor.execute("UPDATE doctors SET password=%s WHERE name=%s", (new_pw, name))
             self.conn.commit()
+            self._changed()
             cursor.close()
             self.log_event("INFO", "Şifre değiştirildi.", name)
             return True
@@ -421,8 +595,10 @@ class TestDatabase:
             return False
 
     def __del__(self):
-        try:
-            if hasattr(self, 'conn') and self.conn and self.conn.is_connected():
-                self.conn.close()
-        except:
-            pass
\ No newline at end of file
+        for name in ('conn', 'remote'):
+            try:
+                conn = getattr(self, name, None)
+                if conn and conn.is_connected():
+                    conn.close()
+            except:
+                pass
\ No newline at end of file
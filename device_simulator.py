@@ -0,0 +1,475 @@
+# DOSYA ADI: device_simulator.py
+# Sanal sensör cihazı: gerçek COM portu olmadan okuma (ingest) yollarını test etmek için.
+# Kaynak: VeriSeti_Genel'deki bir kayıt CSV'si (tekrar oynatma) ya da sentetik tremor/tapping sinyali.
+# Çıkış biçimi: mevcut ASCII satırı ("ax,ay,az,gx,gy,gz[,...]\n", IMU başına 6 değer)
+#               ya da çerçeveli ikili (binary) paket (bkz. encode_binary).
+# Taşıma:
+#   --pty      : Linux/macOS'ta sahte terminal açar; yolu (/dev/pts/N) herhangi bir okuyucuya port olarak verilir
+#                (python test_serial.py /dev/pts/N, SerialWorker, kalibrasyon_araci ...)
+#   VirtualSerial : süreç içi serial.Serial yerine geçer (SerialWorker(serial_factory=...)), CI için
+#   --bench    : SerialWorker okuma döngüsünün verimini (örnek/sn) ölçer
+#   --check    : CI kontrolü; firmware gibi durum/RATE satırları karışık akışta SEQ boşluğu olmamalı
+#
+# Örnek: python device_simulator.py --pty --source tremor --rate 200 --imus 12 --corrupt 0.01
+#        python device_simulator.py --bench --rate 0 --imus 12 --duration 5
+#        python device_simulator.py --check --rate 50
+
+import argparse
+import glob
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+# --- AYARLAR ---
+DEFAULT_RATE = 50.0
+ACC_SCALE_FACTOR = 16384.0   # 1 g
+GYRO_SCALE_FACTOR = 131.0    # 1 derece/sn
+BLOCK_SEC = 0.05             # Üretim bloğu (sn); üretim vektörel, yazım tempolu
+UNPACED_BUFFER = 1 << 16     # Tempo yokken tampon bu boyutun altına inince yeni blok üretilir
+DATA_ROOT = os.path.join("VeriSeti_Genel", "Hastalar")
+
+# İkili çerçeve: SYNC(2) | sıra no uint16 | değer sayısı uint8 | değerler int16 x n | sağlama uint8
+FRAME_SYNC = b"\xAA\x55"
+FRAME_HEADER = struct.Struct("<2sHB")
+CORRUPTIONS = ("drop", "truncate", "garbage", "bitflip")
+# Firmware'in (main.cpp) saniyede bir bastığı veri dışı satırlar
+STATUS_LINES = "### LOOP BAŞLADI - Sensor Status Check ###\nSensor: HAZIR\n".encode()
+
+
+# ========================================================
+# KAYNAKLAR
+# ========================================================
+
+class SyntheticSource:
+    """Sentetik ham sensör verisi (LSB). kind: "tremor" (dinlenme tremoru) ya da "tapping" (parmak vurma).
+    burst_period_sec > 0 ise tremor ataklar halindedir (yarım periyot var, yarım periyot yok).
+    Stimülasyon komutları (stimulate) tremoru response_sec içinde `suppression` oranında bastırır;
+    kapalı döngü kıyaslaması (closed_loop.py) bu tepkiyi kullanır."""
+
+    def __init__(self, kind="tremor", imus=1, rate=DEFAULT_RATE, tremor_hz=5.0, tremor_g=0.12,
+                 tap_hz=2.5, fatigue=0.02, noise_lsb=40.0, seed=0, burst_period_sec=0.0,
+                 suppression=0.85, response_sec=0.3):
+        if kind not in ("tremor", "tapping"): raise ValueError(f"Bilinmeyen sentetik kaynak: {kind}")
+        self.kind = kind
+        self.imus = imus
+        self.rate = rate
+        self.tremor_hz, self.tremor_g = tremor_hz, tremor_g
+        self.tap_hz, self.fatigue = tap_hz, fatigue
+        self.noise = noise_lsb
+        self.rng = np.random.default_rng(seed)
+        self.phase = self.rng.uniform(0, 2 * np.pi, imus)        # IMU başına faz
+        self.gain = self.rng.uniform(0.6, 1.0, imus)             # IMU başına genlik
+        self.burst_period = burst_period_sec
+        self.suppression = suppression
+        self.response = response_sec
+        self.stim_on = False
+        self.stim_gain = 1.0                                     # Stimülasyonun anlık bastırma çarpanı
+        self.n = 0
+
+    def stimulate(self, command):
+        """STIM_START / STIM_UPDATE (genlik > 0) tremoru bastırır, STIM_STOP geri getirir."""
+        if command.startswith(("STIM_START", "STIM_UPDATE")):
+            parts = command.split(":")
+            try: self.stim_on = len(parts) < 5 or float(parts[4]) > 0
+            except ValueError: pass
+        elif command.startswith("STIM_STOP"):
+            self.stim_on = False
+
+    def _envelope(self, t):
+        # Atak zarfı x stimülasyon tepkisi (birinci dereceden, örnek başına kapalı biçim)
+        burst = np.where((t % self.burst_period) < self.burst_period / 2, 1.0, 0.1) if self.burst_period > 0 else 1.0
+        target = (1.0 - self.suppression) if self.stim_on else 1.0
+        step = min(1.0 / (self.rate * self.response), 1.0) if self.response > 0 else 1.0
+        k = np.arange(1, len(t) + 1)[:, None]
+        stim = target + (self.stim_gain - target) * (1.0 - step) ** k
+        self.stim_gain = float(stim[-1, 0])
+        return burst * stim
+
+    def block(self, count):
+        t = (self.n + np.arange(count))[:, None] / self.rate
+        self.n += count
+        if self.kind == "tremor":
+            w = 2 * np.pi * self.tremor_hz
+            amp = self.tremor_g * self.gain * self._envelope(t)
+            motion = amp * np.sin(w * t + self.phase)
+            rot = amp * w * np.cos(w * t + self.phase) * 57.3 * 0.2
+        else:
+            # Yarım dalga vurma hareketi; genlik zamanla azalır (yorulma), ritim hafif düzensiz
+            w = 2 * np.pi * self.tap_hz * (1 + 0.03 * np.sin(0.3 * t))
+            envelope = self.gain / (1 + self.fatigue * t)
+            motion = 0.8 * envelope * np.maximum(np.sin(w * t + self.phase), 0)
+            rot = 300.0 * envelope * np.sin(w * t + self.phase)
+
+        out = np.empty((count, self.imus, 6))
+        out[:, :, 0] = 0.1 * motion * ACC_SCALE_FACTOR
+        out[:, :, 1] = 0.3 * motion * ACC_SCALE_FACTOR
+        out[:, :, 2] = (1.0 + motion) * ACC_SCALE_FACTOR
+        out[:, :, 3] = rot * GYRO_SCALE_FACTOR
+        out[:, :, 4] = 0.4 * rot * GYRO_SCALE_FACTOR
+        out[:, :, 5] = 0.1 * rot * GYRO_SCALE_FACTOR
+        out += self.rng.normal(0, self.noise, out.shape)
+        return np.rint(out.reshape(count, self.imus * 6))
+
+
+class CsvSource:
+    """Kayıt CSV'sini sonsuz döngüde tekrar oynatır. IMU sayısı dosyadakinden fazlaysa
+    eldeki IMU'lar küçük gürültüyle çoğaltılır."""
+
+    def __init__(self, path, imus=1, seed=0, loop=True):
+        import pandas as pd
+        df = pd.read_csv(path)
+        sensor = [c for c in df.columns if c.split("_")[-1] in ("AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ")]
+        data = df[sensor].apply(pd.to_numeric, errors="coerce").dropna().to_numpy(dtype=float)
+        if len(data) == 0: raise ValueError(f"Kayıtta sensör verisi yok: {path}")
+        available = data.shape[1] // 6
+        picks = [i % available for i in range(imus)]
+        data = np.hstack([data[:, p * 6:(p + 1) * 6] for p in picks])
+        rng = np.random.default_rng(seed)
+        extra = np.array([i >= available for i in range(imus)]).repeat(6)
+        data[:, extra] += rng.normal(0, 30, (len(data), int(extra.sum())))
+        self.data = np.rint(data)
+        self.imus = imus
+        self.loop = loop
+        self.pos = 0
+
+    def block(self, count):
+        if not self.loop:
+            chunk = self.data[self.pos:self.pos + count]; self.pos += len(chunk); return chunk
+        idx = (self.pos + np.arange(count)) % len(self.data)
+        self.pos = (self.pos + count) % len(self.data)
+        return self.data[idx]
+
+
+def make_source(spec, imus=1, rate=DEFAULT_RATE, seed=0, **options):
+    """"tremor" | "tapping" | CSV yolu | "replay" (VeriSeti_Genel'deki ilk kayıt).
+    options yalnızca sentetik kaynağa geçer (ör. burst_period_sec)."""
+    # Tempo yoksa (rate <= 0) sinyalin zaman ekseni varsayılan hızla kurulur
+    if spec in ("tremor", "tapping"):
+        return SyntheticSource(spec, imus, rate if rate > 0 else DEFAULT_RATE, seed=seed, **options)
+    if spec == "replay":
+        files = sorted(glob.glob(os.path.join(DATA_ROOT, "*", "*", "*.csv")))
+        files = [f for f in files if not f.endswith("_STIM_OLAYLARI.csv")]
+        if not files: raise FileNotFoundError(f"{DATA_ROOT} altında kayıt bulunamadı")
+        spec = files[0]
+    return CsvSource(spec, imus, seed)
+
+
+# ========================================================
+# KODLAMA
+# ========================================================
+
+def encode_ascii(block, battery=None):
+    """Blok (örnek x değer) -> ASCII satırları. battery verilirse satır sonuna eklenir."""
+    cols = block.shape[1] + (battery is not None)
+    fmt = ",".join(["%d"] * cols) + "\n"
+    if battery is None:
+        return [(fmt % tuple(row)).encode() for row in block.astype(np.int64).tolist()]
+    return [(fmt % (*row, battery)).encode() for row in block.astype(np.int64).tolist()]
+
+
+def encode_binary(block, first_seq=0):
+    """Blok -> ikili çerçeveler. Değerler int16'ya kırpılır; sıra no 16 bitte sarar."""
+    values = np.clip(block, -32768, 32767).astype("<i2")
+    frames = []
+    for i, row in enumerate(values):
+        payload = row.tobytes()
+        header = FRAME_HEADER.pack(FRAME_SYNC, (first_seq + i) & 0xFFFF, len(row))
+        frames.append(header + payload + bytes([sum(payload) & 0xFF]))
+    return frames
+
+
+def decode_binary(buffer):
+    """Tampondaki tam çerçeveleri çözer: (çerçeveler [(sıra, değerler)], kalan bayt, hatalı çerçeve sayısı).
+    Sağlaması tutmayan çerçevede bir sonraki SYNC'e atlanır."""
+    frames, errors, pos = [], 0, 0
+    while True:
+        start = buffer.find(FRAME_SYNC, pos)
+        if start < 0: return frames, buffer[-1:] if buffer.endswith(FRAME_SYNC[:1]) else b"", errors
+        if len(buffer) - start < FRAME_HEADER.size: return frames, buffer[start:], errors
+        _, seq, count = FRAME_HEADER.unpack_from(buffer, start)
+        end = start + FRAME_HEADER.size + 2 * count + 1
+        if end > len(buffer): return frames, buffer[start:], errors
+        payload = buffer[start + FRAME_HEADER.size:end - 1]
+        if count and sum(payload) & 0xFF == buffer[end - 1]:
+            frames.append((seq, np.frombuffer(payload, dtype="<i2").astype(float)))
+            pos = end
+        else:
+            errors += 1
+            pos = start + 1
+
+
+class Corruptor:
+    """Satır/çerçeve başına `rate` olasılıkla bozulma: düşürme, kesme, çöp bayt ya da bit çevirme."""
+
+    def __init__(self, rate=0.0, seed=0, kinds=CORRUPTIONS):
+        self.rate = rate
+        self.kinds = kinds
+        self.rng = random.Random(seed)
+        self.counts = dict.fromkeys(kinds, 0)
+
+    def apply(self, packets):
+        if self.rate <= 0: return packets
+        out = []
+        for packet in packets:
+            if self.rng.random() >= self.rate:
+                out.append(packet); continue
+            kind = self.rng.choice(self.kinds)
+            self.counts[kind] += 1
+            if kind == "drop": continue
+            if kind == "truncate": packet = packet[:self.rng.randrange(1, len(packet))]
+            elif kind == "garbage": packet = bytes(self.rng.randrange(256) for _ in range(self.rng.randrange(1, 16))) + packet
+            else:
+                i = self.rng.randrange(len(packet))
+                packet = packet[:i] + bytes([packet[i] ^ (1 << self.rng.randrange(8))]) + packet[i + 1:]
+            out.append(packet)
+        return out
+
+
+# ========================================================
+# CİHAZ
+# ========================================================
+
+class DeviceStream:
+    """Kaynak + kodlama + bozulma + tempo. pending() o ana kadar gönderilmesi gereken baytları üretir.
+    rate <= 0 ise tempo yoktur (her çağrıda bir blok; verim testleri için)."""
+
+    def __init__(self, source, rate=DEFAULT_RATE, fmt="ascii", corrupt=0.0, battery=None, seed=0):
+        if fmt not in ("ascii", "binary"): raise ValueError(f"Bilinmeyen biçim: {fmt}")
+        self.source = source
+        self.rate = rate
+        self.fmt = fmt
+        self.battery = battery
+        self.corruptor = Corruptor(corrupt, seed)
+        self.block_size = max(int(rate * BLOCK_SEC), 1) if rate > 0 else 256
+        self.sent = 0
+        self.commands = []
+        self._t0 = None
+
+    def pending(self):
+        if self._t0 is None: self._t0 = time.perf_counter()
+        due = int((time.perf_counter() - self._t0) * self.rate) if self.rate > 0 else self.sent + self.block_size
+        count = due - self.sent
+        if count <= 0: return b""
+        block = self.source.block(count)
+        if len(block) == 0: return b""
+        packets = encode_ascii(block, self.battery) if self.fmt == "ascii" else encode_binary(block, self.sent)
+        if self.fmt == "ascii" and self.rate > 0:
+            # Firmware gibi her saniyenin ilk örneğinden önce durum satırları + hız (ASCII, tempolu)
+            per_sec = max(int(round(self.rate)), 1)
+            status = STATUS_LINES + f"RATE,{self.rate:g}\n".encode()
+            for i in reversed(range((-self.sent) % per_sec, len(packets), per_sec)):
+                packets.insert(i, status)
+        self.sent += len(block)
+        return b"".join(self.corruptor.apply(packets))
+
+    def handle_command(self, data):
+        for line in data.decode("utf-8", errors="ignore").splitlines():
+            if not line.strip(): continue
+            self.commands.append((time.perf_counter(), line.strip()))
+            if hasattr(self.source, "stimulate"): self.source.stimulate(line.strip())
+
+
+class VirtualSerial:
+    """serial.Serial arayüzünün okuma yollarında kullanılan alt kümesi (loopback, süreç içi)."""
+
+    def __init__(self, stream, timeout=0.1):
+        self.stream = stream
+        self.timeout = timeout
+        self.is_open = True
+        self._buffer = bytearray()
+
+    def _fill(self):
+        # Tempolu cihaz okuyucuyu beklemez (gerçek UART gibi); tempo yoksa okuyucu kadar hızlı üretilir
+        if self.stream.rate > 0 or len(self._buffer) < UNPACED_BUFFER:
+            self._buffer += self.stream.pending()
+
+    def _wait(self, ready):
+        deadline = time.perf_counter() + (self.timeout or 0)
+        self._fill()
+        while not ready() and time.perf_counter() < deadline:
+            time.sleep(0.0005); self._fill()
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return len(self._buffer)
+
+    def read(self, size=1):
+        self._wait(lambda: len(self._buffer) >= size)
+        data = bytes(self._buffer[:size]); del self._buffer[:size]
+        return data
+
+    def readline(self):
+        self._wait(lambda: b"\n" in self._buffer)
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        data = bytes(self._buffer[:end]); del self._buffer[:end]
+        return data
+
+    def read_all(self):
+        self._fill()
+        data = bytes(self._buffer); self._buffer.clear()
+        return data
+
+    def reset_input_buffer(self):
+        self._fill(); self._buffer.clear()
+
+    def write(self, data):
+        self.stream.handle_command(data)
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+def serial_factory(source="tremor", rate=DEFAULT_RATE, imus=1, fmt="ascii", corrupt=0.0, seed=0, **source_options):
+    """SerialWorker(port, serial_factory=...) için: her açılışta yeni bir sanal cihaz döner.
+    Son açılan cihaz factory.last üzerinden okunabilir (istatistik/komutlar)."""
+    def factory(port=None, baudrate=115200, timeout=0.1):
+        stream = DeviceStream(make_source(source, imus, rate, seed, **source_options), rate, fmt, corrupt, seed=seed)
+        factory.last = VirtualSerial(stream, timeout)
+        return factory.last
+    factory.last = None
+    return factory
+
+
+def run_pty(stream, duration=0.0):
+    """Sahte terminalin ana ucuna tempolu yazar; alt uç yolunu yazdırır. Ctrl+C ile durur."""
+    if os.name != "posix":
+        print("❌ --pty yalnızca Linux/macOS'ta desteklenir (Windows'ta com0com gibi sanal port çifti kullanın)."); return
+    import select
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)   # Okuyucu yoksa tampon dolar; cihaz beklemez, fazlası düşer
+    print(f"🔌 Sanal port hazır: {os.ttyname(slave)}  (Ctrl+C ile durdur)", flush=True)
+    started = time.perf_counter()
+    dropped = 0
+    try:
+        while not duration or time.perf_counter() - started < duration:
+            data = stream.pending()
+            if data:
+                try: dropped += len(data) - os.write(master, data)
+                except BlockingIOError: dropped += len(data)
+            readable, _, _ = select.select([master], [], [], 0.002)
+            if readable: stream.handle_command(os.read(master, 1024))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master); os.close(slave)
+    print(f"\n✅ Gönderilen örnek: {stream.sent} | Bozulan: {sum(stream.corruptor.counts.values())} | "
+          f"Okunmadığı için düşen: {dropped} bayt | Alınan komut: {len(stream.commands)}")
+
+
+def run_bench(source, rate, imus, fmt, corrupt, duration):
+    """SerialWorker'ın okuma döngüsünü sanal cihazla çalıştırıp saniyedeki örnek sayısını ölçer."""
+    if fmt == "binary": return run_binary_bench(source, rate, imus, corrupt, duration)
+    from PyQt6.QtCore import Qt
+    from gui_app import SerialWorker
+    factory = serial_factory(source, rate, imus, fmt, corrupt)
+    worker = SerialWorker("SIM", serial_factory=factory)
+    received = [0]
+    # Olay döngüsü yok: sayaç okuma iş parçacığında doğrudan çağrılır
+    worker.data_received.connect(lambda _: received.__setitem__(0, received[0] + 1), Qt.ConnectionType.DirectConnection)
+
+    thread = threading.Thread(target=worker.run, name="SerialWorker-SIM", daemon=True)
+    started = time.perf_counter()
+    thread.start(); time.sleep(duration)
+    worker.is_running = False; thread.join(2.0)
+    elapsed = time.perf_counter() - started
+
+    stream = factory.last.stream
+    print(f"\n⚡ Okuma verimi: kaynak={source}, {'tempo yok' if rate <= 0 else f'{rate:.0f} Hz'}, {imus} IMU, {fmt}, bozulma %{corrupt * 100:.1f}")
+    print(f"🔹 Üretilen: {stream.sent} örnek | İşlenen: {received[0]} örnek | {received[0] / elapsed:,.0f} örnek/sn")
+    if corrupt: print(f"🔹 Bozulmalar: {stream.corruptor.counts}")
+
+
+def run_binary_bench(source, rate, imus, corrupt, duration):
+    """SerialWorker yalnızca ASCII çözer; ikili biçimde decode_binary'nin çözme verimi ölçülür."""
+    ser = serial_factory(source, rate, imus, "binary", corrupt)()
+    leftover, decoded, errors = b"", 0, 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        frames, leftover, bad = decode_binary(leftover + ser.read(max(ser.in_waiting, 1)))
+        decoded += len(frames); errors += bad
+    elapsed = time.perf_counter() - started
+    print(f"\n⚡ İkili çözme verimi: kaynak={source}, {'tempo yok' if rate <= 0 else f'{rate:.0f} Hz'}, {imus} IMU, bozulma %{corrupt * 100:.1f}")
+    print(f"🔹 Üretilen: {ser.stream.sent} örnek | Çözülen: {decoded} | Hatalı çerçeve: {errors} | {decoded / elapsed:,.0f} örnek/sn")
+
+
+def timing_checks(name, host_t, seq, rate):
+    """Temiz akışta (bozulma yok) zamanlama özeti: boşluk, kayıp ve atılmış satır olmamalı."""
+    import sample_timing
+    timing = sample_timing.estimate(host_t, seq)
+    if timing is None: return [(f"{name}: örnek alındı", False, f"{len(host_t)} örnek")]
+    return [
+        (f"{name}: SEQ ardışık", bool(np.all(np.diff(seq) == 1)), f"{seq[0]}..{seq[-1]}, {len(seq)} örnek"),
+        (f"{name}: boşluk yok", timing["gaps"] == 0 and timing["missing_samples"] == 0,
+         f"{timing['gaps']} boşluk, {timing['missing_samples']} kayıp örnek"),
+        (f"{name}: atılmış satır yok", timing["discarded_lines"] == 0, f"{timing['discarded_lines']} satır"),
+        (f"{name}: efektif hız", abs(timing["fs_effective"] / rate - 1) < 0.02, f"{timing['fs_effective']:.2f} Hz"),
+    ]
+
+
+def run_check(rate=DEFAULT_RATE, duration=5.0):
+    """CI kontrolü: durum/RATE satırları karışık akışta SEQ yalnızca veri satırlarını saymalı
+    (SerialWorker ve AcquisitionService okuma yolları)."""
+    from PyQt6.QtCore import Qt
+    from gui_app import SerialWorker
+    factory = serial_factory("tremor", rate)
+    worker = SerialWorker("SIM", serial_factory=factory)
+    rows = []
+    worker.data_received.connect(rows.append, Qt.ConnectionType.DirectConnection)
+    thread = threading.Thread(target=worker.run, name="SerialWorker-SIM", daemon=True)
+    thread.start(); time.sleep(duration)
+    worker.is_running = False; thread.join(2.0)
+
+    checks = [("SerialWorker: RATE satırı okundu", worker.device_rate == rate, f"{worker.device_rate}")]
+    checks += timing_checks("SerialWorker", [r[-2] for r in rows], [r[-1] for r in rows], rate)
+
+    # Aynı akış başsız serviste (acquisition_service._read_device)
+    from acquisition_service import AcquisitionService, CallbackClient
+    service = AcquisitionService()
+    device = service.add_device("SIM", "SIM", serial_factory=serial_factory("tremor", rate))
+    packets = []
+    service.add_client(CallbackClient(packets.append), "check", policy="block")
+    service.start_background(); time.sleep(duration); service.stop()
+    checks.append(("AcquisitionService: RATE satırı okundu", device.rate == rate, f"{device.rate}"))
+    checks += timing_checks("AcquisitionService", [p.t for p in packets], [p.seq for p in packets], rate)
+    print(f"\n🧪 Zamanlama kontrolü: {rate:.0f} Hz, {duration:.0f} sn, saniyede 3 durum/RATE satırı")
+    for name, ok, detail in checks:
+        print(f"{'✅' if ok else '❌'} {name}: {detail}")
+    return 0 if all(ok for _, ok, _ in checks) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sanal sensör cihazı (pty / loopback)")
+    parser.add_argument("--source", default="tremor", help="tremor | tapping | replay | <kayıt.csv>")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Örnekleme hızı (Hz); 0 = tempo yok")
+    parser.add_argument("--imus", type=int, default=1, help="IMU sayısı (satır başına 6 x IMU değer)")
+    parser.add_argument("--format", choices=["ascii", "binary"], default="ascii")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="Satır başına bozulma olasılığı (0-1)")
+    parser.add_argument("--battery", type=float, default=None, help="Satır sonuna eklenecek batarya değeri (ASCII)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=0.0, help="Süre (sn); 0 = Ctrl+C'ye kadar")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--pty", action="store_true", help="Sahte terminal aç (varsayılan)")
+    mode.add_argument("--bench", action="store_true", help="SerialWorker okuma verimini ölç")
+    mode.add_argument("--check", action="store_true", help="CI: durum satırlı akışta SEQ/boşluk kontrolü (hata = çıkış kodu 1)")
+    args = parser.parse_args()
+
+    if args.check:
+        return run_check(args.rate if args.rate > 0 else DEFAULT_RATE, args.duration or 5.0)
+
+    if args.bench:
+        run_bench(args.source, args.rate, args.imus, args.format, args.corrupt, args.duration or 5.0); return
+    source = make_source(args.source, args.imus, args.rate, args.seed)
+    run_pty(DeviceStream(source, args.rate, args.format, args.corrupt, args.battery, args.seed), args.duration)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
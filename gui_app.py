@@ -12,6 +12,15 @@ import numpy as np
 from datetime import datetime
 import importlib
 from database import TestDatabase
+from calibration import CalibrationService
+from trend_engine import TrendService, result_metrics, strongest_correlations
+from stim_log import StimulationLog, STIM_COLUMNS, recording_settings
+from closed_loop import ClosedLoopEngine, ThresholdPolicy, FS
+from acquisition_service import AcquisitionService, CallbackClient, decode_line
+from stream_server import StreamServer
+from shm_ring import ShmRingClient
+import perf_trace
+import sample_timing
 
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QComboBox, 
@@ -19,8 +28,9 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QTabWidget, QSpinBox, QTextEdit, QTextBrowser, 
                              QGroupBox, QGridLayout, QDialog, QMenu, QStackedWidget,
                              QSlider, QFormLayout, QProgressBar, QScrollArea,
-                             QTableWidget, QTableWidgetItem, QHeaderView) 
-from PyQt6.QtCore import QTimer, QThread, pyqtSignal, Qt, QPropertyAnimation, QEasingCurve
+                             QTableWidget, QTableWidgetItem, QHeaderView, QTableView, QCheckBox) 
+from PyQt6.QtCore import (QTimer, QThread, pyqtSignal, Qt, QPropertyAnimation, QEasingCurve,
+                          QAbstractTableModel, QModelIndex, QObject)
 from PyQt6.QtGui import QAction
 
 import pyqtgraph as pg
@@ -32,50 +42,85 @@ except: pass
 pg.setConfigOption('background', '#FFFFFF')
 pg.setConfigOption('foreground', '#2C3E50')
 
+# Veri toplama: "1" ise port acquisition_service üzerinden okunur (GUI servisin bir istemcisi olur)
+# Canlı yayın portu verilirse (stream_server) ikincil izleyiciler COM portunu açmadan abone olabilir; servis gerektirir
+# Paylaşımlı bellek halkası adı verilirse (shm_ring) analiz süreçleri örnekleri kopyasız okur; servis gerektirir
+STREAM_PORT = int(os.environ.get("NEUROMOTION_STREAM_PORT", "0") or 0)
+SHM_RING = os.environ.get("NEUROMOTION_SHM_RING", "")
+USE_ACQUISITION_SERVICE = os.environ.get("NEUROMOTION_ACQ_SERVICE") == "1" or bool(STREAM_PORT) or bool(SHM_RING)
+
+# Canlı grafik kare hızı (örnek hızından bağımsız) ve IMU kart etiketlerinin güncellenme hızı
+RENDER_FPS = int(os.environ.get("NEUROMOTION_RENDER_FPS", "30") or 30)
+LABEL_FPS = 5
+
 # ----------------------------------------
 # 1. ARKA PLAN İŞÇİSİ (SERIAL WORKER)
 # ----------------------------------------
+def expand_packet(values, battery_val, t_in, seq):
+    """Çözülmüş cihaz paketi -> GUI listesi: 12 IMU x 6 eksen, batarya, host zaman damgası (sn), satır sırası."""
+    if len(values) >= 72:
+        # Tam paket: 12 IMU x 6 eksen
+        multi_sensor_data = list(values[:72])
+    else:
+        # GÖMÜLÜ EKİP BURAYI GERÇEK VERİ PAKETİNE GÖRE DÜZENLEYECEK
+        base_sensor = list(values[:6])
+        multi_sensor_data = []
+        for i in range(12):
+            if i == 0:
+                multi_sensor_data.extend(base_sensor)
+            else:
+                noise_acc = np.random.normal(0, 100, 3).tolist()
+                noise_gyro = np.random.normal(0, 10, 3).tolist()
+                multi_sensor_data.extend([
+                    base_sensor[0] + noise_acc[0], base_sensor[1] + noise_acc[1], base_sensor[2] + noise_acc[2],
+                    base_sensor[3] + noise_gyro[0], base_sensor[4] + noise_gyro[1], base_sensor[5] + noise_gyro[2]
+                ])
+    multi_sensor_data.extend((battery_val, t_in, seq))
+    return multi_sensor_data
+
+
 class SerialWorker(QThread):
     data_received = pyqtSignal(list)
 
-    def __init__(self, port_name, baud_rate=115200):
+    def __init__(self, port_name, baud_rate=115200, serial_factory=None):
         super().__init__()
         self.port_name = port_name
         self.baud_rate = baud_rate
         self.is_running = True
         self.serial_conn = None
+        self.serial_factory = serial_factory or serial.Serial   # Sanal cihazla test için değiştirilebilir
+        self.closed_loop = None   # Deneysel: closed_loop.ClosedLoopEngine (okuma iş parçacığında çalışır)
+        self.line_seq = 0         # Veri satırı sayacı (durum/RATE satırları sayılmaz); kayıtta SEQ atlaması = atılan bozuk satır
+        self.device_rate = None   # Firmware'in "RATE,<hz>" satırıyla bildirdiği örnekleme hızı
 
     def run(self):
         try:
-            self.serial_conn = serial.Serial(self.port_name, self.baud_rate, timeout=0.1)
+            self.serial_conn = self.serial_factory(self.port_name, self.baud_rate, timeout=0.1)
             while self.is_running:
                 if self.serial_conn.in_waiting:
                     try:
                         line = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
-                        parts = line.split(',')
-                        
-                        if len(parts) >= 6: 
-                            raw_data = [float(x) for x in parts]
-                            battery_val = raw_data[6] if len(parts) >= 7 else 0.0 
-                            
-                            # GÖMÜLÜ EKİP BURAYI GERÇEK VERİ PAKETİNE GÖRE DÜZENLEYECEK
-                            base_sensor = [raw_data[0], raw_data[1], raw_data[2], raw_data[3], raw_data[4], raw_data[5]]
-                            multi_sensor_data = []
-                            for i in range(12):
-                                if i == 0:
-                                    multi_sensor_data.extend(base_sensor)
-                                else:
-                                    noise_acc = np.random.normal(0, 100, 3).tolist()
-                                    noise_gyro = np.random.normal(0, 10, 3).tolist()
-                                    multi_sensor_data.extend([
-                                        base_sensor[0] + noise_acc[0], base_sensor[1] + noise_acc[1], base_sensor[2] + noise_acc[2],
-                                        base_sensor[3] + noise_gyro[0], base_sensor[4] + noise_gyro[1], base_sensor[5] + noise_gyro[2]
-                                    ])
+                        t_in = time.perf_counter()
+                        try: decoded = decode_line(line)
+                        except (ValueError, IndexError):
+                            self.line_seq += 1   # Bozuk veri satırı da bir örnek yuvasıdır
+                            raise
+                        if decoded is None:
+                            if line and perf_trace.ENABLED: perf_trace.count("short_lines")
+                            continue
+                        if decoded[0] == "rate":
+                            self.device_rate = decoded[1]
+                            continue
+
+                        _, values, battery_val = decoded
+                        self.line_seq += 1
+                        loop = self.closed_loop
+                        if loop is not None: loop.on_sample(values, t_in)
+                        if perf_trace.ENABLED: perf_trace.ingested(t_in)
+                        self.data_received.emit(expand_packet(values, battery_val, t_in, self.line_seq))
                             
-                            multi_sensor_data.append(battery_val)
-                            self.data_received.emit(multi_sensor_data)
-                            
-                    except (ValueError, IndexError): pass
+                    except (ValueError, IndexError):
+                        if perf_trace.ENABLED: perf_trace.count("malformed")
                 else:
                     time.sleep(0.001)
         except Exception as e: print(f"Bağlantı Hatası: {e}")
@@ -83,13 +128,14 @@ class SerialWorker(QThread):
             if self.serial_conn and self.serial_conn.is_open:
                 self.serial_conn.close()
 
-    def send_command(self, command_string):
+    def send_command(self, command_string, log=True, on_written=None):
         """STM32'ye komut gönderme fonksiyonu (Backend Ekibi için TX)"""
         if self.serial_conn and self.serial_conn.is_open:
             try:
                 cmd = f"{command_string}\r\n".encode('utf-8')
                 self.serial_conn.write(cmd)
-                print(f"-> Giden Komut: {command_string}")
+                if on_written: on_written()
+                if log: print(f"-> Giden Komut: {command_string}")
             except Exception as e: print(f"Komut gönderme hatası: {e}")
 
     def stop(self):
@@ -98,6 +144,44 @@ class SerialWorker(QThread):
         self.wait(500)
 
 
+class ServiceWorker(QObject):
+    """SerialWorker ile aynı arayüz; portu bir AcquisitionService üzerinden okur.
+    GUI servisin "gui" istemcisidir (drop_oldest: ekran geride kalırsa eski örnekler atılır)."""
+    data_received = pyqtSignal(list)
+    GUI_QUEUE = 500
+
+    def __init__(self, port_name, baud_rate=115200, serial_factory=None, stream_port=STREAM_PORT, shm_ring=SHM_RING):
+        super().__init__()
+        self.device_id = port_name
+        self.closed_loop = None
+        self.service = AcquisitionService()
+        self.service.add_device(port_name, port_name, baud_rate, serial_factory)
+        self.subscription = self.service.add_client(CallbackClient(self._on_packet), "gui", self.GUI_QUEUE)
+        if stream_port: self.service.add_client(StreamServer(port=stream_port), "yayın")
+        if shm_ring: self.service.add_client(ShmRingClient(shm_ring), "halka")
+
+    @property
+    def device_rate(self):
+        return self.service.devices[self.device_id].rate
+
+    def start(self):
+        self.service.start_background()
+
+    def _on_packet(self, packet):
+        # Servis iş parçacığında çalışır; emit kuyruklu bağlantıyla GUI'ye geçer
+        loop = self.closed_loop
+        if loop is not None: loop.on_sample(packet.values, packet.t)
+        if perf_trace.ENABLED: perf_trace.ingested(packet.t)
+        self.data_received.emit(expand_packet(packet.values, packet.battery, packet.t, packet.seq))
+
+    def send_command(self, command_string, log=True, on_written=None):
+        if self.service.send_command(self.device_id, command_string, on_written) and log:
+            print(f"-> Giden Komut: {command_string}")
+
+    def stop(self):
+        self.service.stop()
+
+
 # ----------------------------------------
 # DOKTOR GİRİŞ EKRANI
 # ----------------------------------------
@@ -242,6 +326,98 @@ class RegisterDialog(QDialog):
         else:
             QMessageBox.critical(self, "Hata", "Kayıt oluşturulurken bir hata oluştu (E-posta zaten kayıtlı olabilir).")
 
+# ----------------------------------------
+# LOG TABLOSU MODELİ (SAYFALI / SANAL)
+# ----------------------------------------
+class LogTableModel(QAbstractTableModel):
+    """
+    system_logs için anahtar-kümesi (keyset) sayfalamalı model.
+    Aşağı kaydırdıkça eski sayfalar çekilir; bellekte en fazla MAX_ROWS satır tutulur,
+    fazlası karşı uçtan atılır ve o yöne kaydırılınca yeniden çekilir.
+    """
+    HEADERS = ["Tarih", "Seviye", "Mesaj", "İşlem Yapan"]
+    PAGE_SIZE = 200
+    MAX_ROWS = 2000
+    LEVEL_COLORS = {'ERROR': Qt.GlobalColor.red, 'WARNING': Qt.GlobalColor.darkYellow}
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.rows = []          # (id, log_date, level, message, doctor_name)
+        self.filters = {}
+        self.has_older = False
+        self.has_newer = False
+
+    def set_filters(self, level=None, doctor=None, text=None):
+        self.filters = {'level': level or None, 'doctor': doctor or None, 'text': text or None}
+        self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self.rows = self.db.get_logs_page(limit=self.PAGE_SIZE, **self.filters)
+        self.has_older = len(self.rows) == self.PAGE_SIZE
+        self.has_newer = False
+        self.endResetModel()
+
+    # --- Qt model arayüzü ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        _, log_date, level, message, doctor = self.rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0: return log_date.strftime('%d.%m.%Y %H:%M:%S') if hasattr(log_date, 'strftime') else str(log_date)
+            return (level, message, doctor)[col - 1]
+        if role == Qt.ItemDataRole.ForegroundRole and col == 1:
+            return self.LEVEL_COLORS.get(level)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_older
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.rows: return
+        last = self.rows[-1]
+        page = self.db.get_logs_page(before=(last[1], last[0]), limit=self.PAGE_SIZE, **self.filters)
+        self.has_older = len(page) == self.PAGE_SIZE
+        if not page: return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+        overflow = len(self.rows) - self.MAX_ROWS
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self.rows[:overflow]
+            self.endRemoveRows()
+            self.has_newer = True
+
+    def fetch_newer(self):
+        """Listenin başına gelinince daha önce atılmış yeni kayıtları geri çeker."""
+        if not self.has_newer or not self.rows: return
+        first = self.rows[0]
+        page = self.db.get_logs_page(after=(first[1], first[0]), limit=self.PAGE_SIZE, **self.filters)
+        self.has_newer = len(page) == self.PAGE_SIZE
+        if not page: return
+        self.beginInsertRows(QModelIndex(), 0, len(page) - 1)
+        self.rows[:0] = page
+        self.endInsertRows()
+        overflow = len(self.rows) - self.MAX_ROWS
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), len(self.rows) - overflow, len(self.rows) - 1)
+            del self.rows[-overflow:]
+            self.endRemoveRows()
+            self.has_older = True
+
 # ----------------------------------------
 # ADMİN PANELİ (GELİŞMİŞ YÖNETİM)
 # ----------------------------------------
@@ -295,6 +471,20 @@ class AdminPanelDialog(QDialog):
         grid.addWidget(self.card_patients, 1, 0); grid.addWidget(self.card_tests, 1, 1)
         
         layout.addLayout(grid)
+
+        # Son 30 gün aktivitesi (tek gruplu sorgudan)
+        activity = QGroupBox("📈 SON 30 GÜN AKTİVİTESİ"); activity.setObjectName("StatCard")
+        act_lay = QHBoxLayout(activity)
+        self.plot_activity = pg.PlotWidget(title="Günlük Test Sayısı"); self.plot_activity.setMinimumHeight(180)
+        self.plot_activity.showGrid(y=True, alpha=0.3)
+        self.activity_bars = pg.BarGraphItem(x=[], height=[], width=0.8, brush='#9B59B6')
+        self.plot_activity.addItem(self.activity_bars)
+        act_lay.addWidget(self.plot_activity, stretch=3)
+        self.lbl_activity_doctors = QLabel("-"); self.lbl_activity_doctors.setAlignment(Qt.AlignmentFlag.AlignTop)
+        self.lbl_activity_types = QLabel("-"); self.lbl_activity_types.setAlignment(Qt.AlignmentFlag.AlignTop)
+        act_lay.addWidget(self.lbl_activity_doctors, stretch=1); act_lay.addWidget(self.lbl_activity_types, stretch=1)
+        layout.addWidget(activity)
+
         layout.addStretch()
         return tab
 
@@ -375,12 +565,33 @@ class AdminPanelDialog(QDialog):
     def _create_logs_tab(self):
         tab = QWidget(); layout = QVBoxLayout(tab)
         layout.addWidget(QLabel("📋 SİSTEM ETKİNLİK GÜNLÜĞÜ (AUDIT LOGS)"))
-        
-        self.table_logs = QTableWidget(0, 4)
-        self.table_logs.setHorizontalHeaderLabels(["Tarih", "Seviye", "Mesaj", "İşlem Yapan"])
-        self.table_logs.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+
+        filter_row = QHBoxLayout()
+        self.combo_log_level = QComboBox(); self.combo_log_level.addItems(["Tüm Seviyeler", "INFO", "WARNING", "ERROR"])
+        self.txt_log_doctor = QLineEdit(); self.txt_log_doctor.setPlaceholderText("İşlem yapan (tam ad)...")
+        self.txt_log_search = QLineEdit(); self.txt_log_search.setPlaceholderText("Mesajda ara...")
+        filter_row.addWidget(self.combo_log_level); filter_row.addWidget(self.txt_log_doctor); filter_row.addWidget(self.txt_log_search, stretch=2)
+        layout.addLayout(filter_row)
+
+        self.log_model = LogTableModel(self.db, self)
+        self.table_logs = QTableView()
+        self.table_logs.setModel(self.log_model)
+        self.table_logs.verticalHeader().setVisible(False)
+        self.table_logs.verticalHeader().setDefaultSectionSize(24)   # sabit satır yüksekliği: hızlı kaydırma
+        self.table_logs.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table_logs.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
         self.table_logs.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.table_logs.verticalScrollBar().valueChanged.connect(self._on_log_scroll)
         layout.addWidget(self.table_logs)
+        self.lbl_log_status = QLabel(); self.lbl_log_status.setStyleSheet("color: #E74C3C;"); self.lbl_log_status.hide()
+        layout.addWidget(self.lbl_log_status)
+
+        # Yazarken her tuşta sorgu atmamak için kısa gecikme
+        self.log_filter_timer = QTimer(); self.log_filter_timer.setSingleShot(True); self.log_filter_timer.setInterval(300)
+        self.log_filter_timer.timeout.connect(self.refresh_logs)
+        self.combo_log_level.currentIndexChanged.connect(self.refresh_logs)
+        self.txt_log_doctor.textChanged.connect(self.log_filter_timer.start)
+        self.txt_log_search.textChanged.connect(self.log_filter_timer.start)
         
         btn_refresh_logs = QPushButton("LOGLARI YENİLE"); btn_refresh_logs.setObjectName("ActionBtn"); btn_refresh_logs.setStyleSheet("background-color: #34495E;")
         btn_refresh_logs.clicked.connect(self.refresh_logs)
@@ -398,6 +609,16 @@ class AdminPanelDialog(QDialog):
             self.stat_labels["Toplam Hasta"].setText(str(stats.get('patients', 0)))
             self.stat_labels["Yapılan Test"].setText(str(stats.get('tests', 0)))
 
+        activity = self.db.get_activity_stats(30)
+        if activity:
+            per_day = activity['per_day']
+            self.activity_bars.setOpts(x=list(range(len(per_day))), height=list(per_day.values()))
+            self.plot_activity.getAxis('bottom').setTicks([[(i, d[5:]) for i, d in enumerate(per_day)]])
+            top_docs = "<br>".join(f"{name}: {n}" for name, n in list(activity['per_doctor'].items())[:8]) or "-"
+            top_types = "<br>".join(f"{name}: {n}" for name, n in activity['per_type'].items()) or "-"
+            self.lbl_activity_doctors.setText(f"<b>Doktor Bazında</b><br>{top_docs}")
+            self.lbl_activity_types.setText(f"<b>Test Türüne Göre</b><br>{top_types}")
+
     def refresh_users(self):
         # Onay Bekleyenler
         self.list_pending.clear()
@@ -447,21 +668,17 @@ class AdminPanelDialog(QDialog):
             self.table_patients.setRowHidden(row, not match)
 
     def refresh_logs(self):
-        logs = self.db.get_all_logs(200)
-        self.table_logs.setRowCount(0)
-        for l in logs:
-            row = self.table_logs.rowCount()
-            self.table_logs.insertRow(row)
-            date_str = l['log_date'].strftime('%d.%m %H:%M') if hasattr(l['log_date'], 'strftime') else str(l['log_date'])
-            self.table_logs.setItem(row, 0, QTableWidgetItem(date_str))
-            
-            lvl_item = QTableWidgetItem(l['level'])
-            if l['level'] == 'ERROR': lvl_item.setForeground(Qt.GlobalColor.red)
-            elif l['level'] == 'WARNING': lvl_item.setForeground(Qt.GlobalColor.darkYellow)
-            
-            self.table_logs.setItem(row, 1, lvl_item)
-            self.table_logs.setItem(row, 2, QTableWidgetItem(l['message']))
-            self.table_logs.setItem(row, 3, QTableWidgetItem(l['doctor_name']))
+        level = self.combo_log_level.currentText() if self.combo_log_level.currentIndex() > 0 else None
+        self.log_model.set_filters(level, self.txt_log_doctor.text().strip(), self.txt_log_search.text().strip())
+        self.table_logs.resizeColumnToContents(0)
+        # Loglar yalnızca sunucudan okunur; bağlantı yoksa boş liste yerine nedeni gösterilir
+        error = self.db.remote_error
+        self.lbl_log_status.setText(f"⚠️ Loglar sunucudan okunamadı: {error}" if error else "")
+        self.lbl_log_status.setVisible(bool(error))
+
+    def _on_log_scroll(self, value):
+        if value == self.table_logs.verticalScrollBar().minimum():
+            self.log_model.fetch_newer()
 
     def approve_doctor(self):
         idx = self.list_pending.currentRow()
@@ -678,16 +895,78 @@ class PDFPreviewDialog(QDialog):
         except Exception as e:
             self.browser.setHtml(f"<b style='color:red;'>PDF Görselleştirilirken Hata Oluştu: {e}</b>")
 
+# ----------------------------------------
+# 12 IMU GENEL BAKIŞ (SPARKLINE IZGARASI)
+# ----------------------------------------
+class SparklineGrid(pg.GraphicsLayoutWidget):
+    """12 IMU ivme büyüklüğü izi tek bir GraphicsLayout'ta: ortak X/Y eksenleri (bağlı), otomatik
+    seyreltme (peak) ve görünüme kırpma. Kare başına tek boyama; tıklanan IMU'nun detayı açılır."""
+    TRACE_PEN = '#8E44AD'
+
+    def __init__(self, positions, on_select, column_gap=None):
+        super().__init__()
+        self.setBackground('#FFFFFF')
+        self.on_select = on_select
+        self.plots, self.curves, self.labels = [], [], []
+        last_row = max(r for r, _ in positions)
+        first_right = column_gap[0] + 1 if column_gap else None
+        self._y_range = None
+        for i, (row, col) in enumerate(positions):
+            plot = self.addPlot(row=row, col=col)
+            plot.setMouseEnabled(False, False); plot.setMenuEnabled(False); plot.hideButtons(); plot.disableAutoRange()
+            plot.setDownsampling(auto=True, mode='peak'); plot.setClipToView(True)
+            # Ortak eksenler yalnızca sol sütunda ve alt satırda çizilir (eksen boyaması karenin en pahalı kısmı)
+            if col in (0, first_right): plot.getAxis('left').setPen('#7F8C8D')
+            else: plot.hideAxis('left')
+            if row == last_row: plot.getAxis('bottom').setPen('#7F8C8D')
+            else: plot.hideAxis('bottom')
+            if self.plots:
+                plot.setXLink(self.plots[0]); plot.setYLink(self.plots[0])
+            curve = plot.plot(pen=pg.mkPen(self.TRACE_PEN, width=1), antialias=False, skipFiniteCheck=True)
+            label = pg.TextItem(f"IMU {i+1}  Bekliyor...", color='#2C3E50', anchor=(0, 0))
+            plot.addItem(label, ignoreBounds=True)
+            self.plots.append(plot); self.curves.append(curve); self.labels.append(label)
+        if column_gap: self.ci.layout.setColumnSpacing(column_gap[0], column_gap[1])
+        self.scene().sigMouseClicked.connect(self._on_click)
+
+    def _on_click(self, event):
+        for i, plot in enumerate(self.plots):
+            if plot.sceneBoundingRect().contains(event.scenePos()):
+                self.on_select(i); return
+
+    def set_traces(self, magnitudes, window):
+        """magnitudes: (12, örnek) g. Tek çağrıda 12 iz + ortak eksen aralığı."""
+        for curve, trace in zip(self.curves, magnitudes): curve.setData(trace)
+        # Ortak Y aralığı histerezisli: veri taşınca ya da aralık yarıdan fazla daralınca değişir,
+        # böylece eksenler her karede yeniden hesaplanmaz
+        lo, hi = float(magnitudes.min()), float(magnitudes.max())
+        current = self._y_range
+        if current is None or lo < current[0] or hi > current[1] or (hi - lo) < 0.5 * (current[1] - current[0]):
+            pad = max((hi - lo) * 0.2, 0.02)
+            self._y_range = (lo - pad, hi + pad)
+            self.plots[0].setRange(xRange=(0, window), yRange=self._y_range, padding=0)
+            for label in self.labels: label.setPos(0, self._y_range[1])
+
+    def set_labels(self, values):
+        for i, (label, value) in enumerate(zip(self.labels, values)):
+            label.setText(f"IMU {i+1}  {value:.2f} G")
+
+    def clear(self):
+        for i, (curve, label) in enumerate(zip(self.curves, self.labels)):
+            curve.setData([]); label.setText(f"IMU {i+1}  Bekliyor...")
+        self._y_range = None
+
+
 # ----------------------------------------
 # ANA PENCERE (GUI)
 # ----------------------------------------
 class ParkinsonGUI(QMainWindow):
+    closed_loop_changed = pyqtSignal(str)   # Kapalı döngü komutu (okuma iş parçacığından kuyrukla gelir)
     def __init__(self, doctor_info):
         super().__init__()
         self.current_doctor = doctor_info
         self.setWindowTitle(f"NeuroMotion Analiz - Klinik Komuta Merkezi v7.1 | Doktor: {self.current_doctor['name']}")
         self.resize(1500, 950)
-        self.plot_counter = 0 
         
         self.setStyleSheet("""
             QMainWindow { background-color: #F4F6F9; }
@@ -713,7 +992,11 @@ class ParkinsonGUI(QMainWindow):
 
         self.worker = None
         self.recording_data = [] 
+        self.record_t0 = 0.0
         self.is_recording = False
+        self.closed_loop = None
+        self.closed_loop_changed.connect(self._on_closed_loop_command)
+        self.stim_log = StimulationLog()   # Kayda örnek bazında eklenen stimülasyon durumu ve olayları
         self.current_filename = ""
         self.current_mode = "" 
         self.current_patient = None
@@ -729,12 +1012,18 @@ class ParkinsonGUI(QMainWindow):
         
         self.workspace_root = os.path.dirname(os.path.abspath(__file__))
         self.db = TestDatabase()
+        self.calibration = CalibrationService(self.db)
+        self.trends = TrendService(self.db)
         self.db.log_event("INFO", f"Uygulama oturumu başladı.", self.current_doctor['name'])
         self.buffer_size = 300
-        self.multi_data_buffer = [{'ax': [], 'ay': [], 'az': [], 'gx': [], 'gy': [], 'gz': []} for _ in range(12)]
+        self.battery_pct = None
+        self.reset_plot_buffer()
         self.active_detailed_imu = 0 
 
         self.init_ui()
+        # Çizim örnek gelişinden bağımsız, sabit kare hızında
+        self.render_timer = QTimer(); self.render_timer.timeout.connect(self.render_frame)
+        self.render_timer.start(max(int(1000 / RENDER_FPS), 1))
         self.refresh_patient_list()
         
         self.update_preview_1()
@@ -918,6 +1207,13 @@ class ParkinsonGUI(QMainWindow):
         self.btn_view3.clicked.connect(lambda: self.switch_graph_view(2))
         
         top_bar.addWidget(self.btn_view1); top_bar.addWidget(self.btn_view2); top_bar.addWidget(self.btn_view3)
+
+        # Performans izi: okuma/dağıtım/tampon/çizim süreleri ve UI gecikmesi (kapalıyken maliyetsiz)
+        self.btn_perf = self.create_button("⏱ Performans", "#ECF0F1", "#BDC3C7", text_color="#2C3E50")
+        self.btn_perf.setCheckable(True); self.btn_perf.toggled.connect(self.toggle_perf_overlay)
+        self.btn_perf_export = self.create_button("İzi Kaydet", "#34495E", "#2C3E50"); self.btn_perf_export.setVisible(False)
+        self.btn_perf_export.clicked.connect(self.export_perf_trace)
+        top_bar.addWidget(self.btn_perf); top_bar.addWidget(self.btn_perf_export)
         layout.addLayout(top_bar)
 
         self.main_stack = QStackedWidget()
@@ -926,46 +1222,10 @@ class ParkinsonGUI(QMainWindow):
         # KATMAN 1 (Index 0): KARMA GÖRÜNÜM
         page_mixed = QWidget(); page_mixed_layout = QVBoxLayout(page_mixed); page_mixed_layout.setContentsMargins(0, 0, 0, 0); page_mixed_layout.setSpacing(10)
         
-        # 1. Kısım: IMU Butonları (Sol El ve Sağ El Ayrımı - 6x2 Genel Düzen)
-        top_imu_layout = QHBoxLayout()
-        top_imu_layout.setSpacing(15) # Gruplar ve çizgi arasına nefes alma payı
-        
-        # SOL EL GRUBU (IMU 1-6)
-        left_grid_widget = QWidget(); left_grid_layout = QGridLayout(left_grid_widget)
-        left_grid_layout.setSpacing(10); left_grid_layout.setContentsMargins(0, 0, 0, 0)
-        
-        # AYIRICI İNCE ÇİZGİ
-        divider = QFrame()
-        divider.setFrameShape(QFrame.Shape.VLine)
-        divider.setStyleSheet("border: 2px solid #34495E; max-width: 2px; border-radius: 1px;")
-        
-        # SAĞ EL GRUBU (IMU 7-12)
-        right_grid_widget = QWidget(); right_grid_layout = QGridLayout(right_grid_widget)
-        right_grid_layout.setSpacing(10); right_grid_layout.setContentsMargins(0, 0, 0, 0)
-        
-        self.imu_buttons_mixed = []
-        for i in range(12):
-            btn = QPushButton(f"IMU {i+1}\n\nDurum: Bekliyor...")
-            btn.setProperty("class", "imu_card")
-            btn.setSizePolicy(btn.sizePolicy().Policy.Expanding, btn.sizePolicy().Policy.Expanding)
-            btn.clicked.connect(lambda checked, idx=i: self.switch_sensor_view(idx))
-            
-            # MATEMATİK: İlk 6 sensörü SOLA, son 6 sensörü SAĞA dağıtıyoruz
-            if i < 6:
-                # 3 sütun, 2 satır şeklinde sola dizer
-                left_grid_layout.addWidget(btn, i // 3, i % 3)
-            else:
-                # 3 sütun, 2 satır şeklinde sağa dizer
-                right_grid_layout.addWidget(btn, (i - 6) // 3, (i - 6) % 3)
-                
-            self.imu_buttons_mixed.append(btn)
-            
-        top_imu_layout.addWidget(left_grid_widget, stretch=5)
-        top_imu_layout.addWidget(divider, stretch=0)
-        top_imu_layout.addWidget(right_grid_widget, stretch=5)
-        
-        
-        page_mixed_layout.addLayout(top_imu_layout, stretch=2)
+        # 1. Kısım: 12 IMU Genel Bakış (Sol El IMU 1-6 | Sağ El IMU 7-12, her el 3 sütun x 2 satır)
+        mixed_positions = [(i // 3, i % 3) if i < 6 else ((i - 6) // 3, 3 + (i - 6) % 3) for i in range(12)]
+        self.spark_grid_mixed = SparklineGrid(mixed_positions, self.switch_sensor_view, column_gap=(2, 40))
+        page_mixed_layout.addWidget(self.spark_grid_mixed, stretch=2)
 
         # 2. Kısım: Yatay Grafik Alanı (Sensörler ile Alt Parametrelerin Arasında)
         mixed_stim_widget = QWidget(); mixed_stim_layout = QHBoxLayout(mixed_stim_widget); mixed_stim_layout.setSpacing(10); mixed_stim_layout.setContentsMargins(0, 0, 0, 0)
@@ -988,16 +1248,9 @@ class ParkinsonGUI(QMainWindow):
 
         # KATMAN 2 (Index 1): SADECE SENSÖR GÖRÜNÜMÜ
         page_sensors = QWidget(); page_sensors_layout = QVBoxLayout(page_sensors); page_sensors_layout.setContentsMargins(0,0,0,0)
-        self.sensor_stack = QStackedWidget(); self.grid_widget = QWidget(); grid_layout = QGridLayout(self.grid_widget); grid_layout.setSpacing(15)
-        
-        self.imu_buttons = []
-        for i in range(12):
-            btn = QPushButton(f"IMU {i+1}\n\nDurum: Bekliyor...")
-            btn.setProperty("class", "imu_card"); btn.setSizePolicy(btn.sizePolicy().Policy.Expanding, btn.sizePolicy().Policy.Expanding)
-            btn.clicked.connect(lambda checked, idx=i: self.switch_sensor_view(idx))
-            self.imu_buttons.append(btn); grid_layout.addWidget(btn, row := i // 4, col := i % 4)
-            
-        self.sensor_stack.addWidget(self.grid_widget) 
+        self.sensor_stack = QStackedWidget()
+        self.spark_grid = SparklineGrid([(i // 4, i % 4) for i in range(12)], self.switch_sensor_view)
+        self.sensor_stack.addWidget(self.spark_grid) 
         self.detail_widget = QWidget(); detail_layout = QVBoxLayout(self.detail_widget)
         self.lbl_active_imu = QLabel("IMU 1 Detay Görünümü"); self.lbl_active_imu.setStyleSheet("font-size: 18px; font-weight: bold; color: #2980B9;")
         detail_layout.addWidget(self.lbl_active_imu)
@@ -1069,6 +1322,12 @@ class ParkinsonGUI(QMainWindow):
 
         self.main_stack.addWidget(page_stim); layout.addWidget(self.main_stack, stretch=1)
 
+        self.lbl_perf_overlay = QLabel(self.main_stack); self.lbl_perf_overlay.setVisible(False)
+        self.lbl_perf_overlay.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.lbl_perf_overlay.setStyleSheet("background-color: rgba(44, 62, 80, 200); color: #ECF0F1; font-family: monospace; font-size: 11px; padding: 8px; border-radius: 6px;")
+        self.perf_overlay_timer = QTimer(); self.perf_overlay_timer.timeout.connect(self.refresh_perf_overlay)
+        self.perf_lag_timer = QTimer(); self.perf_lag_timer.timeout.connect(self._perf_lag_tick)
+
         # --- ELEKTRİK YÖNETİMİ PANELİ ---
         group_stim = QGroupBox("Terapötik Stimülasyon Yönetimi"); group_stim.setMaximumHeight(220); stim_main_layout = QVBoxLayout(group_stim)
         
@@ -1090,6 +1349,12 @@ class ParkinsonGUI(QMainWindow):
         self.btn_apply_stim_2 = self.create_button("SİNYALİ BAŞLAT (K2)", "#3498DB", "#2980B9"); self.btn_apply_stim_2.clicked.connect(self.toggle_stimulation_2) 
         stim_layout_2.addWidget(self.btn_apply_stim_2); stim_main_layout.addLayout(stim_layout_2)
 
+        # Deneysel kapalı döngü: tremor bant gücü eşiği aşınca K1 otomatik başlatılır/durdurulur
+        loop_layout = QHBoxLayout()
+        self.chk_closed_loop = QCheckBox("Kapalı Döngü (Deneysel, K1 ayarlarıyla)"); self.chk_closed_loop.toggled.connect(self.toggle_closed_loop)
+        self.lbl_closed_loop = QLabel("Kapalı döngü kapalı."); self.lbl_closed_loop.setStyleSheet("color: #7F8C8D;")
+        loop_layout.addWidget(self.chk_closed_loop); loop_layout.addWidget(self.lbl_closed_loop, stretch=1); stim_main_layout.addLayout(loop_layout)
+
         layout.addWidget(group_stim, stretch=0); self.switch_graph_view(0)
         return tab
 
@@ -1114,7 +1379,21 @@ class ParkinsonGUI(QMainWindow):
         self.detail_card = QGroupBox("HASTA AYRINTILI DOSYASI"); self.detail_card.setStyleSheet("QGroupBox { font-size: 15px; background-color: #FFFFFF; }")
         card_layout = QVBoxLayout(self.detail_card)
         self.txt_full_details = QTextBrowser(); self.txt_full_details.setOpenExternalLinks(False); self.txt_full_details.anchorClicked.connect(self.open_report_from_link)
-        self.txt_full_details.setReadOnly(True); card_layout.addWidget(self.txt_full_details); layout.addWidget(self.detail_card, 2)
+        self.txt_full_details.setReadOnly(True); card_layout.addWidget(self.txt_full_details, stretch=3)
+
+        # Boylamsal trend: seçilen metrik, kayan ortalama ve değişim noktaları
+        trend_group = QGroupBox("BOYLAMSAL TREND"); trend_lay = QVBoxLayout(trend_group)
+        trend_bar = QHBoxLayout()
+        self.combo_trend_metric = QComboBox(); self.combo_trend_metric.currentIndexChanged.connect(self.draw_patient_trend)
+        trend_bar.addWidget(QLabel("Metrik:")); trend_bar.addWidget(self.combo_trend_metric, stretch=1)
+        trend_lay.addLayout(trend_bar)
+        self.plot_trend = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()}); self.plot_trend.setMinimumHeight(200)
+        self.plot_trend.showGrid(x=True, y=True, alpha=0.3); self.plot_trend.addLegend(offset=(10, 5))
+        trend_lay.addWidget(self.plot_trend)
+        self.lbl_trend_info = QLabel("Hasta seçin."); self.lbl_trend_info.setWordWrap(True); self.lbl_trend_info.setStyleSheet("color: #566573;")
+        trend_lay.addWidget(self.lbl_trend_info)
+        card_layout.addWidget(trend_group, stretch=2); layout.addWidget(self.detail_card, 2)
+        self.trend_summary = {}
         QTimer.singleShot(100, self.refresh_db_tab_list)
         return tab
 
@@ -1227,6 +1506,44 @@ class ParkinsonGUI(QMainWindow):
                 </table>
             </div>"""
             self.txt_full_details.setHtml(info_html)
+            self.update_patient_trend(patient_name)
+
+    def update_patient_trend(self, patient_name):
+        # Özet TrendService önbelleğinden gelir; yalnızca hastanın testleri değiştiyse yeniden hesaplanır
+        try: self.trend_summary = self.trends.get(patient_name)
+        except Exception as e:
+            print(f"Trend Hatası: {e}"); self.trend_summary = {}
+        current = self.combo_trend_metric.currentData()
+        self.combo_trend_metric.blockSignals(True); self.combo_trend_metric.clear()
+        for test_type, data in self.trend_summary.items():
+            for key, m in data['metrics'].items():
+                self.combo_trend_metric.addItem(f"{test_type} - {m['label']} ({data['count']} seans)", (test_type, key))
+        idx = self.combo_trend_metric.findData(current)
+        self.combo_trend_metric.setCurrentIndex(idx if idx >= 0 else 0)
+        self.combo_trend_metric.blockSignals(False)
+        self.draw_patient_trend()
+
+    def draw_patient_trend(self):
+        self.plot_trend.clear()
+        selection = self.combo_trend_metric.currentData()
+        if not selection or selection[0] not in self.trend_summary:
+            self.lbl_trend_info.setText("Bu hasta için analiz metriği kayıtlı test bulunamadı."); return
+        test_type, key = selection
+        data = self.trend_summary[test_type]; m = data['metrics'][key]; t = data['t']
+        self.plot_trend.plot(t, m['values'], pen=pg.mkPen('#BDC3C7', width=1), symbol='o', symbolSize=6,
+                             symbolBrush='#2980B9', symbolPen=None, name=m['label'])
+        self.plot_trend.plot(t, m['rolling_mean'], pen=pg.mkPen('#E67E22', width=2), name="Kayan Ortalama")
+        for cp in m['change_points']:
+            self.plot_trend.addItem(pg.InfiniteLine(pos=t[cp], angle=90, pen=pg.mkPen('#C0392B', width=1, style=Qt.PenStyle.DashLine)))
+
+        info = [f"Son: <b>{m['last']:.2f}</b> | Ortalama: {m['overall_mean']:.2f}"]
+        if m['change_points']:
+            dates = ", ".join(datetime.fromtimestamp(t[cp]).strftime('%d.%m.%Y') for cp in m['change_points'])
+            info.append(f"Seviye değişimi: {dates}")
+        corrs = strongest_correlations(m)
+        if corrs:
+            info.append("Stimülasyon korelasyonu: " + ", ".join(f"{label} r={r:+.2f}" for label, r in corrs))
+        self.lbl_trend_info.setText("<br>".join(info))
             
     def open_report_from_link(self, url):
         import base64
@@ -1295,6 +1612,7 @@ class ParkinsonGUI(QMainWindow):
         # Cihaz çalışırken değer değişirse güncellemeyi gönder (Backend TX)
         if self.is_stimulating_1 and self.worker:
             self.worker.send_command(f"STIM_UPDATE:1:{hz}:{pulse_us}:{amp}")
+            self.stim_log.record(1, "UPDATE", hz, pulse_us, amp, len(self.recording_data))
 
     def update_preview_2(self):
         hz = self.slider_hz_2.value(); pulse_us = self.slider_pulse_2.value(); amp = self.slider_amp_2.value()
@@ -1313,25 +1631,38 @@ class ParkinsonGUI(QMainWindow):
         # Cihaz çalışırken değer değişirse güncellemeyi gönder (Backend TX)
         if self.is_stimulating_2 and self.worker:
             self.worker.send_command(f"STIM_UPDATE:2:{hz}:{pulse_us}:{amp}")
+            self.stim_log.record(2, "UPDATE", hz, pulse_us, amp, len(self.recording_data))
 
     def toggle_stimulation_1(self):
         if not self.current_patient: QMessageBox.warning(self, "Uyarı", "Lütfen önce bir hasta seçin!"); return
+        # Backend Başlatma / Durdurma Komutu (TX)
         if not self.is_stimulating_1:
-            self.is_stimulating_1 = True
-            
-            # Backend Başlatma Komutu (TX)
             hz = self.slider_hz_1.value(); pulse = self.slider_pulse_1.value(); amp = self.slider_amp_1.value()
-            if self.worker: self.worker.send_command(f"STIM_START:1:{hz}:{pulse}:{amp}")
+            self._send_stim_1(True, f"STIM_START:1:{hz}:{pulse}:{amp}")
+        else:
+            self._send_stim_1(False, "STIM_STOP:1")
+        self._set_stim_1_state(not self.is_stimulating_1)
+
+    def _send_stim_1(self, active, command):
+        if not self.worker: return
+        # Kapalı döngü açıkken elle komut motorun kilidinden geçer; politika K1'in durumunu bilir
+        if self.closed_loop: self.closed_loop.override(active, lambda: self.worker.send_command(command))
+        else: self.worker.send_command(command)
+
+    def _set_stim_1_state(self, active, params=None):
+        """K1 durumunun tek yolu (elle ya da kapalı döngü): stim_log, sayaç ve düğme. Komut göndermez."""
+        hz, pulse, amp = params or (self.slider_hz_1.value(), self.slider_pulse_1.value(), self.slider_amp_1.value())
+        self.is_stimulating_1 = active
+        if active:
+            self.stim_log.record(1, "ON", hz, pulse, amp, len(self.recording_data))
             
             self.stim_remaining_1 = self.slider_dur_1.value() * 60; self.stim_countdown_timer_1.start(1000); self.update_stim_countdown_1() 
             self.curve_stim_1.setPen(pg.mkPen('#E74C3C', width=3)); self.curve_stim_1_mixed.setPen(pg.mkPen('#E74C3C', width=3))
             self.btn_apply_stim_1.setStyleSheet("QPushButton { background-color: #E74C3C; color: #FFFFFF; border-radius: 6px; padding: 10px; font-weight: bold; }")
             if self.main_stack.currentIndex() not in [0, 2]: self.switch_graph_view(2)
         else:
-            self.is_stimulating_1 = False; self.stim_countdown_timer_1.stop()
-            
-            # Backend Durdurma Komutu (TX)
-            if self.worker: self.worker.send_command("STIM_STOP:1")
+            self.stim_countdown_timer_1.stop()
+            self.stim_log.record(1, "OFF", hz, pulse, amp, len(self.recording_data))
             
             self.curve_stim_1.setPen(pg.mkPen('#2ECC71', width=2)); self.curve_stim_1_mixed.setPen(pg.mkPen('#2ECC71', width=2))
             self.btn_apply_stim_1.setText("SİNYALİ BAŞLAT (K1)")
@@ -1349,6 +1680,7 @@ class ParkinsonGUI(QMainWindow):
             # Backend Başlatma Komutu (TX)
             hz = self.slider_hz_2.value(); pulse = self.slider_pulse_2.value(); amp = self.slider_amp_2.value()
             if self.worker: self.worker.send_command(f"STIM_START:2:{hz}:{pulse}:{amp}")
+            self.stim_log.record(2, "ON", hz, pulse, amp, len(self.recording_data))
             
             self.stim_remaining_2 = self.slider_dur_2.value() * 60; self.stim_countdown_timer_2.start(1000); self.update_stim_countdown_2()
             self.curve_stim_2.setPen(pg.mkPen('#E74C3C', width=3)); self.curve_stim_2_mixed.setPen(pg.mkPen('#E74C3C', width=3))
@@ -1359,6 +1691,7 @@ class ParkinsonGUI(QMainWindow):
             
             # Backend Durdurma Komutu (TX)
             if self.worker: self.worker.send_command("STIM_STOP:2")
+            self.stim_log.record(2, "OFF", self.slider_hz_2.value(), self.slider_pulse_2.value(), self.slider_amp_2.value(), len(self.recording_data))
             
             self.curve_stim_2.setPen(pg.mkPen('#3498DB', width=2)); self.curve_stim_2_mixed.setPen(pg.mkPen('#3498DB', width=2))
             self.btn_apply_stim_2.setText("SİNYALİ BAŞLAT (K2)")
@@ -1455,6 +1788,7 @@ class ParkinsonGUI(QMainWindow):
         if not self.is_recording:
             self.is_recording = True
             self.recording_data = []
+            self.stim_log.start_recording()
             self.btn_record.setText("KAYDI BİTİR VE ANALİZ ET")
             
             self.current_mode = "Tremor" if "Tremor" in self.combo_mode.currentText() else "Bradikinezi"
@@ -1463,6 +1797,7 @@ class ParkinsonGUI(QMainWindow):
             self.current_filename = os.path.join(folder, f"{self.current_patient}_{self.current_mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
         else:
             self.is_recording = False
+            self.stim_log.stop_recording()
             self.btn_record.setText("KAYDI BAŞLAT")
             
             # Veri Kaydedildiyse Analize Gönder
@@ -1479,8 +1814,20 @@ class ParkinsonGUI(QMainWindow):
             writer = csv.writer(f)
             headers = []
             for i in range(12): headers.extend([f"IMU{i+1}_AccX", f"IMU{i+1}_AccY", f"IMU{i+1}_AccZ", f"IMU{i+1}_GyroX", f"IMU{i+1}_GyroY", f"IMU{i+1}_GyroZ"])
+            headers.extend(STIM_COLUMNS)
+            headers.extend(sample_timing.TIMING_COLUMNS)
             writer.writerow(headers)
             writer.writerows(self.recording_data)
+        self.stim_log.save_events(self.current_filename)
+        # Kayıt bilgisi (hız, kaynak, boşluklar): analiz kaydın hızını buradan okur
+        try:
+            host_t = [row[-2] for row in self.recording_data if row[-2] != ""]
+            seq = [row[-1] for row in self.recording_data if row[-2] != ""]
+            meta = sample_timing.recording_meta(host_t, seq, getattr(self.worker, 'device_rate', None))
+            sample_timing.save_meta(self.current_filename, meta)
+            print(f"📏 Kayıt hızı: {meta['fs']} Hz ({meta['fs_source']}) | efektif {meta.get('fs_effective')} Hz | "
+                  f"boşluk {meta.get('gaps', 0)} | bozuk satır {meta.get('discarded_lines', 0)}")
+        except Exception as e: print(f"Kayıt bilgisi hesaplanamadı: {e}")
         try: self.db.add_test(self.current_patient, self.current_mode, self.current_filename, 0.0, 0.0, "", self.current_doctor['name'])
         except: pass
         return True
@@ -1495,21 +1842,31 @@ class ParkinsonGUI(QMainWindow):
         }
 
         try:
+            # Cihazın güncel kalibrasyon profili (DB -> yerel önbellek -> eski dosya)
+            calibration_profile = self.calibration.get()
             QApplication.processEvents() 
             if self.current_mode == "Tremor":
                 import analyze_tremor
                 importlib.reload(analyze_tremor)
                 # Parametreleri gönderiyoruz
-                analyze_tremor.run_analysis(self.current_filename, stim_data)
+                metrics = analyze_tremor.run_analysis(self.current_filename, stim_data, calibration_profile)
                 pdf_path = self.current_filename.replace(".csv", "_TREMOR_KLINIK_RAPOR.pdf")
             else:
                 import analyze_bradykinesia
                 importlib.reload(analyze_bradykinesia)
                 # Parametreleri gönderiyoruz
-                analyze_bradykinesia.run_analysis(self.current_filename, stim_data)
+                metrics = analyze_bradykinesia.run_analysis(self.current_filename, stim_data, calibration_profile)
                 pdf_path = self.current_filename.replace(".csv", "_FINAL_RAPOR.pdf")
             
             QApplication.processEvents()
+
+            # Metrikler test_metrics tablosuna yazılır (trend ve kohort sorguları buradan okur)
+            if metrics:
+                primary = float(metrics.get('peak_g', metrics.get('speed', 0.0)))
+                # Saklanan stimülasyon ayarı kaydın STIM sütunlarından gelir (analiz anındaki sürgüler değil);
+                # stimülasyon kapalıysa stim_* metrikleri yazılmaz
+                stim_settings = recording_settings(self.current_filename)
+                self.db.save_test_result(self.current_filename, float(metrics['updrs']), primary, result_metrics(metrics, stim_settings))
             
             # PDF OLUŞTU MU KONTROLÜ (Sessiz Hataları Yakalar)
             if os.path.exists(pdf_path):
@@ -1521,68 +1878,163 @@ class ParkinsonGUI(QMainWindow):
             QMessageBox.critical(self, "Analiz Çöktü", f"Analiz dosyası çalıştırılamadı.\n\nHata: {e}")
 
     def update_plot(self, data):
+        # Yalnızca alım: kayıt satırı + çizim halkası. Ekran render_frame'de sabit hızda (RENDER_FPS) güncellenir
+        traced = perf_trace.ENABLED
+        if traced: t_start = perf_trace.dispatched()
         if len(data) >= 73:
-            battery_pct = int(data[72]); self.prog_battery.setValue(battery_pct)
-            if self.is_recording: self.recording_data.append(data[:72])
-
-            for i in range(12):
-                base_idx = i * 6
-                self.multi_data_buffer[i]['ax'].append(data[base_idx+0] / 16384.0)
-                self.multi_data_buffer[i]['ay'].append(data[base_idx+1] / 16384.0)
-                self.multi_data_buffer[i]['az'].append(data[base_idx+2] / 16384.0)
-                self.multi_data_buffer[i]['gx'].append(data[base_idx+3] / 131.0)
-                self.multi_data_buffer[i]['gy'].append(data[base_idx+4] / 131.0)
-                self.multi_data_buffer[i]['gz'].append(data[base_idx+5] / 131.0)
-
-                for key in ['ax', 'ay', 'az', 'gx', 'gy', 'gz']:
-                    if len(self.multi_data_buffer[i][key]) > self.buffer_size: self.multi_data_buffer[i][key].pop(0)
-                        
-            is_grid_visible = (self.main_stack.currentIndex() == 0) or (self.main_stack.currentIndex() == 1 and self.sensor_stack.currentIndex() == 0)
-            if is_grid_visible:
-                self.plot_counter += 1
-                if self.plot_counter % 20 == 0: 
-                    for i in range(12):
-                        if len(self.multi_data_buffer[i]['ax']) > 0:
-                            current_x = self.multi_data_buffer[i]['ax'][-1]
-                            txt = f"IMU {i+1}\n\nAktif: {current_x:.2f} G"
-                            self.imu_buttons[i].setText(txt); self.imu_buttons_mixed[i].setText(txt)
-
-            is_detail_visible = (self.main_stack.currentIndex() == 1 and self.sensor_stack.currentIndex() == 1)
-            if is_detail_visible:
-                self.plot_counter += 1
-                if self.plot_counter % 5 == 0:
-                    idx = self.active_detailed_imu
-                    
-                    ax_data = np.array(self.multi_data_buffer[idx]['ax'])
-                    ay_data = np.array(self.multi_data_buffer[idx]['ay'])
-                    az_data = np.array(self.multi_data_buffer[idx]['az'])
-                    
-                    # 1. Toplam Güç Hesapla ve Çiz
-                    if len(ax_data) > 0:
-                        mag_data = np.sqrt(ax_data**2 + ay_data**2 + az_data**2)
-                        self.curve_mag.setData(mag_data)
-                        
-                        # 2. Karma Grafiği Güncelle
-                        self.curve_comb_x.setData(ax_data)
-                        self.curve_comb_y.setData(ay_data)
-                        self.curve_comb_z.setData(az_data)
-                        
-                        # 3. Bireysel Grafikleri Güncelle
-                        self.curve_ax.setData(ax_data)
-                        self.curve_ay.setData(ay_data)
-                        self.curve_az.setData(az_data)
-                        
+            self.battery_pct = int(data[72])
+            if self.is_recording:
+                # Zaman damgası kaydın ilk örneğine göre; eski/harici kaynaklarda (damgasız) boş kalır
+                if len(data) >= 75:
+                    if not self.recording_data: self.record_t0 = data[73]
+                    timing = [round(data[73] - self.record_t0, 6), int(data[74])]
+                else: timing = ["", ""]
+                self.recording_data.append(data[:72] + self.stim_log.snapshot() + timing)
+
+            self.plot_ring[self.plot_head % self.buffer_size] = data[:72]
+            self.plot_head += 1
+            if traced: perf_trace.complete("buffer", t_start)
+
+    def reset_plot_buffer(self):
+        self.plot_ring = np.zeros((self.buffer_size, 72))   # Ham LSB, 12 IMU x 6 eksen; ölçekleme çizimde
+        self.plot_head = 0                                   # Yazılan toplam örnek (halka konumu = head % boyut)
+        self._rendered_state = None
+        self._labels_at = 0.0
+
+    def _ring_rows(self):
+        """Halkadaki dolu satırlar eskiden yeniye (dilim ya da indeks dizisi)."""
+        if self.plot_head < self.buffer_size: return slice(0, self.plot_head)
+        return np.roll(np.arange(self.buffer_size), -(self.plot_head % self.buffer_size))
+
+    def plot_window(self, imu_index, axes=slice(0, 3)):
+        """Bir IMU'nun halkadaki son örnekleri, eskiden yeniye (örnek x eksen, ham LSB)."""
+        return self.plot_ring[self._ring_rows(), imu_index * 6:imu_index * 6 + 6][:, axes]
+
+    def render_frame(self):
+        """QTimer ile RENDER_FPS'te çalışır: yalnızca görünür sayfadaki widget'lara dokunur, yeni örnek ya da
+        görünüm değişikliği yoksa hiçbir şey yapmaz."""
+        page, sensor_page = self.main_stack.currentIndex(), self.sensor_stack.currentIndex()
+        state = (self.plot_head, page, sensor_page, self.active_detailed_imu)
+        if state == self._rendered_state or self.plot_head == 0: return
+        view_changed = self._rendered_state is None or state[1:] != self._rendered_state[1:]
+        self._rendered_state = state
+        traced = perf_trace.ENABLED
+        if traced: t_start = perf_trace.now()
+
+        if self.battery_pct is not None: self.prog_battery.setValue(self.battery_pct)
+
+        if page == 0 or (page == 1 and sensor_page == 0):
+            # 12 iz tek halkadan, tek boyamada; değer etiketleri daha seyrek (LABEL_FPS), görünüm değişince hemen
+            grid = self.spark_grid_mixed if page == 0 else self.spark_grid
+            acc = self.plot_ring[self._ring_rows()].reshape(-1, 12, 6)[:, :, :3] / 16384.0
+            magnitudes = np.sqrt((acc ** 2).sum(axis=2)).T
+            grid.set_traces(magnitudes, self.buffer_size)
+            now = time.perf_counter()
+            if view_changed or now - self._labels_at >= 1.0 / LABEL_FPS:
+                self._labels_at = now
+                grid.set_labels(magnitudes[:, -1])
+
+        elif page == 1 and sensor_page == 1:
+            acc = self.plot_window(self.active_detailed_imu) / 16384.0
+            ax_data, ay_data, az_data = acc[:, 0], acc[:, 1], acc[:, 2]
+
+            # 1. Toplam Güç
+            self.curve_mag.setData(np.sqrt((acc ** 2).sum(axis=1)))
+            # 2. Karma Grafik
+            self.curve_comb_x.setData(ax_data)
+            self.curve_comb_y.setData(ay_data)
+            self.curve_comb_z.setData(az_data)
+            # 3. Bireysel Grafikler
+            self.curve_ax.setData(ax_data)
+            self.curve_ay.setData(ay_data)
+            self.curve_az.setData(az_data)
+
+        # Çizim: setData/setText işi (ekrana boyama olay döngüsünde olur, UI gecikmesinde görünür)
+        if traced: perf_trace.complete("draw", t_start)
+
+    # ==========================================
+    # PERFORMANS İZİ
+    # ==========================================
+    PERF_LAG_INTERVAL_MS = 50
+
+    def toggle_perf_overlay(self, checked):
+        if checked:
+            perf_trace.enable(); perf_trace.instrument(self.db)
+            self._perf_last_tick = time.perf_counter()
+            self.perf_lag_timer.start(self.PERF_LAG_INTERVAL_MS); self.perf_overlay_timer.start(500)
+            self.refresh_perf_overlay()
+        else:
+            perf_trace.disable(); perf_trace.uninstrument(self.db)
+            self.perf_lag_timer.stop(); self.perf_overlay_timer.stop()
+        self.lbl_perf_overlay.setVisible(checked); self.btn_perf_export.setVisible(checked)
+
+    def _perf_lag_tick(self):
+        # Zamanlayıcının gecikmesi = olay döngüsünün meşgul kaldığı süre (boyama, DB, analiz...)
+        t = time.perf_counter()
+        perf_trace.ui_tick(max(t - self._perf_last_tick - self.PERF_LAG_INTERVAL_MS / 1000.0, 0.0))
+        self._perf_last_tick = t
+
+    def refresh_perf_overlay(self):
+        self.lbl_perf_overlay.setText(perf_trace.format_overlay())
+        self.lbl_perf_overlay.adjustSize()
+        self.lbl_perf_overlay.move(max(self.main_stack.width() - self.lbl_perf_overlay.width() - 10, 0), 10)
+        self.lbl_perf_overlay.raise_()
+
+    def export_perf_trace(self):
+        folder = os.path.join(self.workspace_root, "Performans_Izleri"); os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"perf_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            perf_trace.export_chrome_trace(path)
+            QMessageBox.information(self, "Performans İzi", f"İz kaydedildi (chrome://tracing ya da ui.perfetto.dev ile açın):\n{path}")
+        except OSError as e:
+            QMessageBox.critical(self, "Performans İzi", f"İz kaydedilemedi: {e}")
+
+    def toggle_closed_loop(self, checked):
+        """Motor okuma iş parçacığında çalışır; komutları doğrudan cihaza yazar (GUI'yi beklemez).
+        Her komuttan sonra closed_loop_changed ile GUI iş parçacığında K1 durumu güncellenir."""
+        if checked:
+            policy = ThresholdPolicy(1, self.slider_hz_1.value(), self.slider_pulse_1.value(), self.slider_amp_1.value())
+            policy.active = self.is_stimulating_1      # Elle başlatılmış K1 politikaca bilinir
+            fs = (self.worker.device_rate if self.worker else None) or FS
+            self.closed_loop = ClosedLoopEngine(lambda cmd, written: self.worker and self.worker.send_command(cmd, False, written), policy,
+                                                fs=fs, on_command=self.closed_loop_changed.emit)
+            self.lbl_closed_loop.setText(f"Kapalı döngü aktif: tremor bandı (3.5-7.5 Hz) izleniyor ({fs:g} Hz).")
+        else:
+            if self.worker: self.worker.closed_loop = None
+            if self.closed_loop:
+                self.closed_loop.close()
+                self._on_closed_loop_command("")           # Son komutun durumu kuyruktaki sinyali beklemeden işlenir
+                report = self.closed_loop.report()
+                print("Kapalı döngü uçtan uca gecikme (örnek -> komut):")
+                print(self.closed_loop.command_latency.format_histogram())
+                latency = report["command_latency"]
+                self.lbl_closed_loop.setText(f"Kapalı döngü kapalı. Son oturum: {report['commands']} komut"
+                                             + (f", p50 {latency['p50_us']:.0f} us / p99 {latency['p99_us']:.0f} us" if latency["count"] else ""))
+            self.closed_loop = None
+        if self.worker: self.worker.closed_loop = self.closed_loop
+
+    def _on_closed_loop_command(self, command):
+        """GUI iş parçacığı. Komutu değil motorun güncel durumunu uygular: arada elle yapılan bir
+        aç/kapa (override) kuyruktaki eski sinyalden sonra gelse de düğme cihazla aynı kalır."""
+        loop = self.closed_loop
+        if loop is None or loop.active is None or loop.active == self.is_stimulating_1: return
+        policy = loop.policy
+        self._set_stim_1_state(loop.active, (policy.hz, policy.pw, policy.amp))
+        self.lbl_closed_loop.setText(f"Kapalı döngü K1'i {'başlattı' if loop.active else 'durdurdu'} "
+                                     f"({datetime.now():%H:%M:%S}, güç {loop.last_power * 1000:.2f} mg²).")
+
     def toggle_connection(self):
         if self.worker is None:
             port = self.combo_ports.currentText()
             if not port: return
-            self.worker = SerialWorker(port); self.worker.data_received.connect(self.update_plot); self.worker.start()
+            worker_class = ServiceWorker if USE_ACQUISITION_SERVICE else SerialWorker
+            self.worker = worker_class(port); self.worker.data_received.connect(self.update_plot)
+            self.worker.closed_loop = self.closed_loop; self.worker.start()
             self.btn_connect.setText("BAĞLANTIYI KES"); self.btn_record.setEnabled(True)
         else:
             self.worker.stop(); self.worker = None
             self.btn_connect.setText("CİHAZA BAĞLAN"); self.btn_record.setEnabled(False)
-            for i in range(12): 
-                txt = f"IMU {i+1}\n\nDurum: Bekliyor..."; self.imu_buttons[i].setText(txt); self.imu_buttons_mixed[i].setText(txt)
+            self.reset_plot_buffer(); self.spark_grid.clear(); self.spark_grid_mixed.clear()
 
     def open_pdf_tremor(self, item):
         if not self.current_patient: return
@@ -2,88 +2,233 @@
 import serial
 import time
 import numpy as np
-import os
+
+import calibration
+from calibration import CalibrationProfile, CalibrationService, N_IMU
 
 # --- AYARLAR ---
 SERIAL_PORT = 'COM10'   # Portunu kontrol et
 BAUD_RATE = 115200
-ORNEK_SAYISI = 500     # Ne kadar çok o kadar hassas (500 veri yaklaşık 10 saniye sürer)
+DEVICE_ID = calibration.DEFAULT_DEVICE_ID
+ORNEK_SAYISI = 250      # Her pozisyonda gereken hareketsiz örnek (50 Hz'de ~5 sn)
+OKUMA_BOYUTU = 4096     # Tek seferde okunacak en fazla bayt
+HAREKET_PENCERESI = 25  # Hareket kontrolünün yapıldığı örnek bloğu
+HAREKET_ESIGI_GYRO = 60.0   # Blok içi std (LSB) bunu aşarsa cihaz hareket ediyor sayılır
+HAREKET_ESIGI_ACC = 250.0
+ZAMAN_ASIMI = 60.0      # Tek pozisyon için en uzun bekleme (sn)
+ACC_1G = 16384.0        # 1g'nin LSB karşılığı
+
+# Altı yönlü ivmeölçer kalibrasyonu: (etiket, eksen, işaret)
+ORIENTATIONS = [
+    ("Z ekseni YUKARI (çip yukarı bakıyor)", 2, +1),
+    ("Z ekseni AŞAĞI (ters çevrilmiş)", 2, -1),
+    ("X ekseni YUKARI", 0, +1),
+    ("X ekseni AŞAĞI", 0, -1),
+    ("Y ekseni YUKARI", 1, +1),
+    ("Y ekseni AŞAĞI", 1, -1),
+]
+
+
+class RunningStats:
+    """Welford/Chan birleştirmeli kanal başına çevrimiçi ortalama ve varyans."""
+
+    def __init__(self, n_channels):
+        self.n_channels = n_channels
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.mean = np.zeros(self.n_channels)
+        self.m2 = np.zeros(self.n_channels)
+
+    def update(self, batch):
+        k = len(batch)
+        if k == 0: return
+        batch_mean = batch.mean(axis=0)
+        batch_m2 = ((batch - batch_mean) ** 2).sum(axis=0)
+        delta = batch_mean - self.mean
+        total = self.n + k
+        self.mean += delta * k / total
+        self.m2 += batch_m2 + delta ** 2 * self.n * k / total
+        self.n = total
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.zeros(self.n_channels)
+
+
+class SampleReader:
+    """Seri porttan toplu okuma yapıp satırları (k, 6 x IMU) dizisine çevirir."""
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.leftover = b""
+        self.n_imu = None
+        self.bad_lines = 0
+        self.rate = None          # Firmware'in "RATE,<hz>" satırıyla bildirdiği örnekleme hızı
+
+    def read(self):
+        # Veri yoksa timeout kadar bekler (meşgul döngü yok)
+        chunk = self.ser.read(min(max(self.ser.in_waiting, 1), OKUMA_BOYUTU))
+        if not chunk: return np.empty((0, 6 * (self.n_imu or 1)))
+        lines = (self.leftover + chunk).split(b"\n")
+        self.leftover = lines.pop()
+
+        rows = []
+        for line in lines:
+            parts = line.decode("utf-8", errors="ignore").strip().split(",")
+            if parts[0] == "RATE" and len(parts) >= 2:    # Hız duyurusu, veri satırı değil
+                try: self.rate = float(parts[1])
+                except ValueError: self.bad_lines += 1
+                continue
+            if len(parts) >= N_IMU * 6: n_imu = N_IMU      # 72 (+batarya)
+            elif len(parts) in (6, 7): n_imu = 1           # 6 eksen (+batarya)
+            else:
+                self.bad_lines += 1
+                continue
+            if self.n_imu is None: self.n_imu = n_imu
+            if n_imu != self.n_imu:
+                self.bad_lines += 1
+                continue
+            try:
+                rows.append([float(p) for p in parts[:n_imu * 6]])
+            except ValueError:
+                self.bad_lines += 1
+        return np.array(rows) if rows else np.empty((0, 6 * (self.n_imu or 1)))
+
+
+def is_moving(block):
+    """Blok içindeki dağılım eşikleri aşıyorsa cihaz hareket ediyordur."""
+    std = block.reshape(len(block), -1, 6).std(axis=0)   # (IMU, 6)
+    return bool(np.any(std[:, :3] > HAREKET_ESIGI_ACC) or np.any(std[:, 3:] > HAREKET_ESIGI_GYRO))
+
+
+def capture_static(reader, n_samples=ORNEK_SAYISI):
+    """Hareketsiz n_samples örnek toplar; hareket algılanırsa otomatik olarak baştan başlar."""
+    stats = None
+    pending = []
+    start = time.monotonic()
+    last_report = 0
+
+    while stats is None or stats.n < n_samples:
+        if time.monotonic() - start > ZAMAN_ASIMI:
+            raise TimeoutError(f"{ZAMAN_ASIMI:.0f} sn içinde hareketsiz veri toplanamadı.")
+        block = reader.read()
+        if len(block) == 0: continue
+        if stats is None: stats = RunningStats(block.shape[1])
+        pending.extend(block)
+
+        while len(pending) >= HAREKET_PENCERESI:
+            window = np.array(pending[:HAREKET_PENCERESI]); del pending[:HAREKET_PENCERESI]
+            if is_moving(window):
+                if stats.n > 0: print("\n⚠️  Hareket algılandı, ölçüm yeniden başlatılıyor...")
+                stats.reset(); last_report = 0
+                continue
+            stats.update(window)
+
+        progress = int(min(stats.n / n_samples, 1.0) * 100)
+        if progress >= last_report + 20:
+            last_report = progress - progress % 20
+            print(f"-> %{last_report} tamamlandı")
+
+    return stats.mean.reshape(-1, 6), stats.std.reshape(-1, 6)
+
+
+def solve_single_orientation(mean):
+    """Z yukarı tek pozisyon: jiroskop ve ivmeölçer ofsetleri (eski yöntem)."""
+    offsets = mean.copy()
+    offsets[:, 2] -= ACC_1G
+    return offsets, np.ones_like(mean)
+
+
+def solve_six_orientation(means):
+    """
+    Altı pozisyonun ortalamalarından ivmeölçer bias/ölçek çözümü.
+    Her eksen için: bias = (yukarı + aşağı) / 2, ölçek = 1g / ((yukarı - aşağı) / 2).
+    Jiroskop ofseti tüm pozisyonların ortalamasıdır.
+    """
+    n_imu = means[0].shape[0]
+    offsets = np.zeros((n_imu, 6))
+    scales = np.ones((n_imu, 6))
+    for axis in range(3):
+        i_up = next(i for i, (_, a, sign) in enumerate(ORIENTATIONS) if a == axis and sign > 0)
+        i_down = next(i for i, (_, a, sign) in enumerate(ORIENTATIONS) if a == axis and sign < 0)
+        up, down = means[i_up][:, axis], means[i_down][:, axis]
+        offsets[:, axis] = (up + down) / 2.0
+        half_span = (up - down) / 2.0
+        scales[:, axis] = np.where(half_span > 0, ACC_1G / np.where(half_span > 0, half_span, 1.0), 1.0)
+    offsets[:, 3:] = np.mean([m[:, 3:] for m in means], axis=0)
+    return offsets, scales
+
+
+def build_profile(offsets, scales):
+    """Ölçülen IMU sayısı 12'den azsa kalan IMU'lar birim (düzeltmesiz) kalır."""
+    full_offsets = np.zeros((N_IMU, 6)); full_scales = np.ones((N_IMU, 6))
+    full_offsets[:len(offsets)] = offsets; full_scales[:len(scales)] = scales
+    return CalibrationProfile(full_offsets, full_scales, device_id=DEVICE_ID,
+                              calibrated_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def save_profile(profile):
+    """Doğrudan device_calibration tablosuna yazar; DB yoksa yerel önbelleğe kaydeder."""
+    db = None
+    try:
+        from database import TestDatabase
+        db = TestDatabase()
+        if not db.conn: db = None
+    except ImportError as e:
+        print(f"Veritabanı modülü yüklenemedi: {e}")
+
+    service = CalibrationService(db)
+    if service.save(profile, doctor="Kalibrasyon Aracı"):
+        print(f"\n💾 Kalibrasyon veritabanına kaydedildi (Cihaz: {profile.device_id}).")
+    else:
+        print("\n⚠️  Veritabanına ulaşılamadı; kalibrasyon yerel önbelleğe kaydedildi.")
+
 
 def kalibrasyon_baslat():
     print("\n" + "="*50)
     print("   SENSÖR KALİBRASYON SİSTEMİ")
     print("="*50)
-    print("⚠️  ÖNEMLİ: Cihazı düz bir zemine koyun.")
-    print("⚠️  Sensör çipi yukarı baksın (Z ekseni yukarı).")
-    print("⚠️  İşlem boyunca masayı ASLA sallamayın.")
-    print("-" * 50)
-    input("Hazır olduğunda ENTER tuşuna bas...")
+    print("1. Hızlı Kalibrasyon (tek pozisyon, ofset)")
+    print("2. Tam Kalibrasyon (6 pozisyon, ivmeölçer ölçek + bias)")
+    secim = input("Seçiminiz (1 veya 2): ").strip()
+    orientations = ORIENTATIONS if secim == "2" else ORIENTATIONS[:1]
 
+    print("-" * 50)
+    print("⚠️  Cihazı düz ve sabit bir zemine koyun.")
+    print("⚠️  Ölçüm sırasında hareket algılanırsa ölçüm kendiliğinden yeniden başlar.")
+    print("-" * 50)
     print("\n📡 Bağlantı kuruluyor...")
-    
-    ser = None
-    data_buffer = []
 
+    ser = None
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
+        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.5)
         time.sleep(2) # Arduino reset beklemesi
-        
-        print(f"⏳ Veri toplanıyor... Lütfen bekleyin ({ORNEK_SAYISI} örnek)")
-
-        while len(data_buffer) < ORNEK_SAYISI:
-            if ser.in_waiting > 0:
-                try:
-                    line = ser.readline().decode('utf-8', errors='ignore').strip()
-                    parts = line.split(',')
-                    if len(parts) == 6:
-                        # Hepsini integer'a çevir
-                        vals = [int(p) for p in parts]
-                        data_buffer.append(vals)
-                        
-                        if len(data_buffer) % 50 == 0:
-                            print(f"-> %{int(len(data_buffer)/ORNEK_SAYISI*100)} tamamlandı")
-                except:
-                    pass
-        
-        # --- HESAPLAMA KISMI ---
-        data = np.array(data_buffer)
-        
-        # Sütunlar: 0:AccX, 1:AccY, 2:AccZ, 3:GyroX, 4:GyroY, 5:GyroZ
-        
-        # JİROSKOP: Dururken hepsi 0 olmalı. Ortalaması hatadır.
-        bias_gx = np.mean(data[:, 3])
-        bias_gy = np.mean(data[:, 4])
-        bias_gz = np.mean(data[:, 5])
-
-        # İVMEÖLÇER: Düz dururken X ve Y 0, Z ise 16384 (1g) olmalı.
-        bias_ax = np.mean(data[:, 0])           # Hedef 0
-        bias_ay = np.mean(data[:, 1])           # Hedef 0
-        bias_az = np.mean(data[:, 2]) - 16384.0 # Hedef 16384
+        ser.reset_input_buffer()
+        reader = SampleReader(ser)
+
+        means = []
+        for label, _, _ in orientations:
+            input(f"\n➡️  Pozisyon: {label}. Hazır olduğunda ENTER tuşuna bas...")
+            ser.reset_input_buffer(); reader.leftover = b""
+            print(f"⏳ Veri toplanıyor... ({ORNEK_SAYISI} hareketsiz örnek)")
+            mean, std = capture_static(reader)
+            means.append(mean)
+            print(f"✅ Pozisyon tamam. Gürültü (IMU1 std): {np.array2string(std[0], precision=1)}")
+
+        if len(means) == 1: offsets, scales = solve_single_orientation(means[0])
+        else: offsets, scales = solve_six_orientation(means)
 
         print("\n✅ KALİBRASYON TAMAMLANDI!")
-        print(f"Jiroskop Hataları (X, Y, Z): {bias_gx:.2f}, {bias_gy:.2f}, {bias_gz:.2f}")
-        print(f"İvmeölçer Hataları (X, Y, Z): {bias_ax:.2f}, {bias_ay:.2f}, {bias_az:.2f}")
-
-        # --- DOSYAYA KAYDETME ---
-        dosya_icerigi = f"""# OTOMATIK OLUSTURULAN KALIBRASYON DOSYASI
-# Olusturulma Tarihi: {time.strftime("%Y-%m-%d %H:%M:%S")}
-
-# Jiroskop Sapma Degerleri (Bias)
-OFFSET_GX = {bias_gx:.4f}
-OFFSET_GY = {bias_gy:.4f}
-OFFSET_GZ = {bias_gz:.4f}
-
-# Ivmeolcer Sapma Degerleri (Bias)
-OFFSET_AX = {bias_ax:.4f}
-OFFSET_AY = {bias_ay:.4f}
-OFFSET_AZ = {bias_az:.4f}
-"""
-        
-        with open("kalibrasyon_verisi.py", "w") as f:
-            f.write(dosya_icerigi)
-            
-        print("\n💾 'kalibrasyon_verisi.py' dosyası kaydedildi.")
-        print("Artık analiz kodları bu dosyayı otomatik okuyacak.")
+        print(f"Ölçülen IMU sayısı: {len(offsets)} | Hatalı satır: {reader.bad_lines}")
+        print(f"IMU1 Jiroskop Hataları (X, Y, Z): {offsets[0, 3]:.2f}, {offsets[0, 4]:.2f}, {offsets[0, 5]:.2f}")
+        print(f"IMU1 İvmeölçer Hataları (X, Y, Z): {offsets[0, 0]:.2f}, {offsets[0, 1]:.2f}, {offsets[0, 2]:.2f}")
+        if len(means) > 1:
+            print(f"IMU1 İvmeölçer Ölçekleri (X, Y, Z): {scales[0, 0]:.4f}, {scales[0, 1]:.4f}, {scales[0, 2]:.4f}")
+
+        save_profile(build_profile(offsets, scales))
+        print("Analiz kodları yeni kalibrasyonu otomatik okuyacak.")
 
     except Exception as e:
         print(f"\n❌ HATA: {e}")
@@ -91,4 +236,4 @@ OFFSET_AZ = {bias_az:.4f}
         if ser and ser.is_open: ser.close()
 
 if __name__ == "__main__":
-    kalibrasyon_baslat()
\ No newline at end of file
+    kalibrasyon_baslat()
@@ -0,0 +1,297 @@
+# DOSYA ADI: local_store.py
+# Yerel SQLite (WAL) ayna veritabanı.
+# TestDatabase tüm okuma/yazmalarını önce buraya yapar; sync_engine.py değişiklikleri
+# arka planda MySQL ile eşitler. Bağlantı nesnesi mysql.connector arayüzünü taklit
+# eder (%s yer tutucuları, cursor(dictionary=True)), böylece sorgular iki tarafta da aynıdır.
+#
+# Eşitleme sütunları (her tablo):
+#   updated_at : son yerel değişiklik zamanı (UTC, ms) - çakışmada son yazan kazanır
+#   dirty      : 1 ise henüz MySQL'e gönderilmedi
+# Silmeler sync_tombstones tablosuna düşer ve bir sonraki gönderimde uzakta da silinir.
+# Tarih sütunları (created_at, test_date, calibrated_at) da UTC tutulur; MySQL oturumu UTC'dir
+# (sync_engine). Ekranda gösterirken yerel saate çevrilir: datetime(sütun, 'localtime').
+
+import os
+import sqlite3
+import threading
+
+# --- AYARLAR ---
+LOCAL_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_store.db")
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Eşitlenen tablolar: (anahtar sütun, eşitlenen veri sütunları)
+SYNC_TABLES = {
+    "doctors": ("name", ["name", "email", "password", "specialty", "is_approved", "is_admin"]),
+    "patients": ("protocol_no", ["protocol_no", "name", "age", "gender", "dominant_side", "onset_year",
+                                 "diagnosis", "doctor_name", "contact_phone", "clinical_history", "created_at"]),
+    "tests": ("uuid", ["uuid", "patient_name", "test_type", "file_path", "score", "extra", "notes",
+                       "test_date", "doctor_name"]),
+    "device_calibration": ("uuid", ["uuid", "device_id", "imu_index",
+                                    "offset_ax", "offset_ay", "offset_az", "offset_gx", "offset_gy", "offset_gz",
+                                    "scale_ax", "scale_ay", "scale_az", "scale_gx", "scale_gy", "scale_gz",
+                                    "cross_axis", "calibrated_at"]),
+    "test_metrics": ("uuid", ["uuid", "test_uuid", "metric", "value"]),
+}
+# Yabancı anahtarlar nedeniyle gönderim/çekim sırası
+SYNC_ORDER = ["doctors", "patients", "tests", "device_calibration", "test_metrics"]
+# İlk şema sürümünde (LOCAL_MIGRATIONS 1) bulunan eşitlenen tablolar
+BASELINE_TABLES = ["doctors", "patients", "tests", "device_calibration"]
+
+SYNC_COLUMNS_SQL = f"""
+            updated_at TEXT NOT NULL DEFAULT ({NOW_SQL}),
+            dirty INTEGER NOT NULL DEFAULT 1"""
+UUID_SQL = "uuid TEXT UNIQUE NOT NULL DEFAULT (lower(hex(randomblob(16))))"
+
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS doctors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT DEFAULT '1234',
+        specialty TEXT,
+        is_approved INTEGER DEFAULT 0,
+        is_admin INTEGER DEFAULT 0,{SYNC_COLUMNS_SQL}
+    )""",
+    f"""
+    CREATE TABLE IF NOT EXISTS patients (
+        protocol_no TEXT PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL,
+        age INTEGER,
+        gender TEXT,
+        dominant_side TEXT,
+        onset_year INTEGER,
+        diagnosis TEXT,
+        doctor_name TEXT,
+        contact_phone TEXT,
+        clinical_history TEXT,
+        created_at TEXT DEFAULT (datetime('now')),{SYNC_COLUMNS_SQL}
+    )""",
+    f"""
+    CREATE TABLE IF NOT EXISTS tests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        {UUID_SQL},
+        patient_name TEXT,
+        test_type TEXT,
+        file_path TEXT,
+        score REAL,
+        extra REAL,
+        notes TEXT,
+        test_date TEXT DEFAULT (datetime('now')),
+        doctor_name TEXT,{SYNC_COLUMNS_SQL},
+        FOREIGN KEY (patient_name) REFERENCES patients(name) ON DELETE CASCADE
+    )""",
+    f"""
+    CREATE TABLE IF NOT EXISTS device_calibration (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        {UUID_SQL},
+        device_id TEXT DEFAULT 'Main_Device',
+        imu_index INTEGER DEFAULT 0,
+        offset_ax REAL DEFAULT 0, offset_ay REAL DEFAULT 0, offset_az REAL DEFAULT 0,
+        offset_gx REAL DEFAULT 0, offset_gy REAL DEFAULT 0, offset_gz REAL DEFAULT 0,
+        scale_ax REAL DEFAULT 1, scale_ay REAL DEFAULT 1, scale_az REAL DEFAULT 1,
+        scale_gx REAL DEFAULT 1, scale_gy REAL DEFAULT 1, scale_gz REAL DEFAULT 1,
+        cross_axis TEXT NULL,
+        calibrated_at TEXT DEFAULT (datetime('now')),{SYNC_COLUMNS_SQL}
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS sync_tombstones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_key TEXT NOT NULL,
+        deleted_at TEXT NOT NULL
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS sync_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""",
+]
+
+
+def _trigger_sql(table, key):
+    # sync_applying() yalnızca eşitleme bağlantısında 1 döner; böylece uzaktan gelen
+    # değişiklikler tekrar "kirli" işaretlenmez ve mezar taşı üretmez.
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_touch AFTER UPDATE ON {table}
+        WHEN sync_applying() = 0
+        BEGIN
+            UPDATE {table} SET updated_at = {NOW_SQL}, dirty = 1 WHERE rowid = NEW.rowid;
+        END""",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_tombstone AFTER DELETE ON {table}
+        WHEN sync_applying() = 0
+        BEGIN
+            INSERT INTO sync_tombstones (table_name, row_key, deleted_at) VALUES ('{table}', OLD.{key}, {NOW_SQL});
+        END""",
+    ]
+
+
+# Varsayılan hesaplar: çevrimdışı ilk açılışta da giriş yapılabilsin.
+# updated_at epoch ve dirty=0: uzaktaki kayıt her zaman bunlara baskın gelir.
+SEED_SQL = """
+INSERT OR IGNORE INTO doctors (name, email, password, specialty, is_approved, is_admin, updated_at, dirty)
+VALUES (?, ?, ?, ?, ?, ?, '1970-01-01 00:00:00.000', 0)
+"""
+SEED_ROWS = [
+    ("Admin", "admin@neuromotion.com", "admin123", "System Administrator", 1, 1),
+    ("Dr. Aytaç Durmaz", "aytac@neuromotion.com", "1234", "Neurology", 1, 0),
+]
+
+
+def _translate(sql):
+    return sql.replace("%s", "?")
+
+
+class LocalCursor:
+    """mysql.connector imleci gibi davranan ince sarmalayıcı."""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cur = cursor
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cur.execute(_translate(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_params):
+        self._cur.executemany(_translate(sql), [tuple(p) for p in seq_params])
+        return self
+
+    def _row(self, row):
+        if row is None or not self._dictionary: return row
+        return {d[0]: v for d, v in zip(self._cur.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    @property
+    def lastrowid(self): return self._cur.lastrowid
+
+    @property
+    def rowcount(self): return self._cur.rowcount
+
+    @property
+    def description(self): return self._cur.description
+
+    def close(self):
+        self._cur.close()
+
+
+class LocalConnection:
+    def __init__(self, path=LOCAL_DB_PATH, sync_applying=False):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._db.create_function("sync_applying", 0, lambda: 1 if sync_applying else 0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+
+    def cursor(self, dictionary=False):
+        return LocalCursor(self._db.cursor(), dictionary)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def is_connected(self):
+        return self._db is not None
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+LOCAL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_tests_patient_date ON tests (patient_name, test_date)",
+    "CREATE INDEX IF NOT EXISTS idx_calib_device_date ON device_calibration (device_id, calibrated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_calib_device_imu_date ON device_calibration (device_id, imu_index, calibrated_at)",
+] + [f"CREATE INDEX IF NOT EXISTS idx_{table}_dirty ON {table} (dirty) WHERE dirty = 1" for table in BASELINE_TABLES]
+
+# Test başına analiz metrikleri (metrik başına bir satır); kohort filtreleri indeksli çalışır
+TEST_METRICS_SQL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS test_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        {UUID_SQL},
+        test_uuid TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        value REAL NOT NULL,{SYNC_COLUMNS_SQL},
+        UNIQUE (test_uuid, metric),
+        FOREIGN KEY (test_uuid) REFERENCES tests(uuid) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_metrics_metric_value ON test_metrics (metric, value, test_uuid)",
+    "CREATE INDEX IF NOT EXISTS idx_test_metrics_dirty ON test_metrics (dirty) WHERE dirty = 1",
+] + _trigger_sql("test_metrics", "uuid")
+
+
+def _baseline(cursor):
+    for sql in SCHEMA:
+        cursor.execute(sql)
+    for table in BASELINE_TABLES:
+        for sql in _trigger_sql(table, SYNC_TABLES[table][0]):
+            cursor.execute(sql)
+    cursor.executemany(SEED_SQL, SEED_ROWS)
+
+
+def _indexes(cursor):
+    for sql in LOCAL_INDEXES:
+        cursor.execute(sql)
+
+
+def _test_metrics(cursor):
+    for sql in TEST_METRICS_SQL:
+        cursor.execute(sql)
+
+
+# Yerel şema sürümü PRAGMA user_version'da tutulur; yalnızca bekleyen adımlar çalışır.
+LOCAL_MIGRATIONS = [
+    (1, _baseline),
+    (2, _indexes),
+    (3, _test_metrics),
+]
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def ensure_schema(conn):
+    with _schema_lock:
+        if conn.path in _schema_ready: return
+        cursor = conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for number, step in LOCAL_MIGRATIONS:
+            if number <= version: continue
+            step(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        cursor.close()
+        _schema_ready.add(conn.path)
+
+
+def open_store(path=LOCAL_DB_PATH, sync_applying=False):
+    conn = LocalConnection(path, sync_applying=sync_applying)
+    ensure_schema(conn)
+    return conn
+
+
+def get_meta(conn, key, default=None):
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM sync_meta WHERE key = %s", (key,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else default
+
+
+def set_meta(conn, key, value):
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO sync_meta (key, value) VALUES (%s, %s) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                   (key, value))
+    cursor.close()
@@ -1,11 +1,9 @@
 # DOSYA ADI: main_system.py
-import serial
 import time
-import csv
 import os
-import datetime
 import analyze_tremor       # Titreme modülü
 import analyze_bradykinesia # Bredikinezi m1odülü
+from acquisition_service import AcquisitionService, Recorder
 
 # --- AYARLAR ---
 SERIAL_PORT = 'COM10'   
@@ -44,54 +42,40 @@ def baslat():
 
     print(f"\n📡 BAĞLANTI: {SERIAL_PORT} bekleniyor...")
     
-    ser = None
-    tam_yol = ""
+    # Okuma/çözme acquisition_service'te; kayıt "block" politikasıyla (örnek kaybı yok)
+    service = AcquisitionService()
+    device = service.add_device(SERIAL_PORT, SERIAL_PORT, BAUD_RATE)
+    recorder = Recorder(hedef_klasor, prefix=test_turu)
+    service.add_client(recorder, "kayıt", policy="block")
     veri_sayisi = 0
 
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        time.sleep(2) 
-        
-        zaman = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        dosya_adi = f"{test_turu}_{zaman}.csv"
-        
-        # Dosyayı ilgili klasöre yönlendiriyoruz
-        tam_yol = os.path.join(hedef_klasor, dosya_adi)
+        service.start_background()
 
         print(f"\n🚀 {test_turu} TESTİ BAŞLADI! (Sınırsız Süre)")
-        print(f"📂 Kayıt Yeri: {tam_yol}")
+        print(f"📂 Kayıt Yeri: {hedef_klasor}")
         print("🛑 Bitirmek için klavyeden 'Ctrl + C' tuşlarına basın.")
         print("-" * 40)
         
-        with open(tam_yol, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"])
-            
-            # --- SONSUZ DÖNGÜ ---
-            while True:
-                if ser.in_waiting > 0:
-                    try:
-                        line = ser.readline().decode('utf-8', errors='ignore').strip()
-                        parts = line.split(',')
-                        if len(parts) == 6:
-                            writer.writerow(parts)
-                            veri_sayisi += 1
-                            if veri_sayisi % 50 == 0: 
-                                print(".", end="", flush=True)
-                    except: 
-                        pass
+        # --- SONSUZ DÖNGÜ ---
+        while True:
+            time.sleep(1)
+            if device.samples > veri_sayisi: print(".", end="", flush=True)
+            veri_sayisi = device.samples
 
     except KeyboardInterrupt:
-        print(f"\n\n🛑 KULLANICI DURDURDU. ({veri_sayisi} satır alındı)")
+        print(f"\n\n🛑 KULLANICI DURDURDU. ({device.samples} satır alındı)")
 
     except Exception as e:
         print(f"\n❌ BAĞLANTI HATASI: {e}")
 
     finally:
-        if ser and ser.is_open: ser.close()
+        service.stop()
+        veri_sayisi = device.samples
+        tam_yol = recorder.paths.get(SERIAL_PORT, "")
         
         # --- ANALİZİ TETİKLE ---
-        if veri_sayisi > 50:
+        if veri_sayisi > 50 and tam_yol:
             print(f"\n⏳ {test_turu} Analizi Başlatılıyor...")
             try:
                 if test_turu == "TREMOR":
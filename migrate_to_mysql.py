@@ -1,79 +1,206 @@
 # DOSYA ADI: migrate_to_mysql.py
+# Eski SQLite (test_history.db) verisini MySQL'e aktarır.
+# - Toplu yazım: executemany, CHUNK_SIZE'lık parçalar, her parça ayrı commit
+# - Tekrar çalıştırılabilir: testler doğal anahtardan (hasta, tür, dosya, tarih) türetilen
+#   sabit uuid ile yazılır; uzakta aynı doğal anahtara sahip satırlar atlanır
+# - Kaldığı yerden devam: son aktarılan test id'si CHECKPOINT_PATH dosyasında tutulur
+# Kullanım: python migrate_to_mysql.py [--reset]
 import sqlite3
 import mysql.connector
 import os
+import sys
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from db_config import DB_CONFIG
+import schema_migrations
 
 # SQLite Path
 SQLITE_PATH = "test_history.db"
 WORKSPACE_ROOT = os.path.dirname(os.path.abspath(__file__))
 PATIENTS_DIR = os.path.join(WORKSPACE_ROOT, "VeriSeti_Genel", "Hastalar")
+CHECKPOINT_PATH = os.path.join(WORKSPACE_ROOT, "migrate_checkpoint.json")
+CHUNK_SIZE = 1000
+READ_WORKERS = 8
+# Doğal anahtardan uuid üretmek için sabit ad alanı (her çalıştırmada aynı uuid)
+TEST_NAMESPACE = uuid.UUID("6f1c2d0e-5b7a-4e0f-9a57-3c1d2e4f5a60")
 
-def migrate():
-    if not os.path.exists(SQLITE_PATH):
-        print(f"Hata: {SQLITE_PATH} bulunamadı!")
-        return
+PATIENT_SQL = """
+INSERT INTO patients (protocol_no, name, age, gender, dominant_side, onset_year, diagnosis, doctor_name, contact_phone, clinical_history)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE clinical_history = VALUES(clinical_history)
+"""
+TEST_SQL = """
+INSERT IGNORE INTO tests (uuid, patient_name, test_type, file_path, score, extra, notes, test_date)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
-    # Connect to SQLite
-    sqlite_conn = sqlite3.connect(SQLITE_PATH)
-    sqlite_cursor = sqlite_conn.cursor()
 
-    # Connect to MySQL
+def natural_key(patient_name, test_type, file_path, test_date):
+    return (patient_name or "", test_type or "", file_path or "", str(test_date or ""))
+
+
+def test_uuid(key):
+    return str(uuid.uuid5(TEST_NAMESPACE, "\x1f".join(key)))
+
+
+def load_checkpoint():
+    if "--reset" in sys.argv or not os.path.exists(CHECKPOINT_PATH):
+        return {"patients_done": False, "last_test_id": 0}
+    try:
+        with open(CHECKPOINT_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Uyarı: kontrol noktası okunamadı, baştan başlanıyor: {e}")
+        return {"patients_done": False, "last_test_id": 0}
+
+
+def save_checkpoint(state):
+    tmp_path = CHECKPOINT_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def read_history(name):
+    oyku_path = os.path.join(PATIENTS_DIR, name, "oyku.txt")
+    if not os.path.exists(oyku_path): return ""
     try:
-        mysql_conn = mysql.connector.connect(**DB_CONFIG)
-        mysql_cursor = mysql_conn.cursor()
+        with open(oyku_path, 'r', encoding='utf-8') as f:
+            return f.read()
     except Exception as e:
-        print(f"MySQL Bağlantı Hatası: {e}")
-        return
+        print(f"Uyarı: {name} için öykü dosyası okunamadı: {e}")
+        return ""
+
 
-    print("Veri aktarımı başlıyor...")
+def report(label, count, started):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"{label}: {count} satır, {elapsed:.2f} sn ({count / elapsed:.0f} satır/sn)")
 
-    # 1. Patients Migration
+
+def migrate_patients(sqlite_cursor, mysql_conn):
+    started = time.perf_counter()
     sqlite_cursor.execute("SELECT protocol_no, name, age, gender, dominant_side, onset_year, diagnosis, doctor_name, contact_phone FROM patients")
     patients = sqlite_cursor.fetchall()
 
-    for p in patients:
-        protocol_no, name, age, gender, dominant_side, onset_year, diagnosis, doctor_name, contact_phone = p
-        
-        # Read clinical history from oyku.txt if exists
-        history = ""
-        oyku_path = os.path.join(PATIENTS_DIR, name, "oyku.txt")
-        if os.path.exists(oyku_path):
-            try:
-                with open(oyku_path, 'r', encoding='utf-8') as f:
-                    history = f.read()
-            except Exception as e:
-                print(f"Uyarı: {name} için öykü dosyası okunamadı: {e}")
+    # Öykü dosyaları disk G/Ç'si; iş parçacığı havuzunda paralel okunur
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        histories = list(pool.map(read_history, [p[1] for p in patients]))
 
+    rows = [tuple(p) + (history,) for p, history in zip(patients, histories)]
+    cursor = mysql_conn.cursor()
+    written = 0
+    for i in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[i:i + CHUNK_SIZE]
         try:
-            mysql_cursor.execute("""
-            INSERT INTO patients (protocol_no, name, age, gender, dominant_side, onset_year, diagnosis, doctor_name, contact_phone, clinical_history)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE clinical_history=%s
-            """, (protocol_no, name, age, gender, dominant_side, onset_year, diagnosis, doctor_name, contact_phone, history, history))
-            print(f"Hasta aktarıldı: {name}")
-        except Exception as e:
-            print(f"Hasta aktarım hatası ({name}): {e}")
+            cursor.executemany(PATIENT_SQL, chunk)
+            mysql_conn.commit()
+            written += len(chunk)
+        except mysql.connector.Error as e:
+            # Parça tek bir bozuk satır yüzünden kaybolmasın: tek tek dene, yazılamayanları atla
+            mysql_conn.rollback()
+            print(f"Hasta parçası toplu yazılamadı ({e}), satır satır deneniyor...")
+            for row in chunk:
+                try:
+                    cursor.execute(PATIENT_SQL, row)
+                    mysql_conn.commit()
+                    written += 1
+                except mysql.connector.Error as row_error:
+                    mysql_conn.rollback()
+                    print(f"Hasta atlandı ({row[0]} - {row[1]}): {row_error}")
+    cursor.close()
+    report(f"Hastalar aktarıldı ({len(rows) - written} atlandı)", written, started)
+
+
+def fetch_existing_test_keys(mysql_conn):
+    """Uzakta zaten bulunan testlerin doğal anahtarları (daha önceki, uuid'siz aktarımlar dahil)."""
+    cursor = mysql_conn.cursor()
+    cursor.execute("SELECT patient_name, test_type, file_path, test_date FROM tests")
+    keys = {natural_key(*row) for row in cursor.fetchall()}
+    cursor.close()
+    return keys
+
+
+def migrate_tests(sqlite_cursor, mysql_conn, state):
+    started = time.perf_counter()
+    existing = fetch_existing_test_keys(mysql_conn)
+    cursor = mysql_conn.cursor()
+    sqlite_cursor.execute("""
+        SELECT id, patient_name, test_type, file_path, score, extra, notes, test_date
+        FROM tests WHERE id > ? ORDER BY id
+    """, (state["last_test_id"],))
+
+    written = skipped = 0
+    while True:
+        chunk = sqlite_cursor.fetchmany(CHUNK_SIZE)
+        if not chunk: break
+        batch = []
+        for test_id, patient_name, test_type, file_path, score, extra, notes, test_date in chunk:
+            key = natural_key(patient_name, test_type, file_path, test_date)
+            if key in existing:
+                skipped += 1
+                continue
+            existing.add(key)
+            batch.append((test_uuid(key), patient_name, test_type, file_path, score, extra, notes, test_date))
+        if batch:
+            try:
+                cursor.executemany(TEST_SQL, batch)
+                mysql_conn.commit()
+                written += len(batch)
+            except mysql.connector.Error as e:
+                mysql_conn.rollback()
+                print(f"Test aktarım hatası (id {chunk[0][0]}-{chunk[-1][0]}): {e}")
+                print("Kaldığı yerden devam etmek için betiği tekrar çalıştırın.")
+                cursor.close()
+                return False
+        state["last_test_id"] = chunk[-1][0]
+        save_checkpoint(state)
+
+    cursor.close()
+    report(f"Testler aktarıldı ({skipped} tekrar atlandı)", written, started)
+    return True
+
+
+def migrate():
+    if not os.path.exists(SQLITE_PATH):
+        print(f"Hata: {SQLITE_PATH} bulunamadı!")
+        return
 
-    # 2. Tests Migration
-    sqlite_cursor.execute("SELECT patient_name, test_type, file_path, score, extra, notes, test_date FROM tests")
-    tests = sqlite_cursor.fetchall()
+    # Connect to SQLite
+    sqlite_conn = sqlite3.connect(SQLITE_PATH)
+    sqlite_cursor = sqlite_conn.cursor()
 
-    for t in tests:
-        patient_name, test_type, file_path, score, extra, notes, test_date = t
+    mysql_conn = None
+    try:
+        # Connect to MySQL
         try:
-            mysql_cursor.execute("""
-            INSERT INTO tests (patient_name, test_type, file_path, score, extra, notes, test_date)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (patient_name, test_type, file_path, score, extra, notes, test_date))
+            mysql_conn = mysql.connector.connect(**DB_CONFIG)
+            schema_migrations.migrate(mysql_conn)  # tests.uuid sütunu (tekrar önleme anahtarı)
         except Exception as e:
-            print(f"Test aktarım hatası ({patient_name} - {test_type}): {e}")
+            print(f"MySQL Bağlantı Hatası: {e}")
+            return
 
-    mysql_conn.commit()
-    print("Veri aktarımı başarıyla tamamlandı!")
+        state = load_checkpoint()
+        if state["last_test_id"]:
+            print(f"Kaldığı yerden devam ediliyor (son test id: {state['last_test_id']}).")
+        print("Veri aktarımı başlıyor...")
+        started = time.perf_counter()
 
-    sqlite_conn.close()
-    mysql_conn.close()
+        # 1. Patients Migration
+        if not state["patients_done"]:
+            migrate_patients(sqlite_cursor, mysql_conn)
+            state["patients_done"] = True
+            save_checkpoint(state)
+
+        # 2. Tests Migration
+        if migrate_tests(sqlite_cursor, mysql_conn, state):
+            print(f"Veri aktarımı başarıyla tamamlandı! ({time.perf_counter() - started:.2f} sn)")
+    except Exception as e:
+        print(f"Aktarım Hatası: {e}")
+    finally:
+        sqlite_conn.close()
+        if mysql_conn is not None: mysql_conn.close()
 
 if __name__ == "__main__":
     migrate()
@@ -14,12 +14,15 @@ CREATE TABLE IF NOT EXISTS patients (
     doctor_name VARCHAR(100),
     contact_phone VARCHAR(50),
     clinical_history TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3), -- last-writer-wins stamp (UTC)
+    synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3) -- server-side pull cursor
 );
 
 -- 2. Tests Table
 CREATE TABLE IF NOT EXISTS tests (
     id INT AUTO_INCREMENT PRIMARY KEY,
+    uuid VARCHAR(36) NULL UNIQUE, -- sync key
     patient_name VARCHAR(100),
     test_type VARCHAR(50),
     file_path TEXT,
@@ -28,20 +31,33 @@ CREATE TABLE IF NOT EXISTS tests (
     notes TEXT,
     test_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     doctor_name VARCHAR(100), -- New: Track who did the test
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3), -- last-writer-wins stamp (UTC)
+    synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3), -- server-side pull cursor
     FOREIGN KEY (patient_name) REFERENCES patients(name) ON DELETE CASCADE
 );
 
 -- 3. Calibration Table
 CREATE TABLE IF NOT EXISTS device_calibration (
     id INT AUTO_INCREMENT PRIMARY KEY,
+    uuid VARCHAR(36) NULL UNIQUE, -- sync key
     device_id VARCHAR(50) DEFAULT 'Main_Device',
+    imu_index INT DEFAULT 0, -- 0..11
     offset_ax DOUBLE DEFAULT 0,
     offset_ay DOUBLE DEFAULT 0,
     offset_az DOUBLE DEFAULT 0,
     offset_gx DOUBLE DEFAULT 0,
     offset_gy DOUBLE DEFAULT 0,
     offset_gz DOUBLE DEFAULT 0,
-    calibrated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    scale_ax DOUBLE DEFAULT 1,
+    scale_ay DOUBLE DEFAULT 1,
+    scale_az DOUBLE DEFAULT 1,
+    scale_gx DOUBLE DEFAULT 1,
+    scale_gy DOUBLE DEFAULT 1,
+    scale_gz DOUBLE DEFAULT 1,
+    cross_axis TEXT NULL, -- JSON 6x6 matrix
+    calibrated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3), -- last-writer-wins stamp (UTC)
+    synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3) -- server-side pull cursor
 );
 
 -- 4. Doctors Table (Updated)
@@ -52,7 +68,9 @@ CREATE TABLE IF NOT EXISTS doctors (
     password VARCHAR(255) DEFAULT '1234',
     specialty VARCHAR(100),
     is_approved TINYINT(1) DEFAULT 0,
-    is_admin TINYINT(1) DEFAULT 0
+    is_admin TINYINT(1) DEFAULT 0,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3), -- last-writer-wins stamp (UTC)
+    synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3) -- server-side pull cursor
 );
 
 -- 5. System Logs Table (New)
@@ -64,6 +82,33 @@ CREATE TABLE IF NOT EXISTS system_logs (
     doctor_name VARCHAR(100)
 );
 
+-- 6. Per-test analysis metrics (one row per metric; cohort filters use idx_metrics_metric_value)
+CREATE TABLE IF NOT EXISTS test_metrics (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    uuid VARCHAR(36) NOT NULL UNIQUE,
+    test_uuid VARCHAR(36) NOT NULL,
+    metric VARCHAR(40) NOT NULL, -- updrs, dominant_freq, peak_g, speed, ..., stim_ch1_hz, ...
+    value DOUBLE NOT NULL,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+    synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+    UNIQUE KEY uq_test_metric (test_uuid, metric),
+    FOREIGN KEY (test_uuid) REFERENCES tests(uuid) ON DELETE CASCADE
+);
+
 -- Initial Data
 INSERT IGNORE INTO doctors (name, email, password, specialty, is_approved, is_admin) VALUES ('Admin', 'admin@neuromotion.com', 'admin123', 'System Administrator', 1, 1);
 INSERT IGNORE INTO doctors (name, email, password, specialty, is_approved) VALUES ('Dr. Aytaç Durmaz', 'aytac@neuromotion.com', '1234', 'Neurology', 1);
+
+-- Indexes for the actual query patterns (names match schema_migrations.INDEXES)
+CREATE INDEX idx_tests_patient_date ON tests (patient_name, test_date);
+CREATE INDEX idx_logs_date ON system_logs (log_date, id);
+CREATE INDEX idx_calib_device_date ON device_calibration (device_id, calibrated_at);
+CREATE INDEX idx_calib_device_imu ON device_calibration (device_id, imu_index, id);
+CREATE INDEX idx_doctors_synced ON doctors (synced_at);
+CREATE INDEX idx_patients_synced ON patients (synced_at);
+CREATE INDEX idx_tests_synced ON tests (synced_at);
+CREATE INDEX idx_device_calibration_synced ON device_calibration (synced_at);
+CREATE INDEX idx_metrics_metric_value ON test_metrics (metric, value, test_uuid);
+CREATE INDEX idx_test_metrics_synced ON test_metrics (synced_at);
+
+-- The application records applied migrations in schema_version on first start.
@@ -0,0 +1,193 @@
+# DOSYA ADI: perf_trace.py
+# Sıcak yol (hot path) ölçümü: okuma -> dağıtım -> tampon -> çizim aşamaları, sayaçlar,
+# kuyruk derinliği ve arayüz olay döngüsü gecikmesi.
+# Kapalıyken maliyet, çağrı noktalarındaki tek bir `perf_trace.ENABLED` kontrolüdür;
+# veritabanı çağrıları yalnızca açıkken sarmalanır (instrument / uninstrument).
+# Olaylar sınırlı bir halkada tutulur ve Chrome trace biçiminde dışa aktarılır
+# (chrome://tracing ya da https://ui.perfetto.dev ile açılır).
+
+import functools
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+# --- AYARLAR ---
+MAX_EVENTS = 200000       # Halkadaki en fazla olay (eskiler düşer)
+STAGE_WINDOW = 2000       # Özet için aşama başına tutulan son ölçüm sayısı
+STAGES = ("ingest", "dispatch", "buffer", "draw", "db")
+
+ENABLED = False
+
+_t0 = time.perf_counter()
+_events = deque(maxlen=MAX_EVENTS)          # (ph, ad, kategori, başlangıç sn, süre sn / değer, tid, args)
+_recent = defaultdict(lambda: deque(maxlen=STAGE_WINDOW))
+_counters = defaultdict(int)
+_gauges = {}
+_threads = {}
+_pending = deque()                          # Okuma iş parçacığında emit edilmiş, GUI'nin henüz almadığı örnekler
+_main_thread = threading.main_thread().ident
+
+now = time.perf_counter
+
+
+def enable():
+    global ENABLED, _t0
+    reset()
+    _t0 = time.perf_counter()
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+    _pending.clear()
+
+
+def reset():
+    _events.clear(); _recent.clear(); _counters.clear(); _gauges.clear(); _pending.clear()
+
+
+def _tid():
+    ident = threading.get_ident()
+    if ident not in _threads: _threads[ident] = threading.current_thread().name
+    return ident
+
+
+# ========================================================
+# KAYIT
+# ========================================================
+
+def complete(name, start, end=None, cat="pipeline", args=None, stage=None):
+    """Süreli olay (Chrome 'X'). stage verilirse özet istatistiğe de girer (varsayılan: ad)."""
+    end = end if end is not None else time.perf_counter()
+    _events.append(("X", name, cat, start, end - start, _tid(), args))
+    _recent[stage or name].append(end - start)
+
+
+def count(name, n=1):
+    _counters[name] += n
+
+
+def gauge(name, value):
+    _gauges[name] = value
+    _events.append(("C", name, "gauge", time.perf_counter(), value, _tid(), None))
+
+
+def instant(name, cat="event", args=None):
+    _events.append(("i", name, cat, time.perf_counter(), 0, _tid(), args))
+
+
+# --- Örnek yolu ---
+def ingested(t_in):
+    """Okuma iş parçacığı: satır ayrıştırıldı, emit edilmek üzere. Emit anı GUI'ye kuyrukla taşınır."""
+    t = time.perf_counter()
+    complete("ingest", t_in, t)
+    _pending.append(t)
+    _counters["samples"] += 1
+
+
+def dispatched():
+    """GUI iş parçacığı: örnek update_plot'a ulaştı. Kuyruklu sinyaller sırayı korur."""
+    t = time.perf_counter()
+    if _pending: complete("dispatch", _pending.popleft(), t)
+    return t
+
+
+def queue_depth():
+    return len(_pending)
+
+
+def ui_tick(lag_sec):
+    """GUI zamanlayıcısından: olay döngüsü gecikmesi ve o anki kuyruk derinliği."""
+    _recent["ui_lag"].append(lag_sec)
+    depth = len(_pending)
+    gauge("queue_depth", depth)
+    _gauges["queue_max"] = max(_gauges.get("queue_max", 0), depth)
+    if lag_sec > 0.05: instant("ui_stall", "ui", {"lag_ms": round(lag_sec * 1000, 1)})
+
+
+# ========================================================
+# VERİTABANI ÇAĞRILARI
+# ========================================================
+
+def instrument(obj, cat="db", prefix="db."):
+    """Nesnenin açık (public) metotlarını örnek düzeyinde sarmalar; uninstrument ile geri alınır.
+    UI iş parçacığındaki çağrılar ayrıca 'db_ui_calls' sayacına yazılır."""
+    for name in dir(type(obj)):
+        if name.startswith("_") or name in vars(obj): continue
+        method = getattr(obj, name, None)
+        if not callable(method): continue
+
+        def wrapper(*args, _method=method, _name=prefix + name, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                if ENABLED:
+                    on_ui = threading.get_ident() == _main_thread
+                    complete(_name, start, cat=cat, args={"ui_thread": on_ui}, stage="db")
+                    if on_ui: _counters["db_ui_calls"] += 1
+        setattr(obj, name, functools.update_wrapper(wrapper, method))
+    return obj
+
+
+def uninstrument(obj):
+    for name, value in list(vars(obj).items()):
+        if getattr(value, "__wrapped__", None) is not None and not name.startswith("_"):
+            delattr(obj, name)
+
+
+# ========================================================
+# ÖZET VE DIŞA AKTARIM
+# ========================================================
+
+def _percentiles(values):
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+    return {"count": len(ordered), "p50_ms": pick(0.5) * 1000, "p99_ms": pick(0.99) * 1000, "max_ms": ordered[-1] * 1000}
+
+
+def snapshot():
+    """Kaplama (overlay) için anlık özet: aşama yüzdelikleri, sayaçlar, göstergeler."""
+    stages = {name: _percentiles(list(values)) for name, values in list(_recent.items()) if values}
+    return {"stages": stages, "counters": dict(_counters), "gauges": dict(_gauges), "queue_depth": len(_pending),
+            "elapsed_sec": time.perf_counter() - _t0, "events": len(_events)}
+
+
+def chrome_trace():
+    """Chrome trace (JSON Object Format) sözlüğü; zamanlar mikro saniye."""
+    events = []
+    for ph, name, cat, start, value, tid, args in list(_events):
+        event = {"name": name, "cat": cat, "ph": ph, "ts": round((start - _t0) * 1e6, 1), "pid": 1, "tid": tid}
+        if ph == "X": event["dur"] = round(value * 1e6, 1)
+        elif ph == "C": event["args"] = {name: value}
+        elif ph == "i": event["s"] = "t"
+        if args and ph != "C": event["args"] = args
+        events.append(event)
+    for tid, thread_name in list(_threads.items()):
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": dict(_counters)}}
+
+
+def export_chrome_trace(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f)
+    return path
+
+
+def format_overlay(snap=None):
+    """Kaplamada gösterilen düz metin."""
+    snap = snap or snapshot()
+    lines = [f"PERFORMANS İZİ ({snap['elapsed_sec']:.0f} sn)"]
+    for stage in STAGES:
+        s = snap["stages"].get(stage)
+        if s: lines.append(f"{stage:<9} p50 {s['p50_ms']:6.2f}  p99 {s['p99_ms']:6.2f}  maks {s['max_ms']:6.1f} ms")
+    lag = snap["stages"].get("ui_lag")
+    counters, gauges = snap["counters"], snap["gauges"]
+    rate = counters.get("samples", 0) / max(snap["elapsed_sec"], 1e-6)
+    lines.append(f"örnek/sn {rate:6.0f} | kuyruk {snap['queue_depth']} (maks {gauges.get('queue_max', 0)})")
+    if lag: lines.append(f"UI gecikme p50 {lag['p50_ms']:.1f} / p99 {lag['p99_ms']:.1f} / maks {lag['max_ms']:.0f} ms")
+    lines.append(f"hatalı satır {counters.get('malformed', 0)} | kısa satır {counters.get('short_lines', 0)} | "
+                 f"UI'da DB çağrısı {counters.get('db_ui_calls', 0)}")
+    return "\n".join(lines)
@@ -0,0 +1,243 @@
+# DOSYA ADI: sample_timing.py
+# Örnek zamanlaması: host zaman damgaları, sıra numarası boşlukları ve efektif örnekleme hızı.
+# SerialWorker her satıra okunduğu anı (monotonik, sn) ve veri satırı sayacını (SEQ) ekler;
+# kayıtta HOST_T ve SEQ sütunları olarak saklanır. Firmware'in durum ve RATE satırları SEQ'i artırmaz.
+#   - SEQ atlaması: host'un okuyup ayrıştıramadığı (bozuk) satırlar
+#   - Zaman boşluğu: host'a hiç ulaşmayan örnekler (firmware/USB kaybı)
+# USB tamponlaması damgalara ms düzeyinde titreşim katar; bu yüzden örnek başına damga yerine
+# doğrusal bir saat modeli (t = a + b * yuva) oturtulur. Analizler veriyi bu modelle düzgün FS
+# ızgarasına yeniden örnekler (vektörel doğrusal ara değer); böylece frekans kestirimleri
+# firmware'in tam 50 Hz olmamasından ve kayıp örneklerden etkilenmez.
+#
+# Çoklu hız: kaydın gerçek hızı yan dosyada (<kayıt>_META.json) saklanır; yoksa zaman
+# damgalarından, o da yoksa eski varsayımdan (50 Hz) çıkarılır. Yüksek hızlı kayıtlar analizin
+# çalışma hızına çok fazlı (polyphase) süzgeçle indirilir; yalnızca metriğin kullandığı sütunlar işlenir.
+
+import json
+import os
+from fractions import Fraction
+
+import numpy as np
+from scipy.signal import resample_poly
+
+import stim_log
+
+# --- AYARLAR ---
+TIMING_COLUMNS = ["HOST_T", "SEQ"]
+PERIOD_SEC = 5.0          # Periyot kestirimi: bu kadar süre aralıklı farkların medyanı (tamponlama adımı bu süreye bölünür)
+GAP_FACTOR = 1.8          # Bu kadar periyottan uzun aralık boşluk adayıdır (tek örneklik kayıp USB tamponlama titreşiminde gizlenebilir)
+CONFIRM_SEC = 0.5         # Adayın kalıcı kayıp mı geçici gecikme mi olduğu iki yanındaki bu kadar sürelik örnekten anlaşılır
+CONFIRM_MIN_SAMPLES = 25
+MIN_STEP = 0.7            # Kalıcı basamak bu kadar periyottan küçükse titreşim sayılır
+RATE_TOLERANCE = 0.005    # Efektif hız nominalden bu orandan fazla saparsa yeniden örneklenir
+CHUNK_COLUMNS = 16        # Yeniden örneklemede bir geçişte işlenen sütun (uzun kayıtlarda ara bellek sınırı)
+META_SUFFIX = "_META.json"
+LEGACY_FS = 50.0          # Meta ve zaman damgası olmayan eski kayıtların hızı (firmware delay(20))
+STANDARD_RATES = (25.0, 50.0, 100.0, 200.0, 400.0, 800.0)
+SNAP_TOLERANCE = 0.03     # Ölçülen hız bir standart hıza bu oranda yakınsa o hız kabul edilir
+MAX_RATIO_DENOMINATOR = 1000
+
+
+def robust_period(t, span_sec=PERIOD_SEC):
+    n = len(t)
+    if n < 2: return np.nan
+    rough = (t[-1] - t[0]) / (n - 1)
+    k = int(np.clip(span_sec / rough, 1, n - 1)) if rough > 0 else n - 1
+    return float(np.median((t[k:] - t[:-k]) / k))
+
+
+def detect_gaps(t, seq=None, period=None, window=None):
+    """Her örneğin saat yuvası (slot) ve boşluklar: (yuvalar, [(örnek indeksi, kayıp sayısı)]).
+    SEQ atlamaları doğrudan yuvaya yansır; zaman boşluklarında kayıp sayısı, damganın saat
+    modelinden sapmasının boşluk öncesi ve sonrası alt zarfları (kayan minimum) arasındaki
+    basamaktır. Tamponlama gecikmesi yalnızca geç gelmeye yol açar ve minimumda kaybolur;
+    gerçek kayıp kalıcı bir basamak bırakır."""
+    t = np.asarray(t, dtype=float)
+    n = len(t)
+    base = np.arange(n) if seq is None else (np.asarray(seq, dtype=np.int64) - int(seq[0]))
+    if n < 3: return base, []
+    period = period or robust_period(t)
+    window = window or max(CONFIRM_MIN_SAMPLES, int(CONFIRM_SEC / period))
+
+    # Saat modelinden sapma (periyot cinsinden). Kayıp sapmayı yalnızca artırır: sonraki bir boşluk
+    # ileri pencerenin minimumunu etkilemez, önceki onaylı boşluk ise geri pencereyi keser (çift sayım olmaz).
+    drift = (t - t[0]) / period - base
+    candidates = np.flatnonzero(np.diff(t) > GAP_FACTOR * period * np.maximum(np.diff(base), 1)) + 1
+    missing = np.zeros(len(candidates), dtype=np.int64)
+    last_gap = 0
+    for k, c in enumerate(candidates):
+        before = drift[max(last_gap, c - window):c].min()
+        after = drift[c:c + window + 1].min()
+        step = after - before
+        missing[k] = max(int(np.rint(step)), 1) if step >= MIN_STEP else 0
+        if missing[k]: last_gap = c
+    keep = missing >= 1
+
+    inserted = np.zeros(n, dtype=np.int64)
+    inserted[candidates[keep]] = missing[keep]
+    slots = base + np.cumsum(inserted)
+    return slots, list(zip(candidates[keep].tolist(), missing[keep].tolist()))
+
+
+def estimate(t, seq=None):
+    """Zamanlama özeti + saat modeli. t: host damgaları (sn), seq: host veri satırı sayacı (yoksa None)."""
+    t = np.asarray(t, dtype=float)
+    if len(t) < 3 or not np.all(np.isfinite(t)): return None
+    slots, gaps = detect_gaps(t, seq)
+    b, a = np.polyfit(slots, t, 1)
+    # İkinci geçiş: medyan periyot tamponlama adımlarına göre yanlı olabilir; oturtulan periyotla tekrar
+    slots, gaps = detect_gaps(t, seq, period=b)
+    b, a = np.polyfit(slots, t, 1)
+    residual = t - (a + b * slots)
+    discarded = int(slots[-1] - slots[0] + 1 - len(t) - sum(k for _, k in gaps))
+    report = {
+        "fs_effective": float(1.0 / b),
+        "jitter_ms": float(np.std(residual) * 1000),
+        "duration_sec": float(t[-1] - t[0]),
+        "samples": int(len(t)),
+        "gaps": len(gaps),
+        "missing_samples": int(sum(k for _, k in gaps)),
+        "discarded_lines": max(discarded, 0),
+        "clock": (float(a), float(b)),
+        "slots": slots,
+    }
+    return report
+
+
+def needs_resample(timing, fs):
+    """Kayıp örnek, atılmış satır ya da nominal hızdan sapma varsa düzgün ızgaraya oturtmak gerekir."""
+    return bool(timing["gaps"] or timing["discarded_lines"] or abs(timing["fs_effective"] / fs - 1) > RATE_TOLERANCE)
+
+
+def resample(values, slots, clock, fs, hold=None):
+    """Yuvalardaki örnekleri saat modeliyle düzgün 1/fs ızgarasına taşır (tüm sütunlar tek geçişte).
+    hold: ara değer yerine bir önceki değerin tutulacağı sütunlar (bool maske; ör. stimülasyon durumu)."""
+    a, b = clock
+    values = np.asarray(values, dtype=float)
+    start, end = a + b * slots[0], a + b * slots[-1]
+    grid = start + np.arange(int(np.floor((end - start) * fs)) + 1) / fs
+    pos = (grid - a) / b                                   # Izgara noktasının kesirli yuva konumu
+    right = np.clip(np.searchsorted(slots, pos, side="right"), 1, len(slots) - 1)
+    left = right - 1
+    w = ((pos - slots[left]) / (slots[right] - slots[left])).clip(0.0, 1.0)[:, None]
+    out = np.empty((len(grid), values.shape[1]))
+    for c in range(0, values.shape[1], CHUNK_COLUMNS):
+        block = slice(c, c + CHUNK_COLUMNS)
+        lo, hi = values[left, block], values[right, block]
+        out[:, block] = lo + (hi - lo) * w
+        if hold is not None: out[:, block] = np.where(hold[block], lo, out[:, block])
+    return grid - start, out
+
+
+def nominal_rate(fs_effective):
+    """Ölçülen hızı (kristal/host saat farkıyla birkaç %o sapan) cihazın ayarlı hızına oturtur."""
+    for rate in STANDARD_RATES:
+        if abs(fs_effective / rate - 1) <= SNAP_TOLERANCE: return rate
+    return round(float(fs_effective), 1)
+
+
+def decimate(values, fs_in, fs_out, hold=None):
+    """Çok fazlı yeniden örnekleme (scipy resample_poly; kenar yumuşatmalı FIR süzgeç, örtüşme önleyici).
+    hold sütunları süzülmez; her çıkış örneği en yakın önceki giriş örneğinin değerini alır."""
+    ratio = Fraction(fs_out / fs_in).limit_denominator(MAX_RATIO_DENOMINATOR)
+    values = np.asarray(values, dtype=float)
+    out = resample_poly(values, ratio.numerator, ratio.denominator, axis=0, padtype="line")
+    if hold is not None and np.any(hold):
+        source = np.minimum((np.arange(len(out)) * ratio.denominator) // ratio.numerator, len(values) - 1)
+        out[:, hold] = values[source][:, hold]
+    return out, ratio
+
+
+def meta_path(recording_path):
+    return recording_path.replace(".csv", META_SUFFIX)
+
+
+def save_meta(recording_path, meta):
+    try:
+        with open(meta_path(recording_path), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+    except OSError as e:
+        print(f"Kayıt bilgisi yazılamadı: {e}")
+        return None
+    return meta_path(recording_path)
+
+
+def load_meta(recording_path):
+    path = meta_path(recording_path) if recording_path else None
+    if not path or not os.path.exists(path): return {}
+    try:
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def recording_meta(host_t, seq, device_rate=None, imus=12):
+    """Kayıt sonunda yazılan bilgi. Hız önceliği: cihazın bildirdiği (RATE satırı) > zaman damgası tahmini."""
+    timing = estimate(host_t, seq) if len(host_t) >= 3 else None
+    meta = {"imus": imus, "samples": len(host_t), "fs": None, "fs_source": None}
+    if timing:
+        meta.update({"fs_effective": round(timing["fs_effective"], 4), "jitter_ms": round(timing["jitter_ms"], 3),
+                     "gaps": timing["gaps"], "missing_samples": timing["missing_samples"],
+                     "discarded_lines": timing["discarded_lines"]})
+    if device_rate:
+        meta["fs"], meta["fs_source"] = float(device_rate), "device"
+    elif timing:
+        meta["fs"], meta["fs_source"] = nominal_rate(timing["fs_effective"]), "host_timestamps"
+    return meta
+
+
+def prepare(df, fs, file_path=None, columns=None):
+    """Analizlerin giriş noktası: kaydın hızını bulur, gerekirse düzgün ızgaraya oturtur ve fs
+    (analiz çalışma hızı) ile döndürür. columns verilirse yalnızca bu sütunlar işlenir ve döner.
+    Dönüş: (df, zamanlama özeti). Özet her zaman fs_in / fs_work / fs_source içerir."""
+    import pandas as pd
+    meta = load_meta(file_path)
+    columns = [c for c in (columns or df.columns) if c in df.columns and c not in TIMING_COLUMNS]
+    timing = None
+
+    if "HOST_T" in df.columns:
+        t = pd.to_numeric(df["HOST_T"], errors="coerce").to_numpy(dtype=float)
+        seq = pd.to_numeric(df["SEQ"], errors="coerce").to_numpy() if "SEQ" in df.columns else None
+        valid = np.isfinite(t) & (np.isfinite(seq) if seq is not None else True)
+        if valid.sum() >= 3:
+            df = df[valid].reset_index(drop=True)
+            timing = estimate(t[valid], seq[valid].astype(np.int64) if seq is not None else None)
+
+    if meta.get("fs"): fs_in, source = float(meta["fs"]), meta.get("fs_source") or "meta"
+    elif timing: fs_in, source = nominal_rate(timing["fs_effective"]), "host_timestamps"
+    else: fs_in, source = LEGACY_FS, "legacy"
+    timing = timing or {}
+    timing.update({"fs_in": fs_in, "fs_work": float(fs), "fs_source": source, "resampled": False})
+
+    hold = np.array([c in stim_log.STIM_COLUMNS for c in columns])
+    values = None
+    if "clock" in timing and needs_resample(timing, fs_in):
+        # Kayıp/kayma düzeltmesi kaydın kendi hızında yapılır; çalışma hızına indirme aşağıdaki süzgeçle
+        _, values = resample(df[columns].to_numpy(dtype=float), timing["slots"], timing["clock"], fs_in, hold)
+        timing["resampled"] = True
+    if fs_in != fs:
+        values = df[columns].to_numpy(dtype=float) if values is None else values
+        values, ratio = decimate(values, fs_in, fs, hold)
+        timing["ratio"] = f"{ratio.numerator}/{ratio.denominator}"
+    if values is None: return df[columns].reset_index(drop=True), timing
+    out = pd.DataFrame(values, columns=columns)
+    out["HOST_T"] = np.arange(len(out)) / fs
+    return out, timing
+
+
+def timing_metrics(timing):
+    """test_metrics'e yazılan zamanlama metrikleri (kohort/trend sorgularında tanılama için)."""
+    if not timing or "fs_effective" not in timing: return {}
+    return {"fs_effective": timing["fs_effective"], "missing_samples": timing["missing_samples"] + timing["discarded_lines"],
+            "jitter_ms": timing["jitter_ms"]}
+
+
+def describe(timing):
+    if not timing: return "Zamanlama bilgisi yok"
+    rate = f"Kayıt {timing['fs_in']:g} Hz ({timing['fs_source']})" if "fs_in" in timing else ""
+    if "ratio" in timing: rate += f" -> analiz {timing['fs_work']:g} Hz (oran {timing['ratio']})"
+    if "fs_effective" not in timing: return rate + " | zaman damgası yok (eski kayıt)"
+    text = (f"Efektif hız {timing['fs_effective']:.2f} Hz | titreşim {timing['jitter_ms']:.1f} ms | "
+            f"boşluk {timing['gaps']} ({timing['missing_samples']} örnek) | bozuk satır {timing['discarded_lines']}")
+    if timing.get("resampled"): text += " | düzgün ızgaraya yeniden örneklendi"
+    return f"{rate} | {text}" if rate else text
@@ -0,0 +1,305 @@
+# DOSYA ADI: schema_migrations.py
+# Versioned schema migrations for the MySQL server.
+# Applied versions are recorded in schema_version, so on an up-to-date database
+# startup costs a single SELECT and runs no DDL. Append new steps to MIGRATIONS;
+# never edit a migration that has already shipped.
+
+import mysql.connector
+from mysql.connector import errorcode
+
+import local_store
+
+LOCK_NAME = 'neuromotion_schema'
+LOCK_TIMEOUT_SEC = 30
+# Synced tables as of migrations 3-4; later tables bring their own columns and indexes
+V3_SYNC_TABLES = ['doctors', 'patients', 'tests', 'device_calibration']
+
+
+def _legacy_columns(conn, cursor):
+    """Columns added to doctors / device_calibration after the first release."""
+    # Check and add columns to doctors table
+    try:
+        cursor.execute("SHOW COLUMNS FROM doctors")
+        columns = [row[0] for row in cursor.fetchall()]
+
+        if 'email' not in columns:
+            # Add as NULLable first to avoid unique constraint issues with empty strings
+            cursor.execute("ALTER TABLE doctors ADD COLUMN email VARCHAR(100) NULL AFTER name")
+            conn.commit()
+
+            # Update existing rows with default emails
+            cursor.execute("SELECT id, name FROM doctors")
+            docs = cursor.fetchall()
+            for doc_id, name in docs:
+                email = name.lower().replace(" ", ".").replace("dr.", "dr") + "@neuromotion.com"
+                cursor.execute("UPDATE doctors SET email = %s WHERE id = %s", (email, doc_id))
+
+            # Now make it UNIQUE and NOT NULL
+            cursor.execute("ALTER TABLE doctors MODIFY COLUMN email VARCHAR(100) UNIQUE NOT NULL")
+            print("Added and initialized 'email' column.")
+
+        if 'is_approved' not in columns:
+            cursor.execute("ALTER TABLE doctors ADD COLUMN is_approved TINYINT(1) DEFAULT 0")
+            # Set existing doctors to approved
+            cursor.execute("UPDATE doctors SET is_approved = 1")
+            print("Added 'is_approved' column and approved existing doctors.")
+
+        if 'is_admin' not in columns:
+            cursor.execute("ALTER TABLE doctors ADD COLUMN is_admin TINYINT(1) DEFAULT 0")
+            # Set 'Admin' user to admin
+            cursor.execute("UPDATE doctors SET is_admin = 1 WHERE name LIKE '%Admin%'")
+            print("Added 'is_admin' column.")
+
+        conn.commit()
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        # Table will be created by the baseline migration
+
+    # Check and add per-IMU scale / cross-axis columns to device_calibration table
+    try:
+        cursor.execute("SHOW COLUMNS FROM device_calibration")
+        columns = [row[0] for row in cursor.fetchall()]
+
+        if 'imu_index' not in columns:
+            cursor.execute("ALTER TABLE device_calibration ADD COLUMN imu_index INT DEFAULT 0 AFTER device_id")
+            print("Added 'imu_index' column.")
+        for axis in ('ax', 'ay', 'az', 'gx', 'gy', 'gz'):
+            if f'scale_{axis}' not in columns:
+                cursor.execute(f"ALTER TABLE device_calibration ADD COLUMN scale_{axis} DOUBLE DEFAULT 1")
+        if 'cross_axis' not in columns:
+            cursor.execute("ALTER TABLE device_calibration ADD COLUMN cross_axis TEXT NULL")
+            print("Added per-IMU scale and cross-axis columns.")
+
+        conn.commit()
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        # Table will be created by the baseline migration
+
+
+def _baseline_tables(conn, cursor):
+    # 1. Patients Table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS patients (
+        protocol_no VARCHAR(50) PRIMARY KEY,
+        name VARCHAR(100) UNIQUE NOT NULL,
+        age INT,
+        gender VARCHAR(20),
+        dominant_side VARCHAR(20),
+        onset_year INT,
+        diagnosis VARCHAR(100),
+        doctor_name VARCHAR(100),
+        contact_phone VARCHAR(50),
+        clinical_history TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
+    )
+    """)
+
+    # 2. Tests Table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tests (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        uuid VARCHAR(36) NULL UNIQUE,
+        patient_name VARCHAR(100),
+        test_type VARCHAR(50),
+        file_path TEXT,
+        score DOUBLE,
+        extra DOUBLE,
+        notes TEXT,
+        test_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        doctor_name VARCHAR(100),
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        FOREIGN KEY (patient_name) REFERENCES patients(name) ON DELETE CASCADE
+    )
+    """)
+
+    # 3. Calibration Table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS device_calibration (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        uuid VARCHAR(36) NULL UNIQUE,
+        device_id VARCHAR(50) DEFAULT 'Main_Device',
+        imu_index INT DEFAULT 0,
+        offset_ax DOUBLE DEFAULT 0,
+        offset_ay DOUBLE DEFAULT 0,
+        offset_az DOUBLE DEFAULT 0,
+        offset_gx DOUBLE DEFAULT 0,
+        offset_gy DOUBLE DEFAULT 0,
+        offset_gz DOUBLE DEFAULT 0,
+        scale_ax DOUBLE DEFAULT 1,
+        scale_ay DOUBLE DEFAULT 1,
+        scale_az DOUBLE DEFAULT 1,
+        scale_gx DOUBLE DEFAULT 1,
+        scale_gy DOUBLE DEFAULT 1,
+        scale_gz DOUBLE DEFAULT 1,
+        cross_axis TEXT NULL,
+        calibrated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
+    )
+    """)
+
+    # 4. Doctors Table (Updated)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS doctors (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) UNIQUE NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        password VARCHAR(255) DEFAULT '1234',
+        specialty VARCHAR(100),
+        is_approved TINYINT(1) DEFAULT 0,
+        is_admin TINYINT(1) DEFAULT 0,
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
+    )
+    """)
+
+    # 5. Logs Table
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS system_logs (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        log_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        level VARCHAR(20),
+        message TEXT,
+        doctor_name VARCHAR(100)
+    )
+    """)
+
+    # Initial Data (Admin & Default Doctor)
+    cursor.execute("INSERT IGNORE INTO doctors (name, email, password, specialty, is_approved, is_admin) VALUES ('Admin', 'admin@neuromotion.com', 'admin123', 'System Administrator', 1, 1)")
+    cursor.execute("INSERT IGNORE INTO doctors (name, email, password, specialty, is_approved) VALUES ('Dr. Aytaç Durmaz', 'aytac@neuromotion.com', '1234', 'Neurology', 1)")
+
+
+def _sync_columns(conn, cursor):
+    """updated_at / synced_at (and uuid sync keys) used by sync_engine."""
+    for table in V3_SYNC_TABLES:
+        key = local_store.SYNC_TABLES[table][0]
+        cursor.execute(f"SHOW COLUMNS FROM {table}")
+        columns = [row[0] for row in cursor.fetchall()]
+        for col in ('updated_at', 'synced_at'):
+            if col not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)")
+        if key == 'uuid':
+            if 'uuid' not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN uuid VARCHAR(36) NULL UNIQUE")
+            cursor.execute(f"UPDATE {table} SET uuid = UUID() WHERE uuid IS NULL")
+
+
+# (name, table, columns) - composite indexes matching the actual query patterns
+INDEXES = [
+    ('idx_tests_patient_date', 'tests', 'patient_name, test_date'),          # patient history, trends
+    ('idx_logs_date', 'system_logs', 'log_date, id'),                        # get_all_logs ORDER BY log_date
+    ('idx_calib_device_date', 'device_calibration', 'device_id, calibrated_at'),  # get_latest_calibration
+    ('idx_calib_device_imu', 'device_calibration', 'device_id, imu_index, id'),   # get_device_calibration
+] + [(f'idx_{table}_synced', table, 'synced_at') for table in V3_SYNC_TABLES]  # sync pull cursor
+
+
+def _create_indexes(cursor, indexes):
+    for name, table, columns in indexes:
+        try:
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+        except mysql.connector.Error as err:
+            if err.errno != errorcode.ER_DUP_KEYNAME:
+                raise
+
+
+def _indexes(conn, cursor):
+    _create_indexes(cursor, INDEXES)
+
+
+def _test_metrics(conn, cursor):
+    """One row per analysis metric of a test, so cohort filters run as indexed SQL."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS test_metrics (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        uuid VARCHAR(36) NOT NULL UNIQUE,
+        test_uuid VARCHAR(36) NOT NULL,
+        metric VARCHAR(40) NOT NULL,
+        value DOUBLE NOT NULL,
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        synced_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        UNIQUE KEY uq_test_metric (test_uuid, metric),
+        FOREIGN KEY (test_uuid) REFERENCES tests(uuid) ON DELETE CASCADE
+    )
+    """)
+    _create_indexes(cursor, METRIC_INDEXES)
+
+
+METRIC_INDEXES = [
+    ('idx_metrics_metric_value', 'test_metrics', 'metric, value, test_uuid'),  # cohort range filters
+    ('idx_test_metrics_synced', 'test_metrics', 'synced_at'),
+]
+
+
+def _sync_deletions(conn, cursor):
+    """Deletion log written by sync_engine when it pushes tombstones; other clients pull it
+    with a watermark instead of scanning every remote key."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS sync_deletions (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        table_name VARCHAR(64) NOT NULL,
+        row_key VARCHAR(255) NOT NULL,
+        deleted_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+        INDEX idx_sync_deletions_date (deleted_at)
+    )
+    """)
+
+
+MIGRATIONS = [
+    (1, "Legacy doctor and calibration columns", _legacy_columns),
+    (2, "Baseline tables and seed accounts", _baseline_tables),
+    (3, "Sync columns (updated_at, synced_at, uuid)", _sync_columns),
+    (4, "Indexes for test, log, calibration and sync queries", _indexes),
+    (5, "Per-test metrics table", _test_metrics),
+    (6, "Sync deletion log", _sync_deletions),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _current_version(cursor):
+    try:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return cursor.fetchone()[0]
+    except mysql.connector.Error as err:
+        if err.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255),
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    return 0
+
+
+def migrate(conn):
+    """Apply pending migrations and return the resulting schema version."""
+    cursor = conn.cursor()
+    try:
+        version = _current_version(cursor)
+        if version >= LATEST_VERSION:
+            return version
+
+        # Serialise concurrent clients starting against an old schema
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT_SEC))
+        cursor.fetchone()
+        try:
+            version = _current_version(cursor)
+            for number, description, step in MIGRATIONS:
+                if number <= version: continue
+                step(conn, cursor)
+                cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (number, description))
+                conn.commit()
+                print(f"Schema migration {number} applied: {description}")
+                version = number
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+        return version
+    finally:
+        cursor.close()
@@ -0,0 +1,239 @@
+# DOSYA ADI: shm_ring.py
+# Edinme ile analiz süreçleri arasında paylaşımlı bellek (multiprocessing.shared_memory) halka tamponu.
+# Tek yazar, çok okuyucu: örnekler (satır x sütun) float64 olarak halkaya yazılır; her okuyucu kendi
+# imlecini tutar ve halkadaki satırları kopyalamadan (numpy görünümü) okur. Süreçler arasında pickle yoktur.
+#
+# Satır düzeni GUI paketiyle aynıdır (gui_app.expand_packet): IMU değerleri (72 ya da 6), BATARYA, HOST_T, SEQ.
+# Başlık (int64): magic, kapasite, sütun, yazılan satır sayısı (head), yazar kapandı mı, hız (mHz),
+# yazılmakta olan bloğun sonu (reserved).
+# head yalnızca satır yazıldıktan sonra artırılır; yazar bir satırı ya da bloğu yazmaya başlamadan önce
+# reserved'ı günceller. Okuyucu head - imleç > kapasite görürse aradaki satırlar üzerine yazılmıştır (lost);
+# okunan görünüm işlenirken ezildiyse (ya da ezilmekteyse) overwritten() bunu bildirir.
+#
+# Yazar: acquisition_service --shm AD (cihaz başına halka "AD_<cihaz>") ya da GUI: NEUROMOTION_SHM_RING=AD
+# Okuyucu: python shm_ring.py AD_<cihaz> --tremor   (ayrı süreçte canlı tremor bant gücü)
+
+import argparse
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+
+# --- AYARLAR ---
+CAPACITY = 1 << 15          # Satır (~33 sn @ 1 kHz); 75 sütunla ~19 MB
+MAGIC = 0x4E4D5231          # "NMR1"
+HEADER_WORDS = 8
+H_MAGIC, H_CAPACITY, H_COLUMNS, H_HEAD, H_CLOSED, H_RATE, H_RESERVED = range(7)
+TRAILER_COLUMNS = ["BATTERY", "HOST_T", "SEQ"]
+POLL_SEC = 0.005
+STATS_SEC = 2.0
+ACC_SCALE_FACTOR = 16384.0
+
+_owned = set()      # Bu sürecin oluşturduğu (yazarı olduğu) halkalar
+
+
+def _attach(name):
+    """Var olan bloğa bağlanır. Python < 3.13 bağlanan süreci de resource_tracker'a kaydeder ve süreç
+    çıkarken blok silinir; bu yüzden kayıt bağlandıktan hemen sonra geri alınır. Halkanın yazarı aynı
+    süreçteyse geri alınmaz: izleyicide ad başına tek kayıt vardır ve o kayıt yazarındır."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)     # Python 3.13+
+    except TypeError:
+        pass
+    shm = shared_memory.SharedMemory(name=name)
+    if name not in _owned:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")      # register() ile aynı ad ("/" önekli)
+    return shm
+
+
+class SharedRing:
+    """create=True: yazar (bloğu oluşturur ve kapanınca siler). create=False: okuyucu/bağlanan süreç."""
+
+    def __init__(self, name, columns=None, capacity=CAPACITY, create=False):
+        if create:
+            if not columns: raise ValueError("Yeni halka için sütun sayısı gerekli")
+            size = 8 * (HEADER_WORDS + capacity * columns)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _owned.add(name)
+        else:
+            self.shm = _attach(name)
+        self.name = name
+        self.owner = create
+        self.header = np.ndarray((HEADER_WORDS,), dtype=np.int64, buffer=self.shm.buf)
+        if create:
+            self.header[:] = 0
+            self.header[H_MAGIC], self.header[H_CAPACITY], self.header[H_COLUMNS] = MAGIC, capacity, columns
+        elif self.header[H_MAGIC] != MAGIC:
+            raise ValueError(f"{name}: halka tamponu değil")
+        self.capacity = int(self.header[H_CAPACITY])
+        self.columns = int(self.header[H_COLUMNS])
+        self.data = np.ndarray((self.capacity, self.columns), dtype=np.float64, buffer=self.shm.buf,
+                               offset=8 * HEADER_WORDS)
+
+    @property
+    def head(self):
+        return int(self.header[H_HEAD])
+
+    @property
+    def closed(self):
+        return bool(self.header[H_CLOSED])
+
+    @property
+    def rate(self):
+        return self.header[H_RATE] / 1000.0 or None
+
+    @rate.setter
+    def rate(self, hz):
+        self.header[H_RATE] = int(round((hz or 0) * 1000))
+
+    # --- Yazar ---
+    def write_row(self, values, battery, t, seq):
+        head = int(self.header[H_HEAD])
+        self.header[H_RESERVED] = head + 1
+        row = self.data[head % self.capacity]
+        n = len(values)
+        row[:n] = values
+        row[n:n + 3] = (battery, t, seq)
+        self.header[H_HEAD] = head + 1
+
+    def write(self, rows):
+        """(k, sütun) blok; halkanın sonunda ikiye bölünür. head en son güncellenir."""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.columns)
+        head = int(self.header[H_HEAD]) + max(len(rows) - self.capacity, 0)   # Sığmayan baş kısım zaten ezilirdi
+        rows = rows[-self.capacity:]
+        self.header[H_RESERVED] = head + len(rows)      # Okuyucu ezilmekte olan satırları bilsin
+        start = head % self.capacity
+        first = min(len(rows), self.capacity - start)
+        self.data[start:start + first] = rows[:first]
+        self.data[:len(rows) - first] = rows[first:]
+        self.header[H_HEAD] = head + len(rows)
+
+    def close(self):
+        if self.owner: self.header[H_CLOSED] = 1
+        self.header = self.data = None
+        self.shm.close()
+        if self.owner:
+            _owned.discard(self.name)
+            try: self.shm.unlink()
+            except FileNotFoundError: pass
+
+    def reader(self, from_start=False):
+        return RingReader(self, from_start)
+
+
+class RingReader:
+    """Okuyucu imleci. poll() halkanın içine bakan bitişik bir görünüm döndürür (kopya yok)."""
+
+    def __init__(self, ring, from_start=False):
+        self.ring = ring
+        head = ring.head
+        self.cursor = max(head - ring.capacity, 0) if from_start else head
+        self.lost = 0
+        self._view_start = self.cursor
+
+    def poll(self, max_rows=None):
+        ring = self.ring
+        head = ring.head
+        if head - self.cursor > ring.capacity:
+            self.lost += head - self.cursor - ring.capacity
+            self.cursor = head - ring.capacity
+        start = self.cursor % ring.capacity
+        count = min(head - self.cursor, ring.capacity - start)
+        if max_rows: count = min(count, max_rows)
+        self._view_start = self.cursor
+        self.cursor += count
+        return ring.data[start:start + count]
+
+    def overwritten(self):
+        """Son poll() görünümünün kaç satırının o andan beri üzerine yazıldığı ya da yazılmakta olduğu
+        (0 = görünüm hâlâ geçerli). Görünüm işlendikten sonra çağrılır; pozitifse o satırların sonucu atılmalı.
+        Sınır head + 1 - kapasite: yazar head'i artırmadan önce head % kapasite yuvasına yazar."""
+        ring = self.ring
+        boundary = max(ring.head + 1, int(ring.header[H_RESERVED])) - ring.capacity
+        return max(min(boundary - self._view_start, self.cursor - self._view_start), 0)
+
+    def lag(self):
+        return self.ring.head - self.cursor
+
+
+# ========================================================
+# acquisition_service İSTEMCİSİ (yazar)
+# ========================================================
+
+class ShmRingClient:
+    """Cihaz başına bir halka ("<ad>_<cihaz>") oluşturup paketleri yazar. Okuyucular halka adıyla bağlanır."""
+
+    def __init__(self, name, capacity=CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        self.rings = {}
+
+    def _open(self, packet):
+        ring = SharedRing(f"{self.name}_{packet.device}", len(packet.values) + len(TRAILER_COLUMNS),
+                          self.capacity, create=True)
+        print(f"🧠 Paylaşımlı halka: {ring.name} ({ring.capacity} x {ring.columns})")
+        self.rings[packet.device] = ring
+        return ring
+
+    async def run(self, subscription):
+        try:
+            async for packet in subscription:
+                ring = self.rings.get(packet.device) or self._open(packet)
+                device = self.service.devices.get(packet.device) if getattr(self, "service", None) else None
+                if device is not None and device.rate: ring.rate = device.rate
+                ring.write_row(packet.values, packet.battery, packet.t, packet.seq)
+        finally:
+            for ring in self.rings.values(): ring.close()
+            self.rings.clear()
+
+
+# ========================================================
+# OKUYUCU SÜREÇ ÖRNEĞİ: CANLI TREMOR
+# ========================================================
+
+def live_tremor(name, duration=0.0, fs=None):
+    """Halkaya bağlanıp IMU1 ivme büyüklüğünden tremor bant gücünü blok blok hesaplar (ayrı çekirdekte)."""
+    from closed_loop import CausalBandPower
+    ring = SharedRing(name)
+    reader = ring.reader()
+    band = block = None
+    started = next_print = time.perf_counter()
+    samples = 0
+    try:
+        while not ring.closed and (not duration or time.perf_counter() - started < duration):
+            block = reader.poll()
+            if not len(block):
+                time.sleep(POLL_SEC); continue
+            magnitude = np.sqrt((block[:, :3] ** 2).sum(axis=1)) / ACC_SCALE_FACTOR
+            if reader.overwritten(): continue        # Görünüm okunurken ezildi: bu bloğu atla
+            if band is None: band = CausalBandPower(fs or ring.rate or 50.0)
+            power = band.update_block(magnitude)
+            samples += len(block)
+            now = time.perf_counter()
+            if now >= next_print:
+                next_print = now + STATS_SEC
+                print(f"🌊 {name}: {power * 1000:.3f} mg² | örnek {samples} | gecikme {reader.lag()} satır | "
+                      f"kayıp {reader.lost}", flush=True)
+    finally:
+        del block                   # Halkaya bakan görünüm kalmamalı (yoksa shm kapatılamaz)
+        ring.close()
+    return {"samples": samples, "lost": reader.lost}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paylaşımlı bellek halkası okuyucusu")
+    parser.add_argument("name", help="Halka adı (ör. NM_yatak1)")
+    parser.add_argument("--tremor", action="store_true", help="Canlı tremor bant gücü")
+    parser.add_argument("--duration", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.tremor:
+        print(live_tremor(args.name, args.duration))
+        return
+    ring = SharedRing(args.name)
+    print(f"{ring.name}: {ring.capacity} x {ring.columns}, head {ring.head}, hız {ring.rate}, kapalı {ring.closed}")
+    ring.close()
+
+
+if __name__ == "__main__":
+    main()
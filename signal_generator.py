@@ -0,0 +1,90 @@
+# DOSYA ADI: signal_generator.py
+# Doğruluğu bilinen (ground truth) sentetik kayıt üreticisi.
+# Üretilen ham veri (örnek x 6, LSB) kayıt CSV'leriyle aynı biçimdedir; analiz modülleri
+# doğrudan çalıştırılabilir. Her üretici, sinyali kurarken kullandığı gerçek değerleri de döndürür:
+#   tremor_signal  -> baskın frekans, tepe genlik (g), beklenen MDS-UPDRS skoru
+#   tapping_signal -> hareket sayısı, takılma sayısı, genlik eğimi (derece/sn / hareket)
+# benchmark_analysis.py bu değerleri hem ölçüm girdisi hem doğruluk kontrolü için kullanır.
+
+import numpy as np
+
+from analyze_bradykinesia import MIN_PEAK_DIST
+from analyze_tremor import ACC_SCALE_FACTOR, calculate_updrs_tremor
+
+# --- AYARLAR ---
+FS = 50.0
+GYRO_SCALE_FACTOR = 131.0
+RAW_COLUMNS = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
+
+
+def _to_raw(acc_g, gyro_dps, rng, noise_lsb):
+    raw = np.empty((len(acc_g), 6))
+    raw[:, :3] = acc_g * ACC_SCALE_FACTOR
+    raw[:, 3:] = gyro_dps * GYRO_SCALE_FACTOR
+    if noise_lsb: raw += rng.normal(0, noise_lsb, raw.shape)
+    return np.rint(raw)
+
+
+def tremor_signal(duration_sec, fs=FS, freq_hz=5.0, amp_g=0.15, noise_g=0.005, freq_drift_hz=0.0,
+                  gravity_axis=2, seed=0):
+    """Dinlenme tremoru: yerçekimi ekseninde sabit genlikli sinüs (+ isteğe bağlı yavaş frekans kayması).
+    amp_g analizdeki 'tepe titreşim' ile aynı büyüklüktür (zarf = rolling std * sqrt(2))."""
+    rng = np.random.default_rng(seed)
+    n = int(duration_sec * fs)
+    t = np.arange(n) / fs
+    inst_freq = freq_hz + freq_drift_hz * np.sin(2 * np.pi * t / max(duration_sec, 1.0))
+    phase = 2 * np.pi * np.cumsum(inst_freq) / fs
+    tremor = amp_g * np.sin(phase)
+
+    acc = np.zeros((n, 3))
+    acc[:, gravity_axis] = 1.0 + tremor
+    acc += rng.normal(0, noise_g, acc.shape)
+    gyro = np.zeros((n, 3))
+    gyro[:, 0] = amp_g * 2 * np.pi * freq_hz * np.cos(phase) * 57.3 * 0.2
+
+    score, _ = calculate_updrs_tremor(amp_g, freq_hz)
+    truth = {"dominant_freq": freq_hz, "peak_g": amp_g, "updrs": score}
+    return _to_raw(acc, gyro, rng, 0), truth
+
+
+def tapping_signal(duration_sec, fs=FS, rate_hz=2.0, amp_dps=250.0, decrement=0.0, hesitations=0,
+                   hesitation_factor=3.0, jitter=0.0, noise_dps=2.0, axis=0, seed=0):
+    """Parmak vurma: her hareket (açma/kapama) ana gyro ekseninde işareti değişen bir yarım sinüs darbesidir.
+    decrement: hareket başına genlik kaybı (derece/sn), hesitations: araya eşit aralıklı yerleştirilen
+    duraklama sayısı (süresi hesitation_factor x normal aralık), jitter: aralıkların bağıl std'si.
+    Hareket aralığı analizdeki en küçük tepe mesafesinden (MIN_PEAK_DIST) kısa olamaz."""
+    rng = np.random.default_rng(seed)
+    n = int(duration_sec * fs)
+    interval = 1.0 / rate_hz
+    if interval * fs < MIN_PEAK_DIST:
+        raise ValueError(f"rate_hz çok yüksek: aralık {MIN_PEAK_DIST / fs:.2f} sn'den kısa olamaz")
+
+    # Hareket başlangıçları; duraklamalar kayıt boyunca eşit aralıklı
+    count = max(int((duration_sec - interval) / interval), 0)
+    gaps = np.full(count, interval) * (1 + jitter * rng.standard_normal(count)).clip(0.8, 1.2)
+    pause_at = np.linspace(0, count, hesitations + 2)[1:-1].astype(int) if hesitations else []
+    for i in pause_at: gaps[i] = interval * hesitation_factor
+    onsets = interval / 2 + np.concatenate(([0.0], np.cumsum(gaps)[:-1])) if count else np.empty(0)
+    onsets = onsets[onsets + interval < duration_sec]
+
+    amplitudes = np.maximum(amp_dps - decrement * np.arange(len(onsets)), 0.0)
+    width = 0.6 * interval
+    pulse = np.sin(np.pi * np.arange(int(width * fs)) / (width * fs))
+    gyro = np.zeros((n, 3))
+    for k, (start, amp) in enumerate(zip((onsets * fs).astype(int), amplitudes)):
+        seg = slice(start, min(start + len(pulse), n))
+        gyro[seg, axis] = (1 if k % 2 == 0 else -1) * amp * pulse[:seg.stop - seg.start]
+    gyro += rng.normal(0, noise_dps, gyro.shape)
+
+    acc = np.zeros((n, 3)); acc[:, 2] = 1.0
+    acc[:, 0] = 0.002 * gyro[:, axis]
+    truth = {"movements": int(len(onsets)), "hesitations": int(len(pause_at)), "amp_slope": -float(decrement),
+             "rate_hz": rate_hz, "amp_dps": amp_dps}
+    return _to_raw(acc, gyro, rng, 0), truth
+
+
+def write_csv(path, raw):
+    """Eski 6 sütunlu kayıt biçiminde yazar (analiz modüllerinin okuduğu biçim)."""
+    header = ",".join(RAW_COLUMNS)
+    np.savetxt(path, raw, fmt="%d", delimiter=",", header=header, comments="")
+    return path
@@ -0,0 +1,186 @@
+# DOSYA ADI: spectral.py
+# Baskın frekans kestirimi için takılabilir spektral kestirici katmanı.
+# Tüm kestiriciler tek kanal (1D) ya da kanal x örnek (2D) dizi kabul eder;
+# 2D girişte tüm kanallar tek bir vektörel FFT çağrısında işlenir.
+
+import numpy as np
+from scipy.fft import rfft, rfftfreq, next_fast_len
+from scipy.signal import welch, zoom_fft
+from scipy.signal.windows import dpss, hann
+
+# --- AYARLAR ---
+DEFAULT_METHOD = "welch"
+WELCH_SEGMENT_SEC = 4.0    # 50 Hz'de 200 örnek -> 0.25 Hz çözünürlük
+WELCH_OVERLAP = 0.5        # Segmentler arası örtüşme oranı
+MULTITAPER_NW = 3.0        # Zaman-bant genişliği çarpımı (K = 2NW - 1 pencere)
+ZOOM_SPAN_HZ = 1.0         # Kaba tepe etrafında yakınlaştırılan aralık
+ZOOM_POINTS = 128          # Yakınlaştırılan aralıktaki frekans noktası sayısı
+
+
+def _as_2d(signals):
+    x = np.asarray(signals, dtype=float)
+    if x.ndim == 1:
+        return x[np.newaxis, :], True
+    return x, False
+
+
+def _fft_flops(n):
+    """Tek bir gerçek FFT için kaba işlem sayısı (~2.5 N log2 N)."""
+    n = max(int(n), 2)
+    return 2.5 * n * np.log2(n)
+
+
+def _welch_geometry(n, fs, segment_sec=WELCH_SEGMENT_SEC, overlap=WELCH_OVERLAP):
+    nperseg = max(min(n, int(round(segment_sec * fs))), 2)
+    noverlap = min(int(nperseg * overlap), nperseg - 1)
+    nfft = next_fast_len(nperseg)
+    n_segments = 1 + max(n - nperseg, 0) // (nperseg - noverlap)
+    return nperseg, noverlap, nfft, n_segments
+
+
+# ========================================================
+# KESTİRİCİLER
+# ========================================================
+
+def periodogram_spectrum(signals, fs):
+    """Tüm kaydın ham periodogramı (eski davranış). Genlik: 2/N |X|."""
+    x, _ = _as_2d(signals)
+    n = x.shape[-1]
+    amps = 2.0 / n * np.abs(rfft(x, axis=-1))
+    return rfftfreq(n, 1 / fs), amps
+
+
+def welch_spectrum(signals, fs, segment_sec=WELCH_SEGMENT_SEC, overlap=WELCH_OVERLAP):
+    """Örtüşen Hann segmentlerinin ortalaması. FFT boyu kayıt süresinden bağımsızdır."""
+    x, _ = _as_2d(signals)
+    nperseg, noverlap, nfft, _ = _welch_geometry(x.shape[-1], fs, segment_sec, overlap)
+    freqs, power = welch(x, fs=fs, window='hann', nperseg=nperseg, noverlap=noverlap,
+                         nfft=nfft, detrend='constant', scaling='spectrum', axis=-1)
+    # Güç spektrumu (A^2 / 2) -> tepe genliği (A)
+    return freqs, np.sqrt(2.0 * power)
+
+
+def multitaper_spectrum(signals, fs, nw=MULTITAPER_NW):
+    """DPSS pencereleriyle çoklu-pencere (multitaper) kestirimi. Varyansı düşük, çözünürlüğü 2W."""
+    x, _ = _as_2d(signals)
+    n = x.shape[-1]
+    n_tapers = max(int(2 * nw) - 1, 1)
+    tapers = dpss(n, nw, Kmax=n_tapers)                     # (K, n), birim enerji
+    nfft = next_fast_len(n)
+    x = x - x.mean(axis=-1, keepdims=True)
+    spectra = np.abs(rfft(x[:, np.newaxis, :] * tapers[np.newaxis], n=nfft, axis=-1)) ** 2
+    # Pencere kazancıyla normalize et: tam frekanstaki sinüs için tepe = A
+    gain = np.mean(tapers.sum(axis=-1) ** 2)
+    return rfftfreq(nfft, 1 / fs), 2.0 * np.sqrt(spectra.mean(axis=1) / gain)
+
+
+def parabolic_peak(freqs, amps, idx):
+    """Tepe ve iki komşusuna parabol uydurarak alt-bin frekans/genlik kestirimi."""
+    if idx <= 0 or idx >= len(amps) - 1:
+        return freqs[idx], amps[idx]
+    a, b, c = amps[idx - 1], amps[idx], amps[idx + 1]
+    denom = a - 2 * b + c
+    if denom == 0:
+        return freqs[idx], b
+    shift = 0.5 * (a - c) / denom
+    step = freqs[1] - freqs[0]
+    return freqs[idx] + shift * step, b - 0.25 * (a - c) * shift
+
+
+def zoom_peak(signals, fs, coarse_freqs, span_hz=ZOOM_SPAN_HZ, points=ZOOM_POINTS):
+    """Kaba tepelerin etrafında zoom-FFT (chirp-z) ile ince frekans taraması."""
+    x, _ = _as_2d(signals)
+    n = x.shape[-1]
+    window = hann(n, sym=False)
+    x = (x - x.mean(axis=-1, keepdims=True)) * window
+    dominant = np.zeros(x.shape[0])
+    max_amp = np.zeros(x.shape[0])
+    for ch, f0 in enumerate(np.atleast_1d(coarse_freqs)):
+        lo = max(f0 - span_hz / 2, 0.0)
+        hi = min(f0 + span_hz / 2, fs / 2)
+        if f0 <= 0 or hi <= lo:
+            continue
+        spec = np.abs(zoom_fft(x[ch], [lo, hi], m=points, fs=fs, endpoint=True))
+        k = int(np.argmax(spec))
+        dominant[ch] = lo + k * (hi - lo) / (points - 1)
+        max_amp[ch] = 2.0 * spec[k] / window.sum()
+    return dominant, max_amp
+
+
+# ========================================================
+# MALİYET MODELLERİ (kaba kayan nokta işlem sayısı)
+# ========================================================
+
+def periodogram_cost(n, fs, n_channels=1):
+    return n_channels * _fft_flops(n)
+
+
+def welch_cost(n, fs, n_channels=1, segment_sec=WELCH_SEGMENT_SEC, overlap=WELCH_OVERLAP):
+    nperseg, _, nfft, n_segments = _welch_geometry(n, fs, segment_sec, overlap)
+    return n_channels * n_segments * (_fft_flops(nfft) + 2 * nperseg)
+
+
+def multitaper_cost(n, fs, n_channels=1, nw=MULTITAPER_NW):
+    n_tapers = max(int(2 * nw) - 1, 1)
+    return n_channels * n_tapers * (_fft_flops(next_fast_len(n)) + 2 * n)
+
+
+def zoom_cost(n, fs, n_channels=1, points=ZOOM_POINTS, **welch_kwargs):
+    # Chirp-z dönüşümü ~3 FFT (uzunluk n + m - 1) ile hesaplanır
+    czt_len = next_fast_len(n + points - 1)
+    return welch_cost(n, fs, n_channels, **welch_kwargs) + n_channels * 3 * _fft_flops(czt_len)
+
+
+ESTIMATORS = {
+    "periodogram": (periodogram_spectrum, periodogram_cost),
+    "welch": (welch_spectrum, welch_cost),
+    "multitaper": (multitaper_spectrum, multitaper_cost),
+    "zoom": (welch_spectrum, zoom_cost),
+}
+
+
+def estimate_cost(method, n, fs, n_channels=1, **kwargs):
+    """Seçilen kestiricinin yaklaşık işlem maliyeti (FLOP)."""
+    if method not in ESTIMATORS:
+        raise ValueError(f"Bilinmeyen spektral kestirici: {method}")
+    return ESTIMATORS[method][1](n, fs, n_channels, **kwargs)
+
+
+# ========================================================
+# ORTAK GİRİŞ NOKTASI
+# ========================================================
+
+def dominant_frequency(signals, fs, band, method=DEFAULT_METHOD, interpolate=True, **kwargs):
+    """
+    Bant içindeki baskın frekansı bulur.
+    Dönüş: (freqs, amps, dominant_freq, max_amp). 1D girişte skalar, 2D girişte kanal başına dizi.
+    """
+    if method not in ESTIMATORS:
+        raise ValueError(f"Bilinmeyen spektral kestirici: {method}")
+    x, squeeze = _as_2d(signals)
+    n_channels = x.shape[0]
+
+    spectrum_fn = ESTIMATORS[method][0]
+    zoom_kwargs = {k: kwargs.pop(k) for k in ("span_hz", "points") if k in kwargs}
+    if x.shape[-1] < 2:
+        freqs, amps = np.zeros(0), np.zeros((n_channels, 0))
+    else:
+        freqs, amps = spectrum_fn(x, fs, **kwargs)
+        idx = np.where((freqs >= band[0]) & (freqs <= band[1]))[0]
+        freqs, amps = freqs[idx], amps[:, idx]
+
+    dominant = np.zeros(n_channels)
+    max_amp = np.zeros(n_channels)
+    if len(freqs) > 0:
+        peak_idx = np.argmax(amps, axis=-1)
+        for ch in range(n_channels):
+            if interpolate:
+                dominant[ch], max_amp[ch] = parabolic_peak(freqs, amps[ch], peak_idx[ch])
+            else:
+                dominant[ch], max_amp[ch] = freqs[peak_idx[ch]], amps[ch, peak_idx[ch]]
+        if method == "zoom":
+            dominant, max_amp = zoom_peak(x, fs, dominant, **zoom_kwargs)
+
+    if squeeze:
+        return freqs, amps[0], dominant[0], max_amp[0]
+    return freqs, amps, dominant, max_amp
@@ -0,0 +1,138 @@
+# DOSYA ADI: stim_log.py
+# Stimülasyon oturum günlüğü.
+# Kanal açma/kapama ve parametre değişiklikleri zaman damgalı olaylar olarak tutulur.
+# Kayıt sırasında her sensör örneğine o anki stimülasyon durumu (STIM_COLUMNS) eklenir;
+# böylece kayıt dosyası parametre değişikliklerini örnek hassasiyetinde taşır.
+# Olay akışı ayrıca kayıt dosyasının yanına <kayıt>_STIM_OLAYLARI.csv olarak yazılır.
+
+import csv
+import time
+from datetime import datetime
+
+import numpy as np
+
+# --- AYARLAR ---
+CHANNELS = (1, 2)
+STIM_FIELDS = ("ON", "HZ", "PW", "AMP")
+STIM_COLUMNS = [f"STIM{ch}_{field}" for ch in CHANNELS for field in STIM_FIELDS]
+EVENTS_SUFFIX = "_STIM_OLAYLARI.csv"
+EVENT_HEADER = ["wall_time", "t_sec", "sample_index", "channel", "event", "hz", "pw_us", "amp"]
+
+
+class StimulationLog:
+    """GUI iş parçacığında güncellenir; snapshot() her örnekte çağrılacak kadar ucuzdur."""
+
+    def __init__(self):
+        self._state = {ch: [0, 0, 0, 0] for ch in CHANNELS}   # ON, HZ, PW, AMP
+        self._snapshot = [0] * len(STIM_COLUMNS)
+        self.events = []
+        self._t0 = None
+
+    # --- Durum ---
+    def record(self, channel, event, hz, pw, amp, sample_index=None):
+        """event: "ON" | "OFF" | "UPDATE". Durum her zaman güncellenir, olay yalnızca kayıt sırasında tutulur."""
+        state = self._state[channel]
+        state[0] = 0 if event == "OFF" else 1
+        state[1:] = [hz, pw, amp]
+        self._snapshot = [v for ch in CHANNELS for v in self._state[ch]]
+        if self._t0 is not None:
+            self._append(channel, event, sample_index)
+
+    def snapshot(self):
+        """Anlık durum (STIM_COLUMNS sırasıyla). Dönen liste değiştirilmemeli."""
+        return self._snapshot
+
+    # --- Kayıt ---
+    def start_recording(self):
+        # Başlangıç durumu da olay olarak yazılır; segmentasyon ilk örnekten itibaren bilinir
+        self._t0 = time.monotonic()
+        self.events = []
+        for ch in CHANNELS:
+            self._append(ch, "STATE", 0)
+
+    def stop_recording(self):
+        self._t0 = None
+        return self.events
+
+    def _append(self, channel, event, sample_index):
+        _, hz, pw, amp = self._state[channel]
+        self.events.append([datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+                            round(time.monotonic() - self._t0, 3), sample_index, channel,
+                            event if event != "STATE" else ("ON" if self._state[channel][0] else "OFF"), hz, pw, amp])
+
+    def save_events(self, recording_path):
+        path = events_path(recording_path)
+        try:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(EVENT_HEADER)
+                writer.writerows(self.events)
+        except OSError as e:
+            print(f"Stimülasyon olayları yazılamadı: {e}")
+            return None
+        return path
+
+
+def events_path(recording_path):
+    return recording_path.replace(".csv", EVENTS_SUFFIX)
+
+
+# ========================================================
+# ANALİZ TARAFI
+# ========================================================
+
+def stim_matrix(df):
+    """Kayıttaki STIM sütunları (örnek x 8) ya da eski kayıtlarda None."""
+    if not all(col in df.columns for col in STIM_COLUMNS): return None
+    import pandas as pd
+    return df[STIM_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+def condition_segments(matrix):
+    """Stimülasyon durumunun sabit kaldığı ardışık örnek aralıkları: [(başlangıç, bitiş, durum satırı)].
+    Kapalı kanalın parametreleri koşulu değiştirmez."""
+    if matrix is None or len(matrix) == 0: return []
+    effective = matrix.copy()
+    for i, _ in enumerate(CHANNELS):
+        base = i * len(STIM_FIELDS)
+        effective[:, base + 1:base + len(STIM_FIELDS)] *= effective[:, [base]]
+    change = np.flatnonzero(np.any(np.diff(effective, axis=0) != 0, axis=1)) + 1
+    bounds = np.concatenate(([0], change, [len(effective)]))
+    return [(int(s), int(e), effective[s]) for s, e in zip(bounds[:-1], bounds[1:])]
+
+
+def dominant_settings(matrix):
+    """Kanal başına kayıtta en uzun süre AÇIK kalan ayar: {"ch1": {"hz", "pw", "amp"}, ...}.
+    Hiç açılmayan kanal sonuçta yer almaz; STIM sütunu olmayan eski kayıtlarda None."""
+    if matrix is None: return None
+    durations = {}
+    for start, end, state in condition_segments(matrix):
+        for i, ch in enumerate(CHANNELS):
+            on, hz, pw, amp = state[i * len(STIM_FIELDS):(i + 1) * len(STIM_FIELDS)]
+            if on:
+                key = (ch, float(hz), float(pw), float(amp))
+                durations[key] = durations.get(key, 0) + end - start
+    settings = {}
+    for (ch, hz, pw, amp), _ in sorted(durations.items(), key=lambda kv: kv[1]):
+        settings[f"ch{ch}"] = {"hz": hz, "pw": pw, "amp": amp}     # En uzun süren en son yazılır
+    return settings
+
+
+def recording_settings(recording_path):
+    """Kayıt dosyasının STIM sütunlarından dominant_settings(); okunamazsa None."""
+    import pandas as pd
+    try:
+        df = pd.read_csv(recording_path, usecols=lambda col: col in STIM_COLUMNS)
+    except (OSError, ValueError) as e:
+        print(f"Stimülasyon sütunları okunamadı: {e}")
+        return None
+    return dominant_settings(stim_matrix(df))
+
+
+def describe(state):
+    """Durum satırını rapor etiketine çevirir: "K1 130Hz/60us/2 | K2 KAPALI"."""
+    parts = []
+    for i, ch in enumerate(CHANNELS):
+        on, hz, pw, amp = state[i * len(STIM_FIELDS):(i + 1) * len(STIM_FIELDS)]
+        parts.append(f"K{ch} {hz:.0f}Hz/{pw:.0f}us/{amp:.0f}" if on else f"K{ch} KAPALI")
+    return " | ".join(parts)
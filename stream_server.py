@@ -0,0 +1,229 @@
+# DOSYA ADI: stream_server.py
+# Canlı oturumu yerel TCP (localhost) üzerinden yayınlar: ikinci monitör, araştırma kaydedicisi ya da
+# başka bir izleyici COM portunu açmadan oturuma abone olabilir.
+# StreamServer, acquisition_service'in bir istemcisidir. Örnekler cihaz başına bloklara toplanır; her blok
+# bir kez ikili çerçeveye kodlanır ve aynı bytes nesnesi bütün abonelere yazılır (abone başına kodlama/kopya yok).
+# Yavaş abone edinmeyi durdurmaz: soketinin yazma tamponu BACKLOG_BYTES'ı aşarsa o abonenin blokları atılır
+# ve sayılır; sunucunun kendisi servise drop_oldest politikasıyla bağlanır.
+#
+# Çerçeve (little-endian): HEADER (magic "NMS1", tür, cihaz adı uzunluğu, sütun, satır, yük uzunluğu),
+# ardından cihaz adı (utf-8) ve yük:
+#   META (1): JSON {"device", "rate", "columns"}; bağlanınca ve cihazın hızı/sütunları değişince gönderilir
+#   BLOK (2): satır x sütun float64; sütunlar HOST_T (perf_counter, sn), SEQ, BATTERY, IMU değerleri
+#
+# İzleyici: python stream_server.py --port 8765 [--log Kayitlar]
+# Yayın:    python acquisition_service.py --device yatak1=COM3 --serve 8765
+#           ya da GUI: NEUROMOTION_STREAM_PORT=8765
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import socket
+import struct
+import time
+from datetime import datetime
+
+import numpy as np
+
+# --- AYARLAR ---
+HOST = "127.0.0.1"
+PORT = 8765
+BLOCK_SAMPLES = 25         # Blok en fazla bu kadar örnek
+BLOCK_SEC = 0.05           # ... ya da ilk örnekten bu kadar sonra gönderilir
+BACKLOG_BYTES = 1 << 20    # Abonenin gönderilmemiş verisi bunu aşarsa bloklar atılır
+STATS_SEC = 5.0
+IMU_AXES = ["AccX", "AccY", "AccZ", "GyroX", "GyroY", "GyroZ"]
+
+MAGIC = b"NMS1"
+KIND_META = 1
+KIND_BLOCK = 2
+HEADER = struct.Struct("<4sBxHHII")   # magic, tür, ad uzunluğu, sütun, satır, yük uzunluğu
+LEAD_COLUMNS = ["HOST_T", "SEQ", "BATTERY"]
+
+
+def block_columns(n_values):
+    return LEAD_COLUMNS + [f"IMU{i + 1}_{axis}" for i in range(n_values // 6) for axis in IMU_AXES]
+
+
+def encode_frame(kind, device, payload, columns=0, rows=0):
+    name = device.encode("utf-8")
+    return b"".join((HEADER.pack(MAGIC, kind, len(name), columns, rows, len(payload)), name, payload))
+
+
+def encode_block(device, packets):
+    """Aynı cihazın paketleri -> BLOK çerçevesi (satır x sütun float64)."""
+    n_values = len(packets[0].values)
+    block = np.empty((len(packets), len(LEAD_COLUMNS) + n_values))
+    for row, p in zip(block, packets):
+        row[0], row[1], row[2] = p.t, p.seq, p.battery
+        row[3:] = p.values
+    return encode_frame(KIND_BLOCK, device, block.data.cast("B"), block.shape[1], block.shape[0])
+
+
+# ========================================================
+# SUNUCU (acquisition_service istemcisi)
+# ========================================================
+
+class StreamServer:
+    """port=0 verilirse boş bir port seçilir; seçilen port çalışınca self.port'tadır."""
+
+    def __init__(self, host=HOST, port=PORT, block_samples=BLOCK_SAMPLES, block_sec=BLOCK_SEC):
+        self.host = host
+        self.port = port
+        self.block_samples = block_samples
+        self.block_sec = block_sec
+        self.subscribers = {}      # writer -> {"peer", "sent", "dropped"}
+        self.blocks = 0
+        self._meta = {}            # cihaz -> (hız, sütun, META çerçevesi)
+
+    async def run(self, subscription):
+        server = await asyncio.start_server(self._on_connect, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"🔌 Canlı yayın: {self.host}:{self.port}")
+        pending = {}
+        try:
+            async for packet in subscription:
+                packets = pending.setdefault(packet.device, [])
+                packets.append(packet)
+                if len(packets) >= self.block_samples or packet.t - packets[0].t >= self.block_sec:
+                    self._publish(packet.device, packets)
+                    pending[packet.device] = []
+            for device, packets in pending.items():
+                if packets: self._publish(device, packets)
+        finally:
+            server.close()
+            for writer in list(self.subscribers): writer.close()
+            await server.wait_closed()
+
+    def _publish(self, device, packets):
+        self._update_meta(device, len(packets[0].values))
+        frame = encode_block(device, packets)
+        self.blocks += 1
+        for writer, info in list(self.subscribers.items()):
+            if writer.transport.get_write_buffer_size() > BACKLOG_BYTES:
+                info["dropped"] += 1
+                continue
+            writer.write(frame)
+            info["sent"] += 1
+
+    def _update_meta(self, device, n_values):
+        dev = self.service.devices.get(device) if getattr(self, "service", None) else None
+        rate = dev.rate if dev else None
+        current = self._meta.get(device)
+        if current and current[:2] == (rate, n_values): return
+        payload = json.dumps({"device": device, "rate": rate, "columns": block_columns(n_values)}).encode("utf-8")
+        frame = encode_frame(KIND_META, device, payload)
+        self._meta[device] = (rate, n_values, frame)
+        for writer in self.subscribers: writer.write(frame)
+
+    async def _on_connect(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None: sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        peer = writer.get_extra_info("peername")
+        for _, _, frame in self._meta.values(): writer.write(frame)
+        self.subscribers[writer] = {"peer": peer, "sent": 0, "dropped": 0}
+        print(f"🔌 Abone bağlandı: {peer}")
+        try:
+            while await reader.read(1024): pass      # Aboneler veri göndermez; EOF = ayrıldı
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            info = self.subscribers.pop(writer, None)
+            writer.close()
+            if info: print(f"🔌 Abone ayrıldı: {peer} (gönderilen {info['sent']}, atılan {info['dropped']} blok)")
+
+    def stats(self):
+        return {"subscribers": len(self.subscribers), "blocks": self.blocks,
+                "dropped": sum(info["dropped"] for info in self.subscribers.values())}
+
+
+# ========================================================
+# ABONE (izleyici tarafı)
+# ========================================================
+
+class StreamClient:
+    """Engelleyen abone: `for device, block in StreamClient(port=...)`.
+    block, alınan tamponun üzerinde (satır, sütun) float64 görünümüdür; sütun adları self.meta[device]['columns']."""
+
+    def __init__(self, host=HOST, port=PORT, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.meta = {}
+        self.sock = None
+
+    def _recv_exact(self, size):
+        buf = bytearray(size)
+        view = memoryview(buf)
+        got = 0
+        while got < size:
+            n = self.sock.recv_into(view[got:])
+            if not n: raise ConnectionError("Yayın kapandı")
+            got += n
+        return buf
+
+    def __iter__(self):
+        self.sock = socket.create_connection((self.host, self.port), self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                magic, kind, name_len, columns, rows, size = HEADER.unpack(self._recv_exact(HEADER.size))
+                if magic != MAGIC: raise ValueError("Geçersiz çerçeve (senkron kayboldu)")
+                device = self._recv_exact(name_len).decode("utf-8")
+                payload = self._recv_exact(size)
+                if kind == KIND_META:
+                    self.meta[device] = json.loads(payload)
+                elif kind == KIND_BLOCK:
+                    yield device, np.frombuffer(payload, dtype=np.float64).reshape(rows, columns)
+        except ConnectionError:
+            return
+        finally:
+            self.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Canlı yayın izleyicisi / kaydedicisi")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--log", help="Klasör: cihaz başına CSV (yayındaki sütunlar)")
+    parser.add_argument("--duration", type=float, default=0.0, help="Süre (sn); 0 = yayın bitene/Ctrl+C'ye kadar")
+    args = parser.parse_args()
+
+    client = StreamClient(args.host, args.port)
+    files, counts = {}, {}
+    started = next_print = time.perf_counter()
+    print(f"📡 {args.host}:{args.port} dinleniyor...")
+    try:
+        for device, block in client:
+            counts[device] = counts.get(device, 0) + len(block)
+            if args.log:
+                if device not in files:
+                    os.makedirs(args.log, exist_ok=True)
+                    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    f = open(os.path.join(args.log, f"YAYIN_{device}_{stamp}.csv"), "w", newline="")
+                    files[device] = (f, csv.writer(f))
+                    files[device][1].writerow(client.meta.get(device, {}).get("columns", []))
+                files[device][1].writerows(block.tolist())
+            now = time.perf_counter()
+            if now >= next_print:
+                next_print = now + STATS_SEC
+                print("📊 " + " | ".join(f"{k}: {v} örnek ({(client.meta.get(k) or {}).get('rate') or '-'} Hz)"
+                                         for k, v in sorted(counts.items())), flush=True)
+            if args.duration and now - started >= args.duration: break
+    except KeyboardInterrupt:
+        print("\n🛑 Durduruldu.")
+    finally:
+        client.close()
+        for f, _ in files.values(): f.close()
+    print(f"✅ Toplam: {counts}")
+
+
+if __name__ == "__main__":
+    main()
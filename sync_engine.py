@@ -0,0 +1,334 @@
+# DOSYA ADI: sync_engine.py
+# Yerel SQLite aynası (local_store.py) ile uzak MySQL arasında arka plan eşitlemesi.
+#
+# Gönder (push): dirty=1 satırlar ve silme mezar taşları MySQL'e yazılır.
+# Çek (pull)   : MySQL'de synced_at > son filigran olan satırlar yerel tabloya uygulanır.
+# Silme        : gönderilen mezar taşları uzakta sync_deletions günlüğüne de yazılır; diğer istemciler
+#                günlüğü aynı filigran yöntemiyle çeker. Günlüğe düşmeyen silmeler (MySQL'de elle silme)
+#                için bütün anahtarları karşılaştıran tam uzlaştırma yalnızca FULL_RECONCILE_SEC'te bir çalışır.
+# Çakışma      : satır bazında "son yazan kazanır" (updated_at, UTC ms).
+#   - Yerel satır kirli ve yerel updated_at daha yeniyse uzak değişiklik yok sayılır.
+#   - Uzak satır daha yeniyse yerel değişiklik gönderilmez, çekimde üzerine yazılır.
+# synced_at yalnızca sunucu saatiyle dolar; istemci saat kayması çekimi etkilemez.
+
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import mysql.connector
+from db_config import DB_CONFIG
+
+import local_store
+import schema_migrations
+from local_store import SYNC_TABLES, SYNC_ORDER
+
+# --- AYARLAR ---
+SYNC_INTERVAL_SEC = 15.0     # Değişiklik olmasa da bu aralıkla çekim yapılır
+RETRY_INTERVAL_SEC = 30.0    # Bağlantı hatasından sonra bekleme
+CONNECT_TIMEOUT_SEC = 5
+PULL_OVERLAP_SEC = 5         # Geç commit edilen işlemleri kaçırmamak için filigran payı
+CHUNK_SIZE = 500             # IN (...) sorgularında tek seferde anahtar sayısı
+FULL_RECONCILE_SEC = 24 * 3600   # Tam anahtar uzlaştırması aralığı (reconcile() ile istenince de çalışır)
+EPOCH = "1970-01-01 00:00:00.000"
+
+
+def _ms(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return str(value)
+
+
+def _to_local(value):
+    if isinstance(value, datetime): return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, Decimal): return float(value)
+    if isinstance(value, (bytes, bytearray)): return value.decode("utf-8", errors="ignore")
+    return value
+
+
+class SyncEngine:
+    def __init__(self, db_config=None, local_path=local_store.LOCAL_DB_PATH, interval=SYNC_INTERVAL_SEC):
+        self.db_config = db_config or DB_CONFIG
+        self.local_path = local_path
+        self.interval = interval
+        self.local = None
+        self.remote = None
+        self.last_sync = None        # Son başarılı eşitlemenin zamanı (time.time)
+        self.last_error = None
+        self._next_connect = 0.0
+        self._listeners = []         # Çekimde veri değişince çağrılır: fn(değişen tablolar)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SyncEngine", daemon=True)
+        self._thread.start()
+
+    # --- Genel API ---
+    def nudge(self):
+        """Yerel bir değişiklikten sonra beklemeden eşitleme iste."""
+        self._wake.set()
+
+    def add_listener(self, fn):
+        if fn not in self._listeners: self._listeners.append(fn)
+
+    @property
+    def online(self):
+        return self.remote is not None
+
+    def sync_once(self, reconcile=False):
+        """Bir gönder + çek turu. Başarılıysa değişen tabloların kümesini döndürür, değilse None.
+        reconcile=True ya da son tam uzlaştırmadan FULL_RECONCILE_SEC geçtiyse uzak anahtarlar da taranır."""
+        with self._lock:
+            if not self._connect(): return None
+            try:
+                self._push_tombstones()
+                for table in SYNC_ORDER:
+                    self._push_table(table)
+                changed = set()
+                for table in SYNC_ORDER:
+                    if self._pull_table(table): changed.add(table)
+                changed |= self._pull_deletions()
+                last = float(local_store.get_meta(self.local, "reconcile") or 0)
+                if reconcile or time.time() - last >= FULL_RECONCILE_SEC:
+                    for table in reversed(SYNC_ORDER):
+                        if self._prune_deleted(table): changed.add(table)
+                    local_store.set_meta(self.local, "reconcile", str(time.time()))
+                    self.local.commit()
+                self.last_sync = time.time()
+                self.last_error = None
+            except (mysql.connector.Error, local_store.sqlite3.Error) as e:
+                print(f"Eşitleme Hatası: {e}")
+                self.last_error = str(e)
+                self._rollback()
+                self._disconnect()
+                self._next_connect = time.monotonic() + RETRY_INTERVAL_SEC
+                return None
+        if changed:
+            for fn in self._listeners:
+                fn(changed)
+        return changed
+
+    def reconcile(self):
+        """Tam uzlaştırmayı hemen çalıştır (ör. MySQL'de elle silme yapıldıktan sonra)."""
+        return self.sync_once(reconcile=True)
+
+    def close(self, timeout=10.0):
+        if self._stop.is_set(): return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        # Bağlantı açıksa son yerel değişiklikleri göndermeyi dene
+        if self.remote is not None: self.sync_once()
+        self._disconnect()
+        if self.local is not None: self.local.close()
+
+    # --- İş parçacığı ---
+    def _run(self):
+        while not self._stop.is_set():
+            self.sync_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    # --- Bağlantılar ---
+    def _connect(self):
+        if self.local is None:
+            self.local = local_store.open_store(self.local_path, sync_applying=True)
+        if self.remote is not None: return True
+        if time.monotonic() < self._next_connect: return False
+        try:
+            self.remote = mysql.connector.connect(**self.db_config, connection_timeout=CONNECT_TIMEOUT_SEC)
+            cursor = self.remote.cursor()
+            cursor.execute("SET time_zone = '+00:00'")   # updated_at yerelde de UTC
+            cursor.close()
+            schema_migrations.migrate(self.remote)   # sync sütunları gerekiyorsa eklenir
+            return True
+        except mysql.connector.Error as err:
+            print(f"Eşitleme Bağlantı Hatası: {err}")
+            self.last_error = str(err)
+            self._disconnect()
+            self._next_connect = time.monotonic() + RETRY_INTERVAL_SEC
+            return False
+
+    def _disconnect(self):
+        try:
+            if self.remote is not None: self.remote.close()
+        except Exception:
+            pass
+        self.remote = None
+
+    def _rollback(self):
+        for conn in (self.local, self.remote):
+            try:
+                if conn is not None: conn.rollback()
+            except Exception:
+                pass
+
+    # --- Gönderim ---
+    def _remote_timestamps(self, table, key, keys):
+        stamps = {}
+        cursor = self.remote.cursor()
+        for i in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[i:i + CHUNK_SIZE]
+            cursor.execute(f"SELECT {key}, updated_at FROM {table} WHERE {key} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            stamps.update({row[0]: _ms(row[1]) for row in cursor.fetchall()})
+        cursor.close()
+        return stamps
+
+    def _push_table(self, table):
+        key, cols = SYNC_TABLES[table]
+        lc = self.local.cursor()
+        lc.execute(f"SELECT {', '.join(cols)}, updated_at FROM {table} WHERE dirty = 1")
+        rows = lc.fetchall()
+        if not rows:
+            lc.close(); return 0
+
+        key_pos = cols.index(key)
+        remote_ts = self._remote_timestamps(table, key, [r[key_pos] for r in rows])
+        to_push = [r for r in rows if remote_ts.get(r[key_pos], EPOCH) < r[-1]]
+        if to_push:
+            all_cols = cols + ["updated_at"]
+            updates = ", ".join(f"{c} = VALUES({c})" for c in all_cols if c != key)
+            sql = (f"INSERT INTO {table} ({', '.join(all_cols)}) VALUES ({', '.join(['%s'] * len(all_cols))}) "
+                   f"ON DUPLICATE KEY UPDATE {updates}")
+            self._remote_executemany(table, sql, to_push)
+
+        # Gönderilen ya da uzakta daha yenisi olan satırlar temizlenir.
+        # updated_at koşulu: gönderim sırasında yeniden düzenlenen satır kirli kalır.
+        lc.executemany(f"UPDATE {table} SET dirty = 0 WHERE {key} = %s AND updated_at = %s",
+                       [(r[key_pos], r[-1]) for r in rows])
+        self.local.commit()
+        lc.close()
+        return len(to_push)
+
+    def _remote_executemany(self, table, sql, rows):
+        cursor = self.remote.cursor()
+        try:
+            cursor.executemany(sql, rows)
+            self.remote.commit()
+        except mysql.connector.IntegrityError:
+            # Toplu yazım tek bir bozuk satır yüzünden takılmasın: tek tek dene, bozukları atla
+            self.remote.rollback()
+            for row in rows:
+                try:
+                    cursor.execute(sql, row)
+                except mysql.connector.IntegrityError as e:
+                    print(f"Eşitleme: {table} satırı atlandı ({e})")
+            self.remote.commit()
+        finally:
+            cursor.close()
+
+    def _push_tombstones(self):
+        lc = self.local.cursor()
+        lc.execute("SELECT id, table_name, row_key FROM sync_tombstones ORDER BY id")
+        rows = lc.fetchall()
+        if not rows:
+            lc.close(); return 0
+        rc = self.remote.cursor()
+        for table in reversed(SYNC_ORDER):
+            keys = [(r[2],) for r in rows if r[1] == table]
+            if keys:
+                rc.executemany(f"DELETE FROM {table} WHERE {SYNC_TABLES[table][0]} = %s", keys)
+        # Diğer istemciler silmeleri bu günlükten çeker (aynı işlemde: silme varsa günlük de vardır)
+        rc.executemany("INSERT INTO sync_deletions (table_name, row_key) VALUES (%s, %s)",
+                       [(r[1], r[2]) for r in rows])
+        self.remote.commit()
+        rc.close()
+        lc.execute("DELETE FROM sync_tombstones WHERE id <= %s", (rows[-1][0],))
+        self.local.commit()
+        lc.close()
+        return len(rows)
+
+    # --- Çekim ---
+    def _pull_table(self, table):
+        key, cols = SYNC_TABLES[table]
+        watermark = local_store.get_meta(self.local, f"pull:{table}")
+        rc = self.remote.cursor()
+        query = f"SELECT {', '.join(cols)}, updated_at, synced_at FROM {table}"
+        if watermark:
+            since = datetime.strptime(watermark, "%Y-%m-%d %H:%M:%S.%f") - timedelta(seconds=PULL_OVERLAP_SEC)
+            rc.execute(query + " WHERE synced_at >= %s", (_ms(since),))
+        else:
+            rc.execute(query)
+        rows = rc.fetchall()
+        rc.close()
+        if not rows: return 0
+
+        values = [tuple(_to_local(v) for v in r[:-2]) + (_ms(r[-2]),) for r in rows]
+        all_cols = cols + ["updated_at"]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in all_cols if c != key)
+        sql = (f"INSERT INTO {table} ({', '.join(all_cols)}, dirty) VALUES ({', '.join(['?'] * len(all_cols))}, 0) "
+               f"ON CONFLICT({key}) DO UPDATE SET {updates}, dirty = 0 "
+               f"WHERE NOT ({table}.dirty = 1 AND {table}.updated_at > excluded.updated_at)")
+        lc = self.local.cursor()
+        try:
+            lc.executemany(sql, values)
+        except local_store.sqlite3.IntegrityError:
+            for row in values:
+                try:
+                    lc.execute(sql, row)
+                except local_store.sqlite3.IntegrityError as e:
+                    print(f"Eşitleme: {table} satırı yerelde uygulanamadı ({e})")
+        local_store.set_meta(self.local, f"pull:{table}", max(_ms(r[-1]) for r in rows))
+        self.local.commit()
+        lc.close()
+        return len(rows)
+
+    def _pull_deletions(self):
+        """sync_deletions günlüğündeki yeni silmeleri yerelde uygular; değişen tabloları döndürür.
+        Yerelde kirli ya da silmeden sonra güncellenmiş (aynı anahtarla yeniden eklenmiş) satır silinmez."""
+        watermark = local_store.get_meta(self.local, "pull:deletions")
+        rc = self.remote.cursor()
+        query = "SELECT table_name, row_key, deleted_at FROM sync_deletions"
+        if watermark:
+            since = datetime.strptime(watermark, "%Y-%m-%d %H:%M:%S.%f") - timedelta(seconds=PULL_OVERLAP_SEC)
+            rc.execute(query + " WHERE deleted_at >= %s", (_ms(since),))
+        else:
+            rc.execute(query)
+        rows = rc.fetchall()
+        rc.close()
+        if not rows: return set()
+
+        changed = set()
+        lc = self.local.cursor()
+        for table in reversed(SYNC_ORDER):
+            key = SYNC_TABLES[table][0]
+            gone = [(r[1], _ms(r[2])) for r in rows if r[0] == table]
+            if not gone: continue
+            lc.executemany(f"DELETE FROM {table} WHERE {key} = %s AND dirty = 0 AND updated_at <= %s", gone)
+            if lc.rowcount: changed.add(table)
+        local_store.set_meta(self.local, "pull:deletions", max(_ms(r[2]) for r in rows))
+        self.local.commit()
+        lc.close()
+        return changed
+
+    def _prune_deleted(self, table):
+        """Tam uzlaştırma: uzakta olmayan (yerelde temiz) satırları yerelden de siler.
+        Bütün uzak anahtarları okur; yalnızca sync_once(reconcile) / FULL_RECONCILE_SEC ile çalışır."""
+        key = SYNC_TABLES[table][0]
+        rc = self.remote.cursor()
+        rc.execute(f"SELECT {key} FROM {table}")
+        remote_keys = {row[0] for row in rc.fetchall()}
+        rc.close()
+        lc = self.local.cursor()
+        lc.execute(f"SELECT {key} FROM {table} WHERE dirty = 0")
+        gone = [(row[0],) for row in lc.fetchall() if row[0] not in remote_keys]
+        if gone:
+            lc.executemany(f"DELETE FROM {table} WHERE {key} = %s", gone)
+            self.local.commit()
+        lc.close()
+        return len(gone)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Süreç başına tek eşitleme motoru; çıkışta son değişiklikler gönderilir."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SyncEngine()
+            atexit.register(_engine.close)
+        return _engine
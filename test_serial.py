@@ -1,7 +1,11 @@
+import sys
 import serial
 import time
 
-ser = serial.Serial('COM3', 115200, timeout=2)
+# Port can be passed on the command line (e.g. the /dev/pts/N printed by device_simulator.py --pty)
+PORT = sys.argv[1] if len(sys.argv) > 1 else 'COM3'
+
+ser = serial.Serial(PORT, 115200, timeout=2)
 time.sleep(2)
 
 # Clear buffer
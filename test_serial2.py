@@ -1,15 +1,19 @@
+import sys
 import serial
 import time
 
+# Port can be passed on the command line (e.g. the /dev/pts/N printed by device_simulator.py --pty)
+PORT = sys.argv[1] if len(sys.argv) > 1 else 'COM3'
+
 # Close and reopen
 try:
-    s = serial.Serial('COM3')
+    s = serial.Serial(PORT)
     s.close()
     time.sleep(1)
 except:
     pass
 
-ser = serial.Serial('COM3', 115200, timeout=2)
+ser = serial.Serial(PORT, 115200, timeout=2)
 time.sleep(3)
 
 data = ser.read_all()
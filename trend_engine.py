@@ -0,0 +1,232 @@
+# DOSYA ADI: trend_engine.py
+# Hasta bazlı boylamsal (longitudinal) trend motoru.
+# Bir hastanın tüm testleri tek sorguda çekilir; analizlerin ürettiği metrikler
+# (test_metrics tablosu, metrik başına bir satır) test türü başına numpy zaman serisine dönüştürülür.
+# Her seri için: kayan ortalama/sapma, ortalama kayması (change point) noktaları ve
+# stimülasyon parametreleriyle korelasyon bir kez hesaplanıp önbelleğe alınır.
+# Önbellek, hastanın test imzası (adet + son güncelleme) değişmedikçe geçerlidir;
+# böylece yüzlerce seanslık hastada bile görünüm anında açılır.
+
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# --- AYARLAR ---
+ROLLING_WINDOW = 5          # Kayan istatistik penceresi (seans)
+CP_MIN_SEGMENT = 3          # Bir değişim noktasının iki yanında en az bu kadar seans
+CP_MAX_POINTS = 5           # Seri başına en fazla değişim noktası
+CP_PENALTY = 3.0            # Bölme kazancı eşiği: CP_PENALTY * sigma^2 * log(n)
+MIN_CORR_SAMPLES = 4        # Korelasyon için gereken en az seans
+
+# Test türü -> (metrik anahtarı, ekranda görünen ad)
+METRICS = {
+    "Tremor": [
+        ("updrs", "MDS-UPDRS Skoru"),
+        ("dominant_freq", "Baskın Frekans (Hz)"),
+        ("peak_g", "Tepe Titreşim (g)"),
+    ],
+    "Bradikinezi": [
+        ("updrs", "MDS-UPDRS Skoru"),
+        ("speed", "Hız Skoru (%)"),
+        ("power", "Güç Skoru (%)"),
+        ("rhythm", "Ritim Skoru (%)"),
+        ("cv_rhythm", "Ritim CV (%)"),
+        ("hesitations", "Takılma Sayısı"),
+        ("amp_slope", "Yorulma Eğimi"),
+    ],
+}
+STIM_PARAMS = [("ch1", "hz"), ("ch1", "pw"), ("ch1", "amp"), ("ch2", "hz"), ("ch2", "pw"), ("ch2", "amp")]
+STIM_METRICS = [f"stim_{ch}_{key}" for ch, key in STIM_PARAMS]
+STIM_LABELS = [f"{ch.upper()} {key}" for ch, key in STIM_PARAMS]
+
+
+def result_metrics(metrics, stim_params=None):
+    """Analiz sonucunu ve stimülasyon ayarını test_metrics satırlarına uygun düz sözlüğe çevirir.
+    stim_params kayıttan gelir (stim_log.recording_settings); açılmamış kanal için stim_* yazılmaz."""
+    flat = {k: float(v) for k, v in metrics.items() if v is not None}
+    if stim_params:
+        for (ch, key), name in zip(STIM_PARAMS, STIM_METRICS):
+            value = stim_params.get(ch, {}).get(key)
+            if value is not None: flat[name] = float(value)
+    return flat
+
+
+def _timestamp(value):
+    if isinstance(value, datetime): return value.timestamp()
+    try:
+        return datetime.strptime(str(value)[:19], "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return np.nan
+
+
+# ========================================================
+# İSTATİSTİK
+# ========================================================
+
+def rolling_stats(values, window=ROLLING_WINDOW):
+    """NaN'lara dayanıklı geriye dönük kayan ortalama ve standart sapma (kümülatif toplamlarla O(n))."""
+    x = np.asarray(values, dtype=float)
+    valid = ~np.isnan(x)
+    filled = np.where(valid, x, 0.0)
+    c_n = np.concatenate(([0], np.cumsum(valid)))
+    c_s = np.concatenate(([0.0], np.cumsum(filled)))
+    c_ss = np.concatenate(([0.0], np.cumsum(filled * filled)))
+
+    end = np.arange(1, len(x) + 1)
+    start = np.maximum(end - window, 0)
+    n = c_n[end] - c_n[start]
+    s = c_s[end] - c_s[start]
+    ss = c_ss[end] - c_ss[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, s / n, np.nan)
+        var = np.where(n > 1, (ss - n * mean * mean) / (n - 1), np.nan)
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+def _noise_sigma(x):
+    # Ardışık farkların MAD'i: seviye kaymalarından etkilenmeyen gürültü kestirimi
+    if len(x) < 3: return float(np.std(x)) or 1.0
+    sigma = np.median(np.abs(np.diff(x))) / (0.6745 * np.sqrt(2))
+    return float(sigma) if sigma > 0 else (float(np.std(x)) or 1.0)
+
+
+def _best_split(x, min_size):
+    """Ortalama kaymasında hata karesi toplamını en çok düşüren bölme noktası ve kazancı."""
+    n = len(x)
+    if n < 2 * min_size: return None, 0.0
+    c = np.cumsum(x)
+    k = np.arange(min_size, n - min_size + 1)
+    left_mean = c[k - 1] / k
+    right_mean = (c[-1] - c[k - 1]) / (n - k)
+    gain = k * (n - k) / n * (left_mean - right_mean) ** 2
+    i = int(np.argmax(gain))
+    return int(k[i]), float(gain[i])
+
+
+def change_points(values, min_size=CP_MIN_SEGMENT, max_points=CP_MAX_POINTS, penalty=CP_PENALTY):
+    """İkili bölme (binary segmentation) ile ortalama kayması noktaları.
+    Döndürülen indeksler yeni seviyenin başladığı seansı gösterir (orijinal dizide)."""
+    x = np.asarray(values, dtype=float)
+    index = np.flatnonzero(~np.isnan(x))
+    x = x[index]
+    if len(x) < 2 * min_size: return []
+    threshold = penalty * _noise_sigma(x) ** 2 * np.log(len(x))
+
+    points = []
+    segments = [(0, len(x))]
+    while segments and len(points) < max_points:
+        best = None
+        for seg_start, seg_end in segments:
+            split, gain = _best_split(x[seg_start:seg_end], min_size)
+            if split is not None and gain > threshold and (best is None or gain > best[0]):
+                best = (gain, seg_start, seg_end, seg_start + split)
+        if best is None: break
+        _, seg_start, seg_end, split = best
+        points.append(split)
+        segments.remove((seg_start, seg_end))
+        segments.extend([(seg_start, split), (split, seg_end)])
+    return sorted(int(index[p]) for p in points)
+
+
+def stim_correlations(values, stim, min_samples=MIN_CORR_SAMPLES):
+    """Metrik ile her stimülasyon parametresi arasındaki Pearson r (tek vektörel geçiş).
+    Sabit kalan ya da yetersiz örnekli parametreler için NaN."""
+    y = np.asarray(values, dtype=float)[:, None]
+    s = np.asarray(stim, dtype=float)
+    mask = ~np.isnan(y) & ~np.isnan(s)
+    n = mask.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        y_m = np.where(mask, y, 0.0).sum(axis=0) / n
+        s_m = np.where(mask, s, 0.0).sum(axis=0) / n
+        dy = np.where(mask, y - y_m, 0.0)
+        ds = np.where(mask, s - s_m, 0.0)
+        r = (dy * ds).sum(axis=0) / np.sqrt((dy * dy).sum(axis=0) * (ds * ds).sum(axis=0))
+    r[n < min_samples] = np.nan
+    return r
+
+
+# ========================================================
+# HASTA SERİSİ
+# ========================================================
+
+def build_series(rows):
+    """get_patient_tests satırlarından (test_uuid, tarih, tür, metrik, değer) test türü başına
+    sıkıştırılmış zaman serisi üretir.
+    Her tür için: t (epoch sn), values (seans x metrik, float32), stim (seans x 6, float32)."""
+    columns = {test_type: {key: i for i, (key, _) in enumerate(names)} for test_type, names in METRICS.items()}
+    stim_columns = {name: i for i, name in enumerate(STIM_METRICS)}
+    grouped = {}     # tür -> {test_uuid: [zaman, metrik satırı, stim satırı]} (sorgu sırası korunur)
+    for test_uuid, test_date, test_type, metric, value in rows:
+        if test_type not in METRICS: continue
+        tests = grouped.setdefault(test_type, {})
+        entry = tests.get(test_uuid)
+        if entry is None:
+            entry = tests[test_uuid] = [_timestamp(test_date),
+                                        np.full(len(METRICS[test_type]), np.nan), np.full(len(STIM_METRICS), np.nan)]
+        if metric in columns[test_type]: entry[1][columns[test_type][metric]] = value
+        elif metric in stim_columns: entry[2][stim_columns[metric]] = value
+
+    series = {}
+    for test_type, tests in grouped.items():
+        entries = list(tests.values())
+        series[test_type] = {
+            "t": np.array([e[0] for e in entries], dtype=np.float64),
+            "values": np.array([e[1] for e in entries], dtype=np.float32),
+            "stim": np.array([e[2] for e in entries], dtype=np.float32),
+        }
+    return series
+
+
+def summarize(series):
+    """Görünüm için ön hesaplanmış özet: metrik başına kayan istatistik, değişim noktaları, korelasyon."""
+    summary = {}
+    for test_type, data in series.items():
+        metrics = {}
+        for col, (key, label) in enumerate(METRICS[test_type]):
+            values = data["values"][:, col].astype(float)
+            if np.all(np.isnan(values)): continue
+            mean, std = rolling_stats(values)
+            metrics[key] = {
+                "label": label,
+                "values": values,
+                "rolling_mean": mean,
+                "rolling_std": std,
+                "change_points": change_points(values),
+                "correlations": stim_correlations(values, data["stim"]),
+                "last": float(values[~np.isnan(values)][-1]),
+                "overall_mean": float(np.nanmean(values)),
+            }
+        summary[test_type] = {"t": data["t"], "count": len(data["t"]), "metrics": metrics}
+    return summary
+
+
+class TrendService:
+    """Hasta başına trend özeti; test imzası değişmedikçe yeniden hesaplanmaz."""
+
+    def __init__(self, db):
+        self.db = db
+        self._cache = {}   # hasta -> (imza, özet)
+        self._lock = threading.Lock()
+
+    def get(self, patient_name):
+        signature = self.db.get_patient_tests_signature(patient_name)
+        with self._lock:
+            hit = self._cache.get(patient_name)
+            if hit and hit[0] == signature: return hit[1]
+        summary = summarize(build_series(self.db.get_patient_tests(patient_name)))
+        with self._lock:
+            self._cache[patient_name] = (signature, summary)
+        return summary
+
+    def invalidate(self, patient_name=None):
+        with self._lock:
+            if patient_name is None: self._cache.clear()
+            else: self._cache.pop(patient_name, None)
+
+
+def strongest_correlations(metric_summary, limit=3):
+    """En güçlü |r| değerine sahip stimülasyon parametreleri: [(etiket, r), ...]."""
+    r = metric_summary["correlations"]
+    order = [i for i in np.argsort(-np.abs(np.nan_to_num(r, nan=0.0))) if not np.isnan(r[i])]
+    return [(STIM_LABELS[i], float(r[i])) for i in order[:limit]]